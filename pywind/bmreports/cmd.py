@@ -31,7 +31,7 @@ from pprint import pprint
 
 from pywind.bmreports.generation_type import GenerationData
 from pywind.bmreports.unit import UnitData, UnitList, PowerPackUnits
-from pywind.utils import multi_level_get, StdoutFormatter
+from pywind.utils import StdoutFormatter
 
 
 def bm_generation_type(args):
@@ -73,6 +73,8 @@ def bm_unitdata(args):
     .. code-block:
     $ pywind bm_unitdata --date 2016-01-01 --period 5
 
+    Using --all-periods gets every period of the day, or from --fromdate to --todate.
+
     """
 
     if args.date is not None:
@@ -84,24 +86,36 @@ def bm_unitdata(args):
     if args.period is not None:
         udd.period = args.period
 
-    if udd.get_data() is False:
-        print("Unable to get unit data.")
-        sys.exit(0)
-
-    print("Data is for period {}, {}".format(udd.period, udd.date))
-    fmt = StdoutFormatter('9s', '30s', '>10.4f', '>10s', '>10.4f', '>10s', '>10.4f', '>10.4f', '>10.4f', ">10.4f")
-    print("{:43s}     Bid Volume              Offer Volume           Cashflow".format(' '))
-    print(fmt.titles("NGC", 'Lead', 'Original', 'Tagged', 'Original', 'Tagged', 'Bid', 'Offer', 'Bid Rate', 'Offer Rate'))
-    for bmu in udd.data:
-        print(fmt.row(bmu.id, bmu.lead,
-                      bmu.bid_volume,
-                      multi_level_get(bmu.volume, 'bid_values.tagged.total.value', 'n/a'),
-                      bmu.offer_volume,
-                      multi_level_get(bmu.volume, 'offer_values.tagged.total.value', 'n/a'),
-                      bmu.bid_cashflow,
-                      bmu.offer_cashflow,
-                      bmu.rate("bid"),
-                      bmu.rate("offer")))
+    if args.all_periods:
+        if udd.get_periods(args.fromdate or udd.date, args.todate, workers=args.workers) is False:
+            print("Unable to get unit data.")
+            sys.exit(0)
+        if udd.failed:
+            print("Unable to get data for {} periods.".format(len(udd.failed)))
+        periods = udd.periods
+    else:
+        if udd.get_data() is False:
+            print("Unable to get unit data.")
+            sys.exit(0)
+        periods = {(udd.date, udd.period): udd.data}
+
+    fmt = StdoutFormatter('9s', '30s', '>10.4f', '>10.4f', '>10.4f', '>10.4f', '>10.4f', '>10.4f', '>10.4f', ">10.4f")
+    for (day, period), units in sorted(periods.items()):
+        print("Data is for period {}, {}".format(period, day))
+        print("{:43s}     Bid Volume              Offer Volume           Cashflow".format(' '))
+        print(fmt.titles("NGC", 'Lead', 'Original', 'Tagged', 'Original', 'Tagged', 'Bid', 'Offer', 'Bid Rate',
+                         'Offer Rate'))
+        for bmu in units:
+            print(fmt.row(bmu.id, bmu.lead,
+                          bmu.bid_volume,
+                          bmu.bid_volume_tagged,
+                          bmu.offer_volume,
+                          bmu.offer_volume_tagged,
+                          bmu.bid_cashflow,
+                          bmu.offer_cashflow,
+                          bmu.rate("bid"),
+                          bmu.rate("offer")))
+        print("")
     return udd
 
 
@@ -148,15 +148,16 @@ class GenerationData(object):
     URL = "http://www.bmreports.com/bsp/additional/soapfunctions.php"
     PARAMS = {'element': 'generationbyfueltypetable'}
 
-    def __init__(self):
+    def __init__(self, session=None):
         self.sections = []
         self.xml = None
+        self.session = session
         self.get_data()
 
     def get_data(self):
         """ Get data from the BM Reports website. Try 3 times.
         """
-        resp = get_or_post_a_url(self.URL, params=self.PARAMS)
+        resp = get_or_post_a_url(self.URL, params=self.PARAMS, session=self.session)
         self.xml = parse_response_as_xml(resp)
         if self.xml is None:
             return
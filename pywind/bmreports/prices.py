@@ -38,8 +38,9 @@ class SystemPrices(object):
     """ Class to get the electricity prices from BMreports. """
     URL = 'http://www.bmreports.com/bsp/additional/soapfunctions.php'
 
-    def __init__(self, dtt=None):
+    def __init__(self, dtt=None, session=None):
         self.dtt = dtt or date.today()
+        self.session = session
         self.xml = None
         self.prices = []
 
@@ -47,7 +48,7 @@ class SystemPrices(object):
         """ Get the data from the remote server. """
         data = {'element': 'SYSPRICE',
                 'dT': self.dtt.strftime("%Y-%m-%d")}
-        resp = get_or_post_a_url(self.URL, params=data)
+        resp = get_or_post_a_url(self.URL, params=data, session=self.session)
         self.xml = parse_response_as_xml(resp)
         if self.xml is None:
             return False
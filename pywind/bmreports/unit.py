@@ -30,42 +30,128 @@ Unit data from BM Reports
 """
 
 import os
+import numpy as np
 import xlrd
 
-from datetime import timedelta, date, datetime
-from tempfile import NamedTemporaryFile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta, date
 
-from pywind.utils import parse_response_as_xml, get_or_post_a_url, _convert_type, multi_level_get
+from pywind.retry import RequestError
+from pywind.session import get_session_pool
+from pywind.settlement import settlement_periods
+from pywind.utils import parse_response_as_xml, get_or_post_a_url, _convert_type
 
 
-def _mkdate(book, sheet, row, col):
-    val = sheet.cell(row, col).value
-    if val == '':
-        return None
-    return datetime(*xlrd.xldate_as_tuple(val, book.datemode)).date()
+def _mkdates(values, datemode):
+    """ Convert a column of Excel date values to a list of dates, with None for any
+    cells that are empty or not numbers.
+
+    :param values: List of cell values, as returned by xlrd col_values()
+    :param datemode: The datemode of the workbook.
+    :rtype: list
+    """
+    serials = np.array([val if isinstance(val, float) else np.nan for val in values])
+    valid = ~np.isnan(serials)
+    epoch = np.datetime64('1904-01-01' if datemode else '1899-12-30', 'D')
+    # Round to the nearest second, as xlrd does, before dropping the time.
+    days = np.floor(np.round(serials[valid] * 86400) / 86400).astype(np.int64)
+    dates = np.full(len(values), None, dtype=object)
+    dates[valid] = (epoch + days).tolist()
+    return dates.tolist()
 
 
-def _walk_nodes(elm):
-    data = {}
+def _decode_values(elm):
+    """ Return the total and the breakdown, as a tuple of (tag, value) pairs, from an
+    element such as
 
-    for elm2 in elm.getchildren():
-        data[elm2.tag.lower()] = _walk_nodes(elm2)
-    if elm.text is not None:
-        data['value'] = elm.text
-    return data
+        <ORIGINAL><M2>-56.0896</M2><M1>-1.1349</M1><TOTAL>-57.2245</TOTAL></ORIGINAL>
+    """
+    if elm is None:
+        return 0.0, ()
+    total = None
+    parts = []
+    for child in elm:
+        if child.text is None:
+            continue
+        if child.tag == 'TOTAL':
+            total = float(child.text)
+        else:
+            parts.append((child.tag, float(child.text)))
+    if total is None:
+        total = sum(val for _, val in parts)
+    return total, tuple(parts)
 
 
 class BalancingUnitData(object):
     """Class to store balancing payment information for a single unit during
     a single period.
+
+    The volumes and cashflows are decoded from the XML when the object is created. Each
+    name in VALUES is an attribute giving the total as a float (0.0 if there is none),
+    and the breakdown member holds the individual values (M1, P1 etc.) for each name
+    with any, e.g.
+
+    >>> bmu.bid_volume
+    -57.2245
+    >>> bmu.breakdown['bid_volume']
+    (('M2', -56.0896), ('M1', -1.1349))
     """
+    #: The values decoded, with the path of the element holding each within the BMU.
+    VALUES = (
+        ('bid_volume', 'VOLUME/BID_VALUES/ORIGINAL'),
+        ('bid_volume_tagged', 'VOLUME/BID_VALUES/TAGGED'),
+        ('bid_volume_repriced', 'VOLUME/BID_VALUES/REPRICED'),
+        ('bid_volume_originalpriced', 'VOLUME/BID_VALUES/ORIGINALPRICED'),
+        ('offer_volume', 'VOLUME/OFFER_VALUES/ORIGINAL'),
+        ('offer_volume_tagged', 'VOLUME/OFFER_VALUES/TAGGED'),
+        ('offer_volume_repriced', 'VOLUME/OFFER_VALUES/REPRICED'),
+        ('offer_volume_originalpriced', 'VOLUME/OFFER_VALUES/ORIGINALPRICED'),
+        ('bid_cashflow', 'CASHFLOW/BID_VALUES'),
+        ('offer_cashflow', 'CASHFLOW/OFFER_VALUES'),
+    )
+    __slots__ = ('id', 'type', 'lead', 'name', 'breakdown') + tuple(name for name, _ in VALUES)
+
     def __init__(self, xml_node):
         self.id = xml_node.get('ID')
         self.type = xml_node.get('TYPE')
         self.lead = xml_node.get('LEAD_PARTY')
         self.name = xml_node.get('NGC_NAME')
-        self.cashflow = _walk_nodes(xml_node.xpath('.//CASHFLOW')[0])
-        self.volume = _walk_nodes(xml_node.xpath('.//VOLUME')[0])
+        self.breakdown = {}
+        for name, path in self.VALUES:
+            total, parts = _decode_values(xml_node.find(path))
+            setattr(self, name, total)
+            if parts:
+                self.breakdown[name] = parts
+
+    @property
+    def volume(self):
+        """ The volumes as the nested dict previously created from the XML, e.g.
+        volume['bid_values']['original']['m1']['value']. Values are now floats rather
+        than strings. Created each time it is used, so prefer the attributes.
+        """
+        return self._nested('VOLUME')
+
+    @property
+    def cashflow(self):
+        """ The cashflows as the nested dict previously created from the XML, e.g.
+        cashflow['offer_values']['total']['value']. See :attr:`volume`.
+        """
+        return self._nested('CASHFLOW')
+
+    def _nested(self, element):
+        data = {}
+        for name, path in self.VALUES:
+            tags = path.split('/')
+            if tags[0] != element:
+                continue
+            values = {tag.lower(): {'value': val} for tag, val in self.breakdown.get(name, ())}
+            if values:
+                values['total'] = {'value': getattr(self, name)}
+            node = data
+            for tag in tags[1:-1]:
+                node = node.setdefault(tag.lower(), {})
+            node[tags[-1].lower()] = values
+        return data
 
     def rate(self, which):
         """Extract the rate paid for either "bid" or "offer" from the data.
@@ -74,59 +160,33 @@ class BalancingUnitData(object):
          :returns: The calculated rate
          :rtype: float
         """
-        if which.lower() not in ["bid", "offer"]:
-            return 0.0
         if which.lower() == "bid":
-            volume = multi_level_get(self.volume, "bid_values.original.total.value", '0.0')
-            cash = multi_level_get(self.cashflow, "bid_values.total.value", '0.0')
+            volume, cash = self.bid_volume, self.bid_cashflow
+        elif which.lower() == "offer":
+            volume, cash = self.offer_volume, self.offer_cashflow
         else:
-            volume = multi_level_get(self.volume, "offer_values.original.total.value", '0.0')
-            cash = multi_level_get(self.cashflow, "offer_values.total.value", '0.0')
-        if cash == '0.0' or volume == '0.0':
             return 0.0
-        return float(cash) / float(volume)
-
-    @property
-    def bid_volume(self):
-        """Get the bid volume.
-
-        :rtype: float
-        :returns: Bid volume or 0.0
-        """
-        return float(multi_level_get(self.volume, "bid_values.original.total.value", '0.0'))
-
-    @property
-    def offer_volume(self):
-        """Get the bid volume.
-
-        :rtype: float
-        :returns: Bid volume or 0.0
-        """
-        return float(multi_level_get(self.volume, "offer_values.original.total.value", '0.0'))
-
-    @property
-    def bid_cashflow(self):
-        """Return the bid cashflow.
-
-        :rtype: float
-        :returns: Bid cashflow or 0.0
-        """
-        return float(multi_level_get(self.cashflow, "bid_values.total.value", '0.0'))
-
-    @property
-    def offer_cashflow(self):
-        """Return the bid cashflow.
+        if cash == 0.0 or volume == 0.0:
+            return 0.0
+        return cash / volume
 
-        :rtype: float
-        :returns: Bid cashflow or 0.0
-        """
-        return float(multi_level_get(self.cashflow, "offer_values.total.value", '0.0'))
+    def as_dict(self):
+        """ Return the unit details and the total of each value as a dict. """
+        data = {'id': self.id, 'type': self.type, 'lead': self.lead, 'name': self.name}
+        for name, _ in self.VALUES:
+            data[name] = getattr(self, name)
+        return data
 
 
 class UnitData(object):
     """ Class that gets data about Balancing Mechanism Units
         from the Balancing Mechanism website.
+
+        :func:`get_data` gets the data for a single settlement period. :func:`get_periods`
+        gets every settlement period for a day, or range of days, using concurrent requests
+        and makes the results available by period and by unit.
     """
+    URL = 'http://www.bmreports.com/bsp/additional/soapfunctions.php?'
     HOST = 'http://www.bmreports.com'
     TYPES = {'Physical': '/servlet/com.logica.neta.bwp_PanBMDataServlet',
              'Dynamic': '/servlet/com.logica.neta.bwp_PanDynamicServlet',
@@ -158,6 +218,11 @@ class UnitData(object):
         self.historic = kwargs.get('historic', True)
         self.latest = kwargs.get('latest', False)
         self.type = self.TYPES[kwargs.get('type', 'Derived')]
+        self.session = kwargs.get('session', None)
+        self.xml = None
+        self.periods = {}
+        self.units = {}
+        self.failed = {}
 
     def get_data(self):
         """ Get the report data and update.
@@ -177,24 +242,83 @@ class UnitData(object):
         }
 
         if self.historic:
-            resp = get_or_post_a_url('http://www.bmreports.com/bsp/additional/soapfunctions.php?',
-                                     params=params)
+            resp = get_or_post_a_url(self.URL, params=params, session=self.session)
             return self._process(resp)
         return False
 
+    def get_periods(self, fromdate=None, todate=None, workers=2):
+        """ Get the data for every settlement period from fromdate to todate. The requests
+        are made concurrently, sharing a single session.
+
+        The results are available in the periods member, a dict of (date, period) to the
+        list of :class:`BalancingUnitData`, and the units member, a dict of unit ID to a
+        dict of (date, period) to :class:`BalancingUnitData`. Periods that could not be
+        retrieved are recorded in the failed member.
+
+        :param fromdate: First settlement date. Defaults to the date member.
+        :param todate: Last settlement date. Defaults to fromdate.
+        :param workers: Number of requests to run at once.
+        :returns: True if data was found for any period.
+        :rtype: bool
+        """
+        fromdate = fromdate or self.date
+        todate = todate or fromdate
+        requests = [(fromdate + timedelta(days=offset), period)
+                    for offset in range((todate - fromdate).days + 1)
+                    for period in settlement_periods(fromdate + timedelta(days=offset))]
+        session = self.session or get_session_pool().session_for(self.URL)
+
+        self.periods = {}
+        self.units = {}
+        self.failed = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self._period_data, day, period, session): (day, period)
+                       for day, period in requests}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    self.periods[key] = future.result()
+                except RequestError as err:
+                    self.failed[key] = err
+                    continue
+                if self.periods[key] is None:
+                    del self.periods[key]
+                    self.failed[key] = False
+
+        for key in sorted(self.periods):
+            for bmu in self.periods[key]:
+                self.units.setdefault(bmu.id, {})[key] = bmu
+        return len(self.units) > 0
+
+    def _period_data(self, day, period, session):
+        """ Return the list of :class:`BalancingUnitData` for a single period, or None
+        if the response could not be parsed.
+        """
+        udd = UnitData(date=day, period=period, unitid=self.unitid, unittype=self.unittype,
+                       leadparty=self.leadparty, ngcunitname=self.ngcunitname,
+                       historic=self.historic, session=session)
+        udd.type = self.type
+        udd.get_data()
+        if udd.xml is None:
+            return None
+        return udd.data
+
     def rows(self):
-        """Generator to provide export data.
+        """Generator to provide export data. If :func:`get_periods` has been used there is
+        a row for each unit in every period.
 
         :rtype: dict
         :returns: Dict formatted for internal export functions.
         """
-        for station in self.data:
-            row = {'@period': self.period, '@date': self.date,
-                   '@ngc': station['id'],
-                   '@cxtype': station['type'],
-                   'cashflow': station['cashflow'],
-                   'volume': station['volume']}
-            yield {'BalancingDetail': row}
+        periods = self.periods or {(self.date, self.period): self.data}
+        for (day, period), units in sorted(periods.items()):
+            for station in units:
+                row = {'@period': period, '@date': day,
+                       '@ngc': station.id,
+                       '@cxtype': station.type}
+                for name, _ in BalancingUnitData.VALUES:
+                    row['@' + name] = getattr(station, name)
+                yield {'BalancingDetail': row}
 
     def save_original(self, filename):
         """ Save the downloaded certificate data into the filename provided.
@@ -266,31 +390,25 @@ class UnitData(object):
             return False
 
         for bmu in self.xml.xpath(".//ACCEPT_PERIOD_TOTS//*//BMU"):
-            bud = BalancingUnitData(bmu)
-#            bmu.get('ID'),
-#                                    bmu.get('TYPE'),
-#                                    bmu.get('LEAD_PARTY'),
-#                                    bmu.get('NGC_NAME'))
-#            bmud = {
-#                'id': bmu.get('ID'),
-#                'type': bmu.get('TYPE'),
-#                'lead': bmu.get('LEAD_PARTY'),
-#                'ngc': bmu.get('NGC_NAME'),
-#            }
-#            bmud['cashflow'] = _walk_nodes(bmu.xpath('.//CASHFLOW')[0])
-#            bmud['volume'] = _walk_nodes(bmu.xpath('.//VOLUME')[0])
-            self.data.append(bud)
+            self.data.append(BalancingUnitData(bmu))
         return len(self.data) > 0
 
 
 class BaseUnitClass(object):
-    """ Base class """
+    """ Base class
+
+    COLUMNS gives the name and type of each column of the sheet, in order. The type
+    is None to use the cell value unchanged, 'date' for Excel dates or a type understood
+    by :func:`pywind.utils._convert_type`.
+    """
     XLS_URL = ""
     SHEET_NAME = ""
+    COLUMNS = ()
 
-    def __init__(self):
+    def __init__(self, session=None):
         self.units = []
         self.raw_data = None
+        self.session = session
         self.get_list()
 
     def __len__(self):
@@ -299,26 +417,34 @@ class BaseUnitClass(object):
     def get_list(self):
         """ Download and update the unit list.
 
+        The spreadsheet is parsed in memory, only the required sheet is loaded and the
+        values are read a column at a time.
+
         :rtype: bool
         """
         self.units = []
-        resp = get_or_post_a_url(self.XLS_URL)
+        resp = get_or_post_a_url(self.XLS_URL, session=self.session)
         self.raw_data = resp.content
 
-        tmp_f = NamedTemporaryFile(delete=False)
-        with open(tmp_f.name, 'wb') as fhh:
-            fhh.write(resp.content)
-
-        wbb = xlrd.open_workbook(tmp_f.name)
-        sht = wbb.sheet_by_name(self.SHEET_NAME)
-
-        for rownum in range(1, sht.nrows):
-            self._extract_row_data(wbb, sht, rownum)
-
+        wbb = xlrd.open_workbook(file_contents=resp.content, on_demand=True)
         try:
-            os.unlink(tmp_f.name)
-        except Exception:
-            pass
+            sht = wbb.sheet_by_name(self.SHEET_NAME)
+            columns = []
+            for col, (_, typ) in enumerate(self.COLUMNS):
+                values = sht.col_values(col, 1)
+                if typ == 'date':
+                    values = _mkdates(values, wbb.datemode)
+                elif typ is not None:
+                    values = [_convert_type(val, typ) for val in values]
+                columns.append(values)
+        finally:
+            wbb.release_resources()
+
+        names = [name for name, _ in self.COLUMNS]
+        for values in zip(*columns):
+            row_data = self._process_row(dict(zip(names, values)))
+            if row_data is not None:
+                self.units.append(row_data)
         return True
 
     def save_original(self, filename):
@@ -347,8 +473,9 @@ class BaseUnitClass(object):
         for unit in self.units:
             yield {'Unit': {'@{}'.format(key): unit[key] for key in unit.keys()}}
 
-    def _extract_row_data(self, wbb, sht, rownum):
-        raise NotImplementedError
+    def _process_row(self, row_data):
+        """ Return the dict of data for a row, or None if the row should be ignored. """
+        return row_data
 
 
 class UnitList(BaseUnitClass):
@@ -357,6 +484,8 @@ class UnitList(BaseUnitClass):
     """
     XLS_URL = "http://www.bmreports.com/bsp/staticdata/BMUFuelType.xls"
     SHEET_NAME = "BMU Fuel Types"
+    COLUMNS = (('ngc_id', None), ('sett_id', None), ('fuel_type', None),
+               ('eff_from', 'date'), ('eff_to', 'date'))
 
     def by_fuel_type(self, fuel):
         """Return data filtered by fuel type.
@@ -370,17 +499,10 @@ class UnitList(BaseUnitClass):
                 units.append(unit)
         return units
 
-    def _extract_row_data(self, wbb, sht, rownum):
-        row_data = {
-            'ngc_id': sht.cell(rownum, 0).value,
-            'sett_id': sht.cell(rownum, 1).value,
-            'fuel_type': sht.cell(rownum, 2).value,
-            'eff_from': _mkdate(wbb, sht, rownum,3),
-            'eff_to': _mkdate(wbb, sht, rownum, 4)
-        }
+    def _process_row(self, row_data):
         if row_data['sett_id'] == 42:
             del(row_data['sett_id'])
-        self.units.append(row_data)
+        return row_data
 
 
 class PowerPackUnits(BaseUnitClass):
@@ -389,17 +511,10 @@ class PowerPackUnits(BaseUnitClass):
     """
     XLS_URL = 'http://www.bmreports.com/bsp/staticdata/PowerPackModules.xls'
     SHEET_NAME = "Sheet1"
+    COLUMNS = (('sett_id', None), ('ngc_id', None), ('name', None), ('reg_capacity', None),
+               ('date_added', 'date'), ('bmunit', 'bool'), ('cap', 'float'))
 
-    def _extract_row_data(self, wbb, sht, rownum):
-        row_data = {
-            'sett_id': sht.cell(rownum, 0).value,
-            'ngc_id': sht.cell(rownum, 1).value,
-            'name': sht.cell(rownum, 2).value,
-            'reg_capacity': sht.cell(rownum, 3).value,
-            'date_added': _mkdate(wbb, sht, rownum, 4),
-            'bmunit': _convert_type(sht.cell(rownum, 5).value, 'bool'),
-            'cap': _convert_type(sht.cell(rownum, 6).value, 'float')
-        }
+    def _process_row(self, row_data):
         if row_data['ngc_id'] == '':
-            return
-        self.units.append(row_data)
+            return None
+        return row_data
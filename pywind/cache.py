@@ -0,0 +1,308 @@
+# coding=utf-8
+
+# This is free and unencumbered software released into the public domain.
+#
+# Anyone is free to copy, modify, publish, use, compile, sell, or
+# distribute this software, either in source code form or as a compiled
+# binary, for any purpose, commercial or non-commercial, and by any
+# means.
+
+# In jurisdictions that recognize copyright laws, the author or authors
+# of this software dedicate any and all copyright interest in the
+# software to the public domain. We make this dedication for the benefit
+# of the public at large and to the detriment of our heirs and
+# successors. We intend this dedication to be an overt act of
+# relinquishment in perpetuity of all present and future rights to this
+# software under copyright law.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# For more information, please refer to <http://unlicense.org/>
+
+"""
+Persistent, on disk cache for responses obtained by :func:`pywind.utils.get_or_post_a_url`.
+
+Entries are keyed on the URL and the normalised query parameters, with any secrets
+(such as the Elexon ``APIKey``) excluded from the key. Each entry is given a time to live
+that depends on the source, and once it has expired any ``ETag`` or ``Last-Modified``
+validators are used to ask the server whether the stored copy is still current.
+The total size of the cache is bounded, with the least recently used entries removed first.
+
+Only GET requests are cached and only for hosts that have a time to live configured,
+so the Ofgem forms (which rely on session cookies) are never cached.
+
+.. code::
+
+   >>> from pywind.cache import ResponseCache, set_response_cache
+   >>> set_response_cache(ResponseCache())
+
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from pywind.session import host_for_url
+
+
+#: Time to live that never expires.
+FOREVER = float('inf')
+
+#: Default time to live (in seconds) for each host that should be cached.
+DEFAULT_TTLS = {
+    'api.bmreports.com': 300,
+    'www.bmreports.com': 300,
+}
+
+#: Parameter names that are never included in the cache key.
+SECRET_PARAMS = ('apikey',)
+
+
+def normalise_params(params):
+    """ Return query parameters as a sorted, urlencoded string with any listed in
+    :data:`SECRET_PARAMS` removed. Used to create both cache and cassette keys.
+
+    :param params: Dict (or sequence of pairs) of query parameters.
+    :rtype: str
+    """
+    if isinstance(params, dict):
+        params = params.items()
+    return urlencode(sorted((str(key), str(val)) for key, val in params or []
+                            if str(key).lower() not in SECRET_PARAMS))
+
+
+def default_cache_directory():
+    """ Return the directory used for the cache if none is specified.
+
+    :rtype: str
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pywind')
+
+
+class CacheEntry(object):
+    """ A single response stored in the cache. """
+    def __init__(self, key, url, status, headers, content, expires):
+        self.key = key
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.content = content
+        self.expires = expires
+
+    @property
+    def is_fresh(self):
+        """ True if the entry can be used without revalidation. """
+        return self.expires > time.time()
+
+    def validators(self):
+        """ Return the conditional request headers available for this entry.
+
+        :rtype: dict
+        """
+        hdrs = {}
+        if 'ETag' in self.headers:
+            hdrs['If-None-Match'] = self.headers['ETag']
+        if 'Last-Modified' in self.headers:
+            hdrs['If-Modified-Since'] = self.headers['Last-Modified']
+        return hdrs
+
+    def as_response(self):
+        """ Create a :class:`requests.Response` from the stored data.
+
+        :rtype: :class:`requests.Response`
+        """
+        resp = requests.Response()
+        resp.status_code = self.status
+        resp.url = self.url
+        resp.headers = CaseInsensitiveDict(self.headers)
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp._content = self.content
+        resp._content_consumed = True
+        resp.from_cache = True
+        return resp
+
+
+class ResponseCache(object):
+    """ Size bounded, least recently used cache of HTTP responses stored in an SQLite
+    database.
+
+    :param directory: Directory to store the cache in. Defaults to ~/.cache/pywind
+    :param max_size: Maximum total size of the stored content in bytes.
+    :param ttls: Dict of host to time to live in seconds. Defaults to :data:`DEFAULT_TTLS`.
+    :param default_ttl: Time to live for hosts not found in ttls. None (the default) means
+                        that responses from other hosts are not cached.
+    """
+    FILENAME = 'responses.sqlite'
+
+    def __init__(self, directory=None, max_size=512 * 1024 * 1024, ttls=None, default_ttl=None):
+        self.directory = directory or default_cache_directory()
+        self.max_size = max_size
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self.filename = os.path.join(self.directory, self.FILENAME)
+        self._db = sqlite3.connect(self.filename, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                              key TEXT PRIMARY KEY,
+                              url TEXT,
+                              status INTEGER,
+                              headers TEXT,
+                              content BLOB,
+                              size INTEGER,
+                              expires REAL,
+                              accessed REAL)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @property
+    def size(self):
+        """ Total size of the content currently stored, in bytes. """
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def ttl_for(self, url):
+        """ Return the time to live for responses from the URL supplied.
+
+        :param url: The URL being requested.
+        :returns: Time to live in seconds or None if the URL should not be cached.
+        """
+        return self.ttls.get(host_for_url(url), self.default_ttl)
+
+    @staticmethod
+    def make_key(url, params=None):
+        """ Create the key for a URL and it's parameters. Parameters are sorted and
+        any listed in :data:`SECRET_PARAMS` are removed.
+
+        :param url: The URL.
+        :param params: Dict (or sequence of pairs) of query parameters.
+        :rtype: str
+        """
+        return hashlib.sha1((url + '?' + normalise_params(params)).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """ Return the entry stored for key, or None.
+
+        :rtype: :class:`CacheEntry`
+        """
+        with self._lock:
+            row = self._db.execute("SELECT url, status, headers, content, expires "
+                                   "FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return CacheEntry(key, row[0], row[1], json.loads(row[2]), bytes(row[3]), row[4])
+
+    def store(self, key, response, ttl):
+        """ Store a response.
+
+        :param key: The key as returned by :func:`make_key`
+        :param response: The :class:`requests.Response` to store.
+        :param ttl: Time to live in seconds.
+        """
+        content = response.content
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (key, response.url, response.status_code,
+                              json.dumps(dict(response.headers)), sqlite3.Binary(content),
+                              len(content), now + ttl, now))
+            self._db.commit()
+        self.evict()
+
+    def refresh(self, key, ttl):
+        """ Extend the life of an entry following successful revalidation. """
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE responses SET expires = ?, accessed = ? WHERE key = ?",
+                             (now + ttl, now, key))
+            self._db.commit()
+
+    def discard(self, key):
+        """ Remove a single entry. """
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+
+    def evict(self):
+        """ Remove the least recently used entries until the total size is below
+        max_size.
+
+        :returns: Number of entries removed.
+        :rtype: int
+        """
+        removed = 0
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_size:
+                return 0
+            for key, size in self._db.execute("SELECT key, size FROM responses "
+                                              "ORDER BY accessed").fetchall():
+                if total <= self.max_size:
+                    break
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                removed += 1
+            self._db.commit()
+        self.logger.debug("Evicted %d entries from the response cache", removed)
+        return removed
+
+    def clear(self):
+        """ Remove all entries from the cache. """
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._db.execute("VACUUM")
+
+    def close(self):
+        """ Close the underlying database. """
+        with self._lock:
+            self._db.close()
+
+
+_RESPONSE_CACHE = None
+
+
+def get_response_cache():
+    """ Return the :class:`ResponseCache` in use, or None if caching is disabled.
+
+    :rtype: :class:`ResponseCache`
+    """
+    return _RESPONSE_CACHE
+
+
+def set_response_cache(cache):
+    """ Set the :class:`ResponseCache` to be used. Passing None disables caching.
+
+    :param cache: The :class:`ResponseCache` instance or None
+    """
+    global _RESPONSE_CACHE
+    _RESPONSE_CACHE = cache
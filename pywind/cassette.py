@@ -0,0 +1,196 @@
+# coding=utf-8
+
+# This is free and unencumbered software released into the public domain.
+#
+# Anyone is free to copy, modify, publish, use, compile, sell, or
+# distribute this software, either in source code form or as a compiled
+# binary, for any purpose, commercial or non-commercial, and by any
+# means.
+
+# In jurisdictions that recognize copyright laws, the author or authors
+# of this software dedicate any and all copyright interest in the
+# software to the public domain. We make this dedication for the benefit
+# of the public at large and to the detriment of our heirs and
+# successors. We intend this dedication to be an overt act of
+# relinquishment in perpetuity of all present and future rights to this
+# software under copyright law.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# For more information, please refer to <http://unlicense.org/>
+
+"""
+Record and replay of the requests made by :func:`pywind.utils.get_or_post_a_url`.
+
+In record mode every request and response is kept and written to a compressed archive
+when the cassette is closed. In replay mode the archive is loaded into memory and
+responses are served from it without any network access, so complete commands can be
+profiled or tested on an isolated machine.
+
+.. code::
+
+   >>> from pywind.cassette import Cassette, set_cassette
+   >>> set_cassette(Cassette('elexon_bm_data.zip', 'record'))
+   ...
+   >>> get_cassette().close()
+
+When the same request is made more than once the responses are replayed in the order
+they were recorded.
+"""
+
+import hashlib
+import json
+import threading
+import zipfile
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+import requests
+from requests.cookies import cookiejar_from_dict
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from pywind.cache import normalise_params
+from pywind.retry import RequestError
+
+
+def request_key(url, post=False, params=None, data=None):
+    """ Create the key used to identify a request. Secret parameters are excluded.
+
+    :param url: The URL requested.
+    :param post: True for a POST request.
+    :param params: Dict (or sequence of pairs) of query parameters.
+    :param data: Body of a POST request.
+    :rtype: str
+    """
+    key = "{} {}?{}".format('POST' if post else 'GET', url, normalise_params(params))
+    if data is not None:
+        if isinstance(data, dict):
+            data = urlencode(sorted(data.items()))
+        if not isinstance(data, bytes):
+            data = str(data).encode('utf-8')
+        key += ' ' + hashlib.sha1(data).hexdigest()
+    return key
+
+
+class Cassette(object):
+    """ Archive of recorded responses.
+
+    :param filename: Filename of the archive.
+    :param mode: Either 'record' or 'replay'.
+    """
+    INDEX = 'index.json'
+
+    def __init__(self, filename, mode='replay'):
+        if mode not in ('record', 'replay'):
+            raise ValueError("Cassette mode must be either 'record' or 'replay', not {}".format(mode))
+        self.filename = filename
+        self.mode = mode
+        self.responses = {}
+        self.played = {}
+        self._lock = threading.Lock()
+        if mode == 'replay':
+            self.load()
+
+    def __len__(self):
+        return sum(len(resps) for resps in self.responses.values())
+
+    @property
+    def recording(self):
+        """ True if the cassette is recording. """
+        return self.mode == 'record'
+
+    def load(self):
+        """ Load all responses from the archive into memory. """
+        self.responses = {}
+        self.played = {}
+        with zipfile.ZipFile(self.filename, 'r') as zfh:
+            for entry in json.loads(zfh.read(self.INDEX).decode('utf-8')):
+                entry['content'] = zfh.read(entry.pop('body'))
+                self.responses.setdefault(entry.pop('key'), []).append(entry)
+
+    def save(self):
+        """ Write the recorded responses to the archive. """
+        index = []
+        with zipfile.ZipFile(self.filename, 'w', zipfile.ZIP_DEFLATED) as zfh:
+            for key, resps in self.responses.items():
+                for resp in resps:
+                    body = "{:06d}.body".format(len(index))
+                    zfh.writestr(body, resp['content'])
+                    entry = {k: v for k, v in resp.items() if k != 'content'}
+                    entry.update({'key': key, 'body': body})
+                    index.append(entry)
+            zfh.writestr(self.INDEX, json.dumps(index, indent=1))
+
+    def close(self):
+        """ Finish using the cassette, saving it if recording. """
+        if self.recording:
+            self.save()
+
+    def record(self, key, response):
+        """ Record a response.
+
+        :param key: The key from :func:`request_key`
+        :param response: The :class:`requests.Response` to record.
+        """
+        entry = {'url': response.url,
+                 'status': response.status_code,
+                 'headers': dict(response.headers),
+                 'cookies': response.cookies.get_dict(),
+                 'content': response.content}
+        with self._lock:
+            self.responses.setdefault(key, []).append(entry)
+
+    def play(self, key):
+        """ Return the next recorded response for key.
+
+        :param key: The key from :func:`request_key`
+        :rtype: :class:`requests.Response`
+        :raises: :exc:`pywind.retry.RequestError` if no response was recorded.
+        """
+        resps = self.responses.get(key)
+        if not resps:
+            raise RequestError("No recorded response available for {}".format(key))
+        with self._lock:
+            pos = self.played.get(key, 0)
+            self.played[key] = pos + 1
+        entry = resps[min(pos, len(resps) - 1)]
+
+        resp = requests.Response()
+        resp.status_code = entry['status']
+        resp.url = entry['url']
+        resp.headers = CaseInsensitiveDict(entry['headers'])
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.cookies = cookiejar_from_dict(entry['cookies'])
+        resp._content = entry['content']
+        resp._content_consumed = True
+        return resp
+
+
+_CASSETTE = None
+
+
+def get_cassette():
+    """ Return the :class:`Cassette` in use, or None.
+
+    :rtype: :class:`Cassette`
+    """
+    return _CASSETTE
+
+
+def set_cassette(cassette):
+    """ Set the :class:`Cassette` to use. Passing None returns to normal operation.
+
+    :param cassette: The :class:`Cassette` instance or None
+    """
+    global _CASSETTE
+    _CASSETTE = cassette
@@ -32,12 +32,16 @@ from __future__ import print_function
 import sys
 import os
 
+from pywind.cache import ResponseCache, set_response_cache
+from pywind.cassette import Cassette, set_cassette
 from pywind.decc.cmd import decc_extract
 from pywind.elexon.cmd import elexon_b1320, elexon_b1420, elexon_b1330, \
-                              elexon_generation_inst, elexon_sbp, \
+                              elexon_generation_inst, elexon_generation_live, elexon_sbp, \
                               elexon_bm_data, elexon_bm_unit, elexon_b1610, \
-                              elexon_b1630, elexon_uou2t52w
+                              elexon_b1630, elexon_uou2t52w, elexon_capacity_factors, \
+                              elexon_balancing_costs
 from pywind.log import setup_logging
+from pywind.ratelimit import RateLimiter, set_rate_limiter
 from pywind.ofgem.cmd import ofgem_certificate_search,\
     ofgem_station_search
 from pywind.roc.cmd import roc_prices
@@ -50,6 +54,7 @@ COMMANDS = [
     ofgem_certificate_search,
     ofgem_station_search,
     elexon_generation_inst,
+    elexon_generation_live,
     elexon_b1320,
     elexon_b1330,
     elexon_b1420,
@@ -58,7 +63,9 @@ COMMANDS = [
     elexon_sbp,
     elexon_bm_data,
     elexon_bm_unit,
-    elexon_uou2t52w
+    elexon_uou2t52w,
+    elexon_capacity_factors,
+    elexon_balancing_costs
 ]
 COMMAND_NAMES = {}
 
@@ -97,31 +104,55 @@ def main():
         with open(args.apikey, 'r') as apifh:
             args.apikey = apifh.read().strip()
 
-    cmd = COMMAND_NAMES.get(args.command, None)
-    if cmd is None:
-        if args.command is not None:
-            print("Invalid command specified: {}".format(args.command))
-        print(commands_help())
-        sys.exit(0)
-
-    setup_logging(args.debug, request_logging=args.request_debug,
-                  filename=args.log_filename)
-
-    print("\n{}\n{}\n".format(cmd['name'], "=" * len(cmd['name'])))
-    obj = cmd['function'](args)
-
-    if args.save:
-        filename = args.original or args.command
-        if hasattr(obj, 'save_original'):
-            if obj.save_original(filename) is False:
-                print("Unable to save the downloaded data :-(")
+    if args.clear_cache or not args.no_cache:
+        cache = ResponseCache()
+        if args.clear_cache:
+            cache.clear()
+            print("Local cache of downloaded data cleared.")
+        if not args.no_cache:
+            set_response_cache(cache)
+
+    if args.rate_limits is not None:
+        set_rate_limiter(RateLimiter.from_config(args.rate_limits))
+
+    cassette = None
+    if args.record is not None:
+        cassette = Cassette(args.record, 'record')
+    elif args.replay is not None:
+        cassette = Cassette(args.replay, 'replay')
+    set_cassette(cassette)
+
+    # The recording is saved however the command finishes.
+    try:
+        cmd = COMMAND_NAMES.get(args.command, None)
+        if cmd is None:
+            if args.command is not None:
+                print("Invalid command specified: {}".format(args.command))
+            print(commands_help())
+            sys.exit(0)
+
+        setup_logging(args.debug, request_logging=args.request_debug,
+                      filename=args.log_filename)
+
+        print("\n{}\n{}\n".format(cmd['name'], "=" * len(cmd['name'])))
+        obj = cmd['function'](args)
+
+        if args.save:
+            filename = args.original or args.command
+            if hasattr(obj, 'save_original'):
+                if obj.save_original(filename) is False:
+                    print("Unable to save the downloaded data :-(")
+                else:
+                    print("Downloaded data saved to {}".format(filename))
             else:
-                print("Downloaded data saved to {}".format(filename))
-        else:
-            print("Saving data is not supported for this command.")
-
-    if args.export is not None:
-        export_to_file(args, obj)
+                print("Saving data is not supported for this command.")
+
+        if args.export is not None:
+            export_to_file(args, obj)
+    finally:
+        if cassette is not None:
+            cassette.close()
+            set_cassette(None)
 
 
 if __name__ == '__main__':
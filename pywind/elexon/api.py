@@ -5,93 +5,438 @@ https://www.elexon.co.uk/documents/training-guidance/bsc-guidance-notes/bmrs-api
 """
 from __future__ import print_function
 
-from datetime import datetime
+import asyncio
+import csv
+import io
+from datetime import datetime, date, timedelta
+from itertools import zip_longest
 
-from pywind.utils import get_or_post_a_url, parse_response_as_xml, map_xml_to_dict
+import numpy as np
+from lxml import etree
+
+from pywind.cache import FOREVER, get_response_cache
+from pywind.elexon.columns import ColumnarItems, make_frame
+from pywind.elexon.revisions import RevisionIndex
+from pywind.session import get_async_session_pool
+from pywind.settlement import as_date, settlement_days, settlement_periods, period_start
+from pywind.utils import get_or_post_a_url, aget_a_url, iterparse_response, xml_mapper_for
 
 
 def make_elexon_url(report, version):
     return "https://api.bmreports.com/BMRS/{}/{}".format(report.upper(), version)
 
 
+async def agather_data(calls, concurrency=10, close=True):
+    """ Run :func:`ElexonAPI.aget_data` for many report/parameter combinations, with at
+    most concurrency requests in flight at once. Unless close is False, the pooled aiohttp
+    sessions for the running event loop are closed once all the requests have finished.
+
+    .. code::
+
+       >>> apis = [B1610(apikey) for period in range(1, 49)]
+       >>> results = await agather_data([(api, {'SettlementDate': dtt, 'Period': period})
+       ...                               for period, api in enumerate(apis, 1)])
+
+    :param calls: Iterable of (api object, params dict) pairs.
+    :param concurrency: Maximum number of concurrent requests.
+    :param close: Whether to close the pooled sessions when finished. Pass False if more
+                  requests will be made from the same event loop.
+    :returns: List of results in the same order as calls. Each is the value returned
+              by aget_data or the exception raised, so failed requests can be retried.
+    :rtype: list
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _get_data(api, params):
+        async with semaphore:
+            return await api.aget_data(**params)
+
+    try:
+        return await asyncio.gather(*[_get_data(api, params) for api, params in calls],
+                                    return_exceptions=True)
+    finally:
+        if close:
+            await get_async_session_pool().close()
+
+
+def _csv_name(name):
+    """ Normalise a CSV column title or XML element name for comparison. """
+    return ''.join(ch for ch in name.lower() if ch.isalnum())
+
+
+def _csv_value(name, val):
+    """ CSV responses give dates as YYYYMMDD and times as YYYYMMDDHHMMSS, so convert
+        them to the formats used in XML responses.
+    """
+    lname = name.lower()
+    if ('date' in lname or 'time' in lname) and val.isdigit():
+        if len(val) == 8:
+            return "{}-{}-{}".format(val[:4], val[4:6], val[6:])
+        if len(val) == 14:
+            return "{}-{}-{} {}:{}:{}".format(val[:4], val[4:6], val[6:8], val[8:10], val[10:12], val[12:])
+    return val
+
+
+def _csv_column(name, values, converter, dflt):
+    """ Convert the values of a CSV column as :class:`pywind.utils.XmlMapper` would
+        convert the same values found in XML. Columns usually repeat a small number of
+        values, so each distinct value is only converted once. Returns a list, or an
+        object array if the values were given as an array or have no missing values.
+    """
+    lname = name.lower()
+    is_temporal = 'date' in lname or 'time' in lname
+
+    def _convert(val):
+        if val is None:
+            return None
+        if is_temporal:
+            val = _csv_value(name, val)
+        val = val.strip()
+        return converter(val) if len(val) > 0 else dflt
+
+    if not isinstance(values, np.ndarray):
+        if len(values) == 0 or None in values:
+            return [_convert(val) for val in values]
+        values = np.array(values)
+    distinct, inverse = np.unique(values, return_inverse=True)
+    converted = np.empty(len(distinct), dtype=object)
+    converted[:] = [_convert(val) for val in distinct.tolist()]
+    return converted[inverse.reshape(-1)]
+
+
+def _plan_days(fromdate, todate, date_param, **extra):
+    """ Plan one request per day. """
+    return [dict({date_param: day}, **extra) for day in settlement_days(fromdate, todate)]
+
+
+def _plan_periods(fromdate, todate, date_param, period_param):
+    """ Plan one request per settlement period, allowing for clock change days. """
+    return [{date_param: day, period_param: period}
+            for day in settlement_days(fromdate, todate) for period in settlement_periods(day)]
+
+
+def _plan_ranges(fromdate, todate, from_param, to_param, days):
+    """ Plan requests that each cover a range of up to days dates. """
+    plan = []
+    while fromdate <= todate:
+        finish = min(todate, fromdate + timedelta(days=days - 1))
+        plan.append({from_param: fromdate, to_param: finish})
+        fromdate = finish + timedelta(days=1)
+    return plan
+
+
 class ElexonAPI(object):
     XML_MAPPING = None
     MULTI_RESULTS = []
+    # Types of fields returned as strings, used when storing records in columns.
+    COLUMN_TYPES = {}
+    # Fields identifying a record for reports that include revisions. Only the latest
+    # revision of each record is kept in items, using the RevisionIndex in the
+    # revisions member, see pywind.elexon.revisions.
+    REVISION_KEYS = None
+    # Format requested from the API, either 'xml' or 'csv'. Only reports with an
+    # XML_MAPPING and a single result set can use csv, see use_csv.
+    SERVICE_TYPE = 'xml'
+    # Data for dates older than this is not expected to change, so is cached forever.
+    HISTORIC_AGE = timedelta(days=28)
 
     def __init__(self, apikey=None, report=None):
         self.report = report
         self.version = 'v1'
         self.apikey = apikey
-        self.items = []
         self.multi = {}
+        self.session = None
+        self.columnar = False
+        self.items = self._new_items()
+        self.revisions = None
+        self.service_type = self.SERVICE_TYPE
 
     def __len__(self):
         """ Returns the number of items available. """
         return len(self.items)
 
+    def use_columns(self):
+        """ Store records in :class:`pywind.elexon.columns.ColumnarItems` rather than lists
+            of dicts. Any records already retrieved are converted. Returns the object, so
+            can be chained, e.g.
+
+            >>> api = B1610(apikey).use_columns()
+
+            Fields listed in COLUMN_TYPES are converted from strings as they are stored,
+            so records read back from the columns have int or float values for them
+            (e.g. the FUELINST fuel types and B1610 quantity) where the dicts held in a
+            list have the strings returned by the API.
+        """
+        self.columnar = True
+        if not isinstance(self.items, ColumnarItems):
+            self.items = ColumnarItems(self.items, self.COLUMN_TYPES)
+        for name, items in self.multi.items():
+            if not isinstance(items, ColumnarItems):
+                self.multi[name] = ColumnarItems(items, self.COLUMN_TYPES)
+        return self
+
+    def use_csv(self, enable=True):
+        """ Request CSV rather than XML responses, which are smaller and are converted a
+            column at a time. Pass False to request XML. Returns the object, so can be
+            chained, e.g.
+
+            >>> api = FUELINST(apikey).use_csv()
+
+            :raises: :exc:`ValueError` if the report can only be requested as XML.
+        """
+        if enable:
+            reason = self._csv_unsupported()
+            if reason is not None:
+                raise ValueError(reason)
+        self.service_type = 'csv' if enable else 'xml'
+        return self
+
+    def _csv_unsupported(self):
+        """ Return the reason the report cannot be requested as CSV, or None. """
+        if self.MULTI_RESULTS:
+            return "The {} report has several result sets, so can only be requested " \
+                   "as XML.".format(self.report)
+        if self.XML_MAPPING is None:
+            return "The {} report has no XML_MAPPING to match the CSV columns to, so can " \
+                   "only be requested as XML.".format(self.report)
+        return None
+
+    def to_frame(self, result_set=None):
+        """ Return the records as a :class:`pandas.DataFrame` with typed columns. See
+            :func:`pywind.elexon.columns.make_frame` for the types used. Records stored
+            in columns (see :func:`use_columns`) are used without creating any dicts,
+            otherwise the frame is built from the dicts a column at a time.
+
+            For reports with multiple result sets, the result_set name selects one of
+            them. If it is not given, all result sets are included.
+        """
+        if result_set is not None:
+            return make_frame(self.multi[result_set], self.COLUMN_TYPES)
+        if not self.MULTI_RESULTS:
+            return make_frame(self.items, self.COLUMN_TYPES)
+        parts = [self.multi[name] for name in self.MULTI_RESULTS if name in self.multi]
+        if self.columnar:
+            items = ColumnarItems(types=self.COLUMN_TYPES)
+            items.extend_columns(parts)
+        else:
+            items = [item for part in parts for item in part]
+        return make_frame(items, self.COLUMN_TYPES)
+
+    def _new_items(self):
+        """ Return an empty container for records. """
+        if self.columnar:
+            return ColumnarItems(types=self.COLUMN_TYPES)
+        return []
+
+    def add_items(self, items):
+        """ Add records to items. For reports with REVISION_KEYS only the latest revision
+            of each record is kept. When records are stored in columns this only applies
+            to the records being added, as records already stored cannot be replaced.
+        """
+        if not self.REVISION_KEYS:
+            self.items.extend(items)
+        elif self.columnar:
+            self.items.extend(RevisionIndex(self.REVISION_KEYS, items))
+        else:
+            if self.revisions is None or self.revisions.records is not self.items:
+                self.revisions = RevisionIndex(self.REVISION_KEYS, records=self.items)
+            self.revisions.extend(items)
+
     def get_data(self, **params):
         """ Get data from the Elexon servers and attempt to parse it into a series of
             dicts each representing a record. Parameters are passed as a dict.
             Multiple sets of data are created in the multi member, single sets in items.
         """
+        url = self._prepare_request(params)
+        req = get_or_post_a_url(url, params=params, session=self.session,
+                                cache_ttl=self.cache_ttl(params), stream=True)
+        return self.process_response(req, url, params)
+
+    async def aget_data(self, **params):
+        """ asyncio version of :func:`get_data`, e.g.
+
+            >>> api = FUELINST(apikey)
+            >>> await api.aget_data(FromDateTime=start, ToDateTime=finish)
+            True
+
+            The request is made using :func:`pywind.utils.aget_a_url`.
+        """
+        url = self._prepare_request(params)
+        req = await aget_a_url(url, params=params, cache_ttl=self.cache_ttl(params))
+        return self.process_response(req, url, params)
+
+    def _prepare_request(self, params):
+        """ Check the object is usable, add the standard parameters and return the URL. """
         if self.report is None:
             raise Exception("ElexonAPI objects require the report be set before use.")
         if self.apikey is None:
             raise Exception("An API key is required to use the Elexon API accessor functionality")
+        if self.service_type == 'csv' and self._csv_unsupported() is not None:
+            raise ValueError(self._csv_unsupported())
+
+        params.update({'APIKey': self.apikey, 'ServiceType': self.service_type})
+        return make_elexon_url(self.report, self.version)
 
-        url = make_elexon_url(self.report, self.version)
-        params.update({'APIKey': self.apikey, 'ServiceType': 'xml'})
-#        print(params)
-        req = get_or_post_a_url(url, params=params)
+    def process_response(self, req, url, params):
+        """ Parse the response to a request and add the records it contains. """
 #        print(req.content)
-        xml = parse_response_as_xml(req)
-        http = xml.xpath('/response/responseMetadata/httpCode')
-#        print(http)
-        response_code = int(http[0].text)
-        if response_code == 204:
-            print("No content returned, but no error reported.")
-            return True
-        elif response_code != 200:
-            print("No data returned. Error reported.")
-            err = xml.xpath('/response/responseMetadata/description')
-            print(err[0].text)
+        # Errors are always returned as XML.
+        if self.service_type == 'csv' and not req.text.lstrip().startswith('<'):
+            return self.process_csv(csv.reader(io.StringIO(req.text)))
+
+        # The response is parsed as it is downloaded, with each item element discarded
+        # once the record has been created.
+        elements = iterparse_response(req, ('responseMetadata', 'item'), recover=True)
+        try:
+            metadata = next(elements, None)
+            if metadata is None or metadata.tag != 'responseMetadata':
+                raise ValueError("The response to {} has no responseMetadata".format(url))
+            response_code = int(metadata.findtext('httpCode'))
+            if response_code == 204:
+                print("No content returned, but no error reported.")
+                return True
+            elif response_code != 200:
+                print("No data returned. Error reported.")
+                print(metadata.findtext('description'))
+                self._discard_cached(url, params)
+                return False
+
+            if not self.MULTI_RESULTS:
+                self.add_items(self._make_item(item) for item in elements
+                               if item.getparent().tag == 'responseList')
+            else:
+                # Route each item to its result set using the tag of the element
+                # containing the responseList.
+                for name in self.MULTI_RESULTS:
+                    self.multi[name] = self._new_items()
+                for item in elements:
+                    result_set = self.multi.get(item.getparent().getparent().tag)
+                    if result_set is not None:
+                        result_set.append(self._make_item(item))
+        except etree.XMLSyntaxError:
+            print("Unable to parse the response.")
+            self._discard_cached(url, params)
             return False
 
-        if not self.MULTI_RESULTS:
-            for item in xml.xpath('/response/responseBody/responseList/item'):
-                item_dict = map_xml_to_dict(item, self.XML_MAPPING)
-
-                if 'activeflag' in item_dict:
-                   item_dict['activeflag'] = item_dict['activeflag'] == 'Y'
-                if 'settlementperiod' in item_dict:
-                    item_dict['settlementperiod'] = int(item_dict['settlementperiod'])
-#                if item_dict.get('nominal', None) is None:
-#                    continue
-
-                self.post_item_cleanup(item_dict)
-                self.items.append(item_dict)
-        else:
-            for result_set in self.MULTI_RESULTS:
-                self.multi[result_set[0]] = []
-                for item in xml.xpath(result_set[1]):
-                    item_dict = map_xml_to_dict(item, self.XML_MAPPING)
-                    if 'activeFlags' in item_dict:
-                       item_dict['activeflag'] = item_dict['activeflag'] == 'Y'
-                    if 'settlementperiod' in item_dict:
-                        item_dict['settlementperiod'] = int(item_dict['settlementperiod'])
-
-                    self.post_item_cleanup(item_dict)
-#                    print(item_dict)
-                    self.multi[result_set[0]].append(item_dict)
+        return True
 
+    @staticmethod
+    def _discard_cached(url, params):
+        """ Remove a response that could not be used from the cache. """
+        cache = get_response_cache()
+        if cache is not None:
+            cache.discard(cache.make_key(url, params))
+
+    def process_csv(self, rows):
+        """ Add the records from the rows of a CSV response. Columns are matched to the
+            XML_MAPPING using the column titles (on the row starting with '*') if
+            present, otherwise they are taken to be in the same order as the mapping.
+            The records are identical to those from the XML response.
+
+            Each column is converted in a single pass. When records are stored in columns
+            and the report has no revisions, the columns are added without creating a
+            dict for each record, provided post_columns_cleanup allows it.
+        """
+        columns = self._csv_columns(rows)
+        if self.columnar and not self.REVISION_KEYS and self.post_columns_cleanup(columns):
+            self.items.extend_columns([ColumnarItems.from_columns(columns, self.COLUMN_TYPES)])
+        else:
+            self.add_items(self._csv_items(columns))
         return True
 
+    def _csv_columns(self, rows):
+        """ Return a dict of field name to the list of values in each column of a CSV
+            response, converted as the values from the XML response would be.
+        """
+        mapper = xml_mapper_for(self.__class__)
+        names = [field[0] for field in mapper.fields]
+        titles = names
+        data = []
+        for row in rows:
+            if len(row) == 0 or row[0] in ('HDR', 'FTR'):
+                continue
+            if row[0].startswith('*'):
+                lookup = {_csv_name(name): name for name in names}
+                titles = [lookup.get(_csv_name(title)) for title in row]
+                continue
+            data.append(row)
+        if len(set(map(len, data))) == 1:
+            # A single array of strings, split into columns without copying.
+            table = np.array(data)
+            raw = {title: table[:, idx] for idx, title in enumerate(titles[:table.shape[1]])}
+        else:
+            raw = dict(zip(titles, zip_longest(*data)))
+        columns = {}
+        for xml_name, dict_key, converter, dflt in mapper.fields:
+            columns[dict_key] = _csv_column(xml_name, raw.get(xml_name, [None] * len(data)),
+                                            converter, dflt)
+        # The standard conversions applied by _finish_item.
+        if 'activeflag' in columns:
+            columns['activeflag'] = np.array(columns['activeflag'], dtype=object) == 'Y'
+        if 'settlementperiod' in columns:
+            columns['settlementperiod'] = np.array(columns['settlementperiod']).astype(np.int64)
+        return columns
+
+    def _csv_items(self, columns):
+        """ Generator of records from the columns of a CSV response. """
+        names = list(columns)
+        values = [col.tolist() if isinstance(col, np.ndarray) else col for col in columns.values()]
+        for row in zip(*values):
+            item = dict(zip(names, row))
+            self.post_item_cleanup(item)
+            yield item
+
+    def _make_item(self, item):
+        """ Create the dict for a single item element. """
+        return self._finish_item(xml_mapper_for(self.__class__)(item))
+
+    def _finish_item(self, item_dict):
+        """ Apply the standard conversions and post_item_cleanup to a new record. """
+        if 'activeflag' in item_dict:
+            item_dict['activeflag'] = item_dict['activeflag'] == 'Y'
+        if 'settlementperiod' in item_dict:
+            item_dict['settlementperiod'] = int(item_dict['settlementperiod'])
+
+        self.post_item_cleanup(item_dict)
+        return item_dict
+
+    @classmethod
+    def plan_requests(cls, fromdate, todate):
+        """ Return a list of parameter dicts, in chronological order, that together cover
+            every settlement date from fromdate to todate (inclusive). Used by
+            :class:`pywind.elexon.fetch.RangeFetcher`. Reports that can be fetched for a
+            range of dates override this.
+        """
+        raise NotImplementedError("{} does not support fetching a range of dates".format(cls.__name__))
+
+    def cache_ttl(self, params):
+        """ Return the time to live for a cached response to a request using params.
+            Requests where every date is older than HISTORIC_AGE can be cached forever,
+            otherwise None is returned and the default for the host is used.
+        """
+        dates = [as_date(params[key]) for key in params if 'date' in key.lower()]
+        if not dates or None in dates:
+            return None
+        if max(dates) < date.today() - self.HISTORIC_AGE:
+            return FOREVER
+        return None
+
     def post_item_cleanup(self, item):
         """ Holder for a subclassed function to transform the members of the basic dict 
             into something more useful.
         """
         return
 
+    def post_columns_cleanup(self, columns):
+        """ Column version of post_item_cleanup, used when the records of a CSV response
+            are stored in columns. The columns are a dict of field name to list (or array)
+            of values, which can be changed or added to.
+
+            Returns True if the columns can be used. Reports that have a post_item_cleanup
+            but do not provide this return False, so a dict is created for each record.
+        """
+        return type(self).post_item_cleanup is ElexonAPI.post_item_cleanup
+
 
 class B1320(ElexonAPI):
     XML_MAPPING = [
@@ -109,10 +454,15 @@ class B1320(ElexonAPI):
         'documentID',
         'documentRevNum'
     ]
+    REVISION_KEYS = ('timeseriesid', 'settlementdate', 'settlementperiod')
 
     def __init__(self, apikey):
         super(B1320, self).__init__(apikey, 'B1320')
 
+    @classmethod
+    def plan_requests(cls, fromdate, todate):
+        return _plan_periods(fromdate, todate, 'SettlementDate', 'Period')
+
     def post_item_cleanup(self, item):
         if 'activeflag' in item:
             item['activeflag'] = item['activeflag'] == 'Y'
@@ -174,13 +524,27 @@ class B1420(ElexonAPI):
         'registeredResourceName',
         'activeFlag',
         'documentID',
+        'documentRevNum',
         'implementationDate',
         'powerSystemResourceType'
     ]
+    REVISION_KEYS = ('timeseriesid', 'year', 'bmunitid', 'implementationdate')
 
     def __init__(self, apikey):
         super(B1420, self).__init__(apikey, 'B1420')
 
+    def cache_ttl(self, params):
+        """ Capacities for previous years are not expected to change, so are cached forever.
+            The current year is cached for a day.
+        """
+        try:
+            year = int(params.get('Year'))
+        except (TypeError, ValueError):
+            return None
+        if year < date.today().year:
+            return FOREVER
+        return 24 * 60 * 60
+
     def post_item_cleanup(self, item):
         if item.get('nominal', None) is not None:
             item['nominal'] = float(item['nominal'])
@@ -201,9 +565,15 @@ class B1420(ElexonAPI):
 
 
 class B1610(ElexonAPI):
+    REVISION_KEYS = ('timeseriesid', 'bmunitid', 'settlementdate', 'settlementperiod')
+
     def __init__(self, apikey):
         super(B1610, self).__init__(apikey, 'B1610')
 
+    @classmethod
+    def plan_requests(cls, fromdate, todate):
+        return _plan_periods(fromdate, todate, 'SettlementDate', 'Period')
+
     def post_item_cleanup(self, item):
         item['quantity'] = float(item['quantity'])
 
@@ -233,10 +603,16 @@ class B1630(ElexonAPI):
         'documentID',
         'documentRevNum'
     ]
+    COLUMN_TYPES = {'quantity': 'float'}
+    REVISION_KEYS = ('timeseriesid', 'powersystemresourcetype', 'settlementdate', 'settlementperiod')
 
     def __init__(self, apikey):
         super(B1630, self).__init__(apikey, 'B1630')
 
+    @classmethod
+    def plan_requests(cls, fromdate, todate):
+        return _plan_periods(fromdate, todate, 'SettlementDate', 'Period')
+
     def rows(self):
         for item in self.items:
             row = item.copy()
@@ -246,9 +622,16 @@ class B1630(ElexonAPI):
 
 class DERSYSDATA(ElexonAPI):
     """ Derived System Data """
+    # Maximum number of days requested at once when fetching a range.
+    RANGE_DAYS = 7
+
     def __init__(self, apikey=None):
         super(DERSYSDATA, self).__init__(apikey, 'DERSYSDATA')
 
+    @classmethod
+    def plan_requests(cls, fromdate, todate):
+        return _plan_ranges(fromdate, todate, 'FromSettlementDate', 'ToSettlementDate', cls.RANGE_DAYS)
+
     def post_item_cleanup(self, item):
         item['settlementdate'] = datetime.strptime(item['settlementdate'], "%Y-%m-%d").date()
         item['activeflag'] = item['activeflag'] == 'Y'
@@ -282,30 +665,61 @@ class FUELINST(ElexonAPI):
         'intew',
         'activeFlag'
     ]
+    # Fields giving the output of each fuel type, in MW.
+    FUELS = ('ccgt', 'oil', 'coal', 'nuclear', 'wind', 'ps', 'npshyd', 'ocgt', 'other',
+             'intfr', 'intirl', 'intned', 'intew')
+    COLUMN_TYPES = {fuel: 'int' for fuel in FUELS}
+    SERVICE_TYPE = 'csv'
 
     def __init__(self, apikey=None):
         super(FUELINST, self).__init__(apikey, 'FUELINST')
 
+    @classmethod
+    def plan_requests(cls, fromdate, todate):
+        # Request each settlement day, from the start of period 1 to the last 5 minute
+        # reading before the start of the next day.
+        return [{'FromDateTime': period_start(day, 1),
+                 'ToDateTime': period_start(day + timedelta(days=1), 1) - timedelta(minutes=5)}
+                for day in settlement_days(fromdate, todate)]
+
+    @classmethod
+    def plan_datetimes(cls, fromdatetime, todatetime):
+        """ Return a list of parameter dicts, in chronological order, that together cover
+            fromdatetime to todatetime with requests of no more than a day each.
+        """
+        plan = []
+        start = fromdatetime
+        while True:
+            finish = min(start + timedelta(days=1), todatetime)
+            plan.append({'FromDateTime': start, 'ToDateTime': finish})
+            if finish >= todatetime:
+                return plan
+            start = finish + timedelta(seconds=1)
+
     def post_item_cleanup(self, item):
         dttm = datetime.strptime(item['publishingperiodcommencingtime'], "%Y-%m-%d %H:%M:%S")
         item['date'] = dttm.date()
         item['time'] = dttm.time()
 
+    def post_columns_cleanup(self, columns):
+        times = np.array(columns['publishingperiodcommencingtime'], dtype='datetime64[s]')
+        columns['date'] = times.astype('datetime64[D]')
+        columns['time'] = (times - columns['date']).astype('timedelta64[us]')
+        return True
+
 
 class DERBMDATA(ElexonAPI):
     """ Derived Balancing Mechanism Data """
-    MULTI_RESULTS = (
-        ('bav', '/response/responseBody/bav/responseList/item'),
-        ('oav', '/response/responseBody/oav/responseList/item'),
-        ('ipbav', '/response/responseBody/ipbav/responseList/item'),
-        ('ipoav', '/response/responseBody/ipoav/responseList/item'),
-        ('ipbc', '/response/responseBody/ipbc/responseList/item'),
-        ('ipoc', '/response/responseBody/ipoc/responseList/item'),
-    )
+    # Each result set is a responseList within the responseBody element of the same name.
+    MULTI_RESULTS = ('bav', 'oav', 'ipbav', 'ipoav', 'ipbc', 'ipoc')
 
     def __init__(self, apikey=None):
         super(DERBMDATA, self).__init__(apikey, 'DERBMDATA')
 
+    @classmethod
+    def plan_requests(cls, fromdate, todate):
+        return _plan_days(fromdate, todate, 'SettlementDate', SettlementPeriod='*')
+
     def post_item_cleanup(self, item):
         item['settlementperiod'] = int(item['settlementperiod'])
         for key in item:
@@ -0,0 +1,222 @@
+""" Capacity factors calculated from Elexon data.
+
+The installed capacity of each unit (the nominal value from the B1420 report) is joined
+with the metered output reported by B1610 to give the capacity factor of every unit,
+each fuel type and the fleet as a whole, for a range of settlement dates.
+
+.. code::
+
+   >>> from pywind.elexon.capacity import CapacityFactorEngine
+   >>> engine = CapacityFactorEngine(apikey, workers=8)
+   >>> factors = engine.calculate(date(2016, 1, 1), date(2016, 1, 7))
+   >>> factors.fleet()['factor']
+   0.4123
+
+B1420 is published per year, so the capacities for each year are fetched once and kept
+by the engine. Output is stored using :class:`pywind.elexon.columns.ColumnarItems` and
+the totals calculated with NumPy, so long date ranges can be handled.
+"""
+from datetime import timedelta
+
+import numpy as np
+
+from pywind.elexon.api import B1420, B1610
+from pywind.elexon.columns import ColumnarItems, ratio
+from pywind.elexon.fetch import RangeFetcher
+from pywind.settlement import get_calendar
+
+
+def unit_capacities(items):
+    """ Return the capacity of each unit from B1420 records. Where a unit has more than one
+    record the one with the latest implementation date is used.
+
+    :param items: Iterable of B1420 records.
+    :returns: Dict of unit id to (nominal capacity in MW, fuel type)
+    :rtype: dict
+    """
+    capacities = {}
+    latest = {}
+    for item in items:
+        unit = item.get('ngcbmunitid') or item.get('bmunitid')
+        if unit is None or not item.get('nominal'):
+            continue
+        implemented = item.get('implementationdate') or ''
+        if unit in latest and latest[unit] > implemented:
+            continue
+        latest[unit] = implemented
+        capacities[unit] = (item['nominal'], item.get('powersystemresourcetype') or 'Unknown')
+    return capacities
+
+
+def _unit_ids(items):
+    """ Return an object array of the unit for each B1610 record. """
+    units = np.asarray(items.column('ngcbmunitid') if 'ngcbmunitid' in items else
+                       np.full(len(items), None), dtype=object)
+    if 'bmunitid' in items:
+        missing = np.equal(units, None)
+        units[missing] = items.column('bmunitid')[missing]
+    return units
+
+
+def calculate_capacity_factors(fromdate, todate, items, capacities):
+    """ Calculate capacity factors from B1610 output and B1420 capacities.
+
+    :param fromdate: First settlement date.
+    :param todate: Last settlement date.
+    :param items: B1610 records, as a :class:`ColumnarItems` or list of dicts.
+    :param capacities: Dict of year to the result of :func:`unit_capacities` for that year.
+    :rtype: :class:`CapacityFactors`
+    """
+    if not isinstance(items, ColumnarItems):
+        items = ColumnarItems(items, B1610.COLUMN_TYPES)
+
+    calendar = get_calendar()
+    days = np.arange(np.datetime64(fromdate, 'D'), np.datetime64(todate + timedelta(days=1), 'D'))
+    hours = calendar.periods_in_day(days).astype(np.float64) / 2
+    day_years = days.astype('datetime64[Y]').astype(int) + 1970
+
+    # Every unit with a capacity in any of the years covered.
+    unit_names = sorted(set(unit for year in set(day_years.tolist()) for unit in capacities.get(year, {})))
+    index = {unit: idx for idx, unit in enumerate(unit_names)}
+    nominal = np.zeros(len(unit_names))
+    possible = np.zeros(len(unit_names))
+    fuels = np.empty(len(unit_names), dtype=object)
+    for year in sorted(set(day_years.tolist())):
+        year_hours = hours[day_years == year].sum()
+        for unit, (capacity, fuel) in capacities.get(year, {}).items():
+            idx = index[unit]
+            possible[idx] += capacity * year_hours
+            nominal[idx] = capacity
+            fuels[idx] = fuel
+
+    output = np.zeros(len(unit_names))
+    unmatched = 0
+    if len(items) > 0:
+        units = _unit_ids(items)
+        positions = np.array([index.get(unit, -1) for unit in units.tolist()], dtype=np.int64)
+        matched = positions >= 0
+        unmatched = int(len(positions) - matched.sum())
+        quantities = np.nan_to_num(items.column('quantity').astype(np.float64))
+        output = np.bincount(positions[matched], weights=quantities[matched], minlength=len(unit_names))
+
+    return CapacityFactors(fromdate, todate, np.array(unit_names, dtype=object), fuels,
+                           nominal, output, possible, unmatched)
+
+
+class CapacityFactors(object):
+    """ Capacity factors for a range of settlement dates. All arrays are in the same
+    order as units.
+
+    :param fromdate: First settlement date.
+    :param todate: Last settlement date.
+    :param units: Array of unit ids.
+    :param fuels: Array of the fuel type of each unit.
+    :param capacity: Array of the capacity of each unit in MW.
+    :param output: Array of the metered output of each unit in MWh.
+    :param possible: Array of the output of each unit at full capacity in MWh.
+    :param unmatched: Number of output records for units without a capacity.
+    """
+    def __init__(self, fromdate, todate, units, fuels, capacity, output, possible, unmatched=0):
+        self.fromdate = fromdate
+        self.todate = todate
+        self.units = units
+        self.fuels = fuels
+        self.capacity = capacity
+        self.output = output
+        self.possible = possible
+        self.unmatched = unmatched
+
+    def __len__(self):
+        return len(self.units)
+
+    @property
+    def factors(self):
+        """ Array of the capacity factor of each unit. """
+        return ratio(self.output, self.possible)
+
+    def by_unit(self):
+        """ Return a dict of unit id to a dict of fuel, capacity, output, possible and factor. """
+        factors = self.factors
+        return {unit: {'fuel': self.fuels[idx], 'capacity': self.capacity[idx],
+                       'output': self.output[idx], 'possible': self.possible[idx],
+                       'factor': factors[idx]}
+                for idx, unit in enumerate(self.units.tolist())}
+
+    def by_fuel(self):
+        """ Return a dict of fuel type to a dict of units, capacity, output, possible and
+        factor for all units using that fuel.
+        """
+        if len(self.units) == 0:
+            return {}
+        names, inverse = np.unique(self.fuels.astype(str), return_inverse=True)
+        units = np.bincount(inverse, minlength=len(names))
+        capacity = np.bincount(inverse, weights=self.capacity, minlength=len(names))
+        output = np.bincount(inverse, weights=self.output, minlength=len(names))
+        possible = np.bincount(inverse, weights=self.possible, minlength=len(names))
+        factors = ratio(output, possible)
+        return {name: {'units': int(units[idx]), 'capacity': capacity[idx], 'output': output[idx],
+                       'possible': possible[idx], 'factor': factors[idx]}
+                for idx, name in enumerate(names.tolist())}
+
+    def fleet(self):
+        """ Return a dict of units, capacity, output, possible and factor for all units. """
+        possible = self.possible.sum()
+        return {'units': len(self.units), 'capacity': self.capacity.sum(),
+                'output': self.output.sum(), 'possible': possible,
+                'factor': self.output.sum() / possible if possible else 0.0}
+
+    def rows(self):
+        """ Generator of rows for exporting, one per unit. """
+        for unit, info in sorted(self.by_unit().items()):
+            yield {'CapacityFactor': {'@unit': unit,
+                                      '@fuel': info['fuel'],
+                                      '@capacity': float(info['capacity']),
+                                      '@output': float(info['output']),
+                                      '@factor': float(info['factor'])}}
+
+
+class CapacityFactorEngine(object):
+    """ Fetch the data needed and calculate capacity factors.
+
+    :param apikey: The Elexon API key.
+    :param workers: Number of B1610 requests to run at once.
+    """
+    def __init__(self, apikey, workers=4):
+        self.apikey = apikey
+        self.workers = workers
+        self.snapshots = {}
+        self.failed = {}
+
+    def capacities(self, year):
+        """ Return the unit capacities for a year, fetching them if they have not already
+        been retrieved.
+
+        :param year: The year.
+        :rtype: dict
+        """
+        if year not in self.snapshots:
+            api = B1420(self.apikey)
+            if api.get_data(Year=year) is False:
+                return {}
+            self.snapshots[year] = unit_capacities(api.items)
+        return self.snapshots[year]
+
+    def output(self, fromdate, todate):
+        """ Fetch the B1610 output for every settlement period from fromdate to todate.
+        Any requests that failed are recorded in the failed member.
+
+        :rtype: :class:`pywind.elexon.api.B1610`
+        """
+        fetcher = RangeFetcher(B1610, self.apikey, workers=self.workers, columnar=True)
+        api = fetcher.fetch(fromdate, todate)
+        self.failed = fetcher.failed
+        return api
+
+    def calculate(self, fromdate, todate):
+        """ Calculate capacity factors for the settlement dates fromdate to todate.
+
+        :rtype: :class:`CapacityFactors`
+        """
+        capacities = {year: self.capacities(year) for year in range(fromdate.year, todate.year + 1)}
+        return calculate_capacity_factors(fromdate, todate, self.output(fromdate, todate).items,
+                                          capacities)
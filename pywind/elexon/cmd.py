@@ -3,6 +3,10 @@ from datetime import timedelta, time, datetime, date
 from pywind.elexon.api import B1420, B1330, B1320, FUELINST, \
                               DERSYSDATA, DERBMDATA, BMUNITSEARCH, \
                               B1610, B1630, UOU2T52W
+from pywind.elexon.capacity import CapacityFactorEngine
+from pywind.elexon.costs import BalancingCostRollup
+from pywind.elexon.fetch import RangeFetcher
+from pywind.elexon.live import FuelInstPoller, FileSink
 from pywind.elexon.unit import BalancingData
 from pywind.utils import StdoutFormatter, args_get_datetime
 
@@ -25,12 +29,46 @@ def get_check_data(api, params):
     return True
 
 
+def fetch_range(api_class, args, fromdate, todate, period=None):
+    """ Use a :class:`RangeFetcher` to get data for a range of dates, reporting any failures.
+        If period is given only that settlement period is requested for each day.
+    """
+    plan = api_class.plan_requests(fromdate, todate)
+    if period is not None:
+        plan = [params for params in plan if params['Period'] == int(period)]
+    return fetch_plan(api_class, args, plan)
+
+
+def fetch_plan(api_class, args, plan):
+    """ Use a :class:`RangeFetcher` to make a list of requests, reporting any failures.
+        Returns None if every request failed.
+    """
+    fetcher = RangeFetcher(api_class, args.apikey, workers=args.workers)
+    api = fetcher.fetch_requests(plan)
+    if fetcher.failed:
+        if len(fetcher.failed) == len(fetcher):
+            print("No data returned.")
+            return None
+        print("{} of {} requests failed and have been skipped.".format(len(fetcher.failed), len(fetcher)))
+    return api
+
+
+def fetch_periods(api_class, args):
+    """ Fetch every settlement period (or just --settlement-period) for the days given
+        by --date or --fromdate/--todate, using concurrent requests.
+    """
+    fromdate = args.fromdate or args.date or date.today()
+    todate = args.todate or fromdate
+    if args.settlement_period is None:
+        print("Getting all settlement periods from {} to {}".format(fromdate, todate))
+    return fetch_range(api_class, args, fromdate, todate, args.settlement_period)
+
+
 def elexon_generation_inst(args):
     """ Generation Data at 5 minute intervals from the Elexon Data Portal """
     if not check_api_key(args):
         return None
 
-    api = FUELINST(args.apikey)
     args_get_datetime(args)
     params = {}
     if args.fromdatetime is not None or args.todatetime is not None:
@@ -41,7 +79,9 @@ def elexon_generation_inst(args):
         params['FromDateTime'] = datetime.combine(date.today() - timedelta(days=2), time(23, 59))
         params['ToDateTime'] = datetime.combine(date.today() - timedelta(days=1), time(23, 59))
 
-    if get_check_data(api, params) is False:
+    # Long ranges are split into requests of a day, made concurrently.
+    api = fetch_plan(FUELINST, args, FUELINST.plan_datetimes(params['FromDateTime'], params['ToDateTime']))
+    if api is None:
         return None
 
     fmt = StdoutFormatter("10s", "6s", "7d", "7d", "7d", "7d", "7d", "7d", "7d", "7d", "7d", "7d", "7d", "7d", "7d", "7d")
@@ -68,6 +108,35 @@ def elexon_generation_inst(args):
     return api
 
 
+def elexon_generation_live(args):
+    """ Latest generation by fuel type, updated every 5 minutes
+
+        FUELINST is polled every 5 minutes and only new readings are requested and shown.
+        If --output is given, each reading is also appended to that file as a line of JSON.
+        Press Ctrl-C to stop.
+    """
+    if not check_api_key(args):
+        return None
+
+    fmt = StdoutFormatter("10s", "6s", "7d", *(["7d"] * len(FUELINST.FUELS)))
+
+    def show(rows):
+        for item in rows:
+            print(fmt.row(item['date'].strftime("%Y-%m-%d"), item['time'].strftime("%H:%M"),
+                          item['settlementperiod'], *[int(item[fuel]) for fuel in FUELINST.FUELS]))
+
+    poller = FuelInstPoller(args.apikey, history=12, sinks=[show])
+    if args.output is not None:
+        poller.add_sink(FileSink(args.output))
+    print("\n" + fmt.titles('Date', 'Time', 'Period', 'CCGT', 'Oil', 'Coal', 'Nuclear', 'Wind', 'PS', 'NPSHYD',
+                            'OCGT', 'Other', 'Int Fr', 'Int Irl', 'Int Ned', 'Int E/W'))
+    try:
+        poller.run()
+    except KeyboardInterrupt:
+        poller.stop()
+    return None
+
+
 def elexon_b1320(args):
     """ Congestion Management Measures Countertrading """
     if not check_api_key(args):
@@ -81,7 +150,7 @@ def elexon_b1320(args):
         return None
 
     if args.period is None:
-        print("You MUST supply a period for this report, from 1 to 50")
+        print("You MUST supply a period for this report, from 1 to 48 (46 or 50 on clock change days)")
         return None
 
     params = {'SettlementDate': args.date,
@@ -159,20 +228,31 @@ def elexon_b1420(args):
 
 
 def elexon_b1610(args):
-    """ Generated output by generator """
+    """ Generated output by generator
+
+        Use --all-periods, or --fromdate and --todate, to get every settlement period
+        for a date or range of dates.
+    """
     if not check_api_key(args):
         return None
 
-    api = B1610(args.apikey)
-    if args.settlement_period is None:
-        print("A settlement period should be supplied using the --settlement-period flag (range 1 to 50)."
-              "Defaulting to 1")
-    if args.date is None:
-        print("A date should be supplied using the --date flag. Format is YYYY-MM-DD. Defaulting to today")
-    if not api.get_data(**{'SettlementDate': args.date or date.today().strftime("%Y-%m-%d"),
-                           'Period': args.settlement_period or 1}):
-        print("No data returned.")
-        return None
+    if args.all_periods or args.fromdate or args.todate:
+        api = fetch_periods(B1610, args)
+        if len(api) == 0:
+            print("No data returned.")
+            return None
+    else:
+        api = B1610(args.apikey)
+        if args.settlement_period is None:
+            print("A settlement period should be supplied using the --settlement-period flag (range 1 to 48, "
+                  "46 or 50 on clock change days). "
+                  "Defaulting to 1")
+        if args.date is None:
+            print("A date should be supplied using the --date flag. Format is YYYY-MM-DD. Defaulting to today")
+        if not api.get_data(**{'SettlementDate': args.date or date.today().strftime("%Y-%m-%d"),
+                               'Period': args.settlement_period or 1}):
+            print("No data returned.")
+            return None
 
     fmt = StdoutFormatter("8s", "10s", "6s", "6s", "10.1f", "20s", "30s")
     print("\n" + fmt.titles('NGC Unit', 'Date', 'Period', 'Active', 'Output', 'Type', 'Reference'))
@@ -189,20 +269,31 @@ def elexon_b1610(args):
 
 
 def elexon_b1630(args):
-    """ Actual or forecast Wind & Solar Generation """
+    """ Actual or forecast Wind & Solar Generation
+
+        Use --all-periods, or --fromdate and --todate, to get every settlement period
+        for a date or range of dates.
+    """
     if not check_api_key(args):
         return None
 
-    api = B1630(args.apikey)
-    if args.settlement_period is None:
-        print("A settlement period should be supplied using the --settlement-period flag (range 1 to 50)."
-              "Defaulting to 1")
-    if args.date is None:
-        print("A date should be supplied using the --date flag. Format is YYYY-MM-DD. Defaulting to today")
-    if not api.get_data(**{'SettlementDate': args.date or date.today().strftime("%Y-%m-%d"),
-                           'Period': args.settlement_period or 1}):
-        print("No data returned.")
-        return None
+    if args.all_periods or args.fromdate or args.todate:
+        api = fetch_periods(B1630, args)
+        if len(api) == 0:
+            print("No data returned.")
+            return None
+    else:
+        api = B1630(args.apikey)
+        if args.settlement_period is None:
+            print("A settlement period should be supplied using the --settlement-period flag (range 1 to 48, "
+                  "46 or 50 on clock change days). "
+                  "Defaulting to 1")
+        if args.date is None:
+            print("A date should be supplied using the --date flag. Format is YYYY-MM-DD. Defaulting to today")
+        if not api.get_data(**{'SettlementDate': args.date or date.today().strftime("%Y-%m-%d"),
+                               'Period': args.settlement_period or 1}):
+            print("No data returned.")
+            return None
 
     fmt = StdoutFormatter("10s", "6s", "6s", "10.1f", "20s", "30s")
     print("\n" + fmt.titles('Date', 'Period', 'Active', 'Output', 'Type', 'Reference'))
@@ -233,7 +324,10 @@ def elexon_sbp(args):
     if args.all_periods:
         params['SettlementPeriod'] = '*'
 
-    if get_check_data(api, params) is False:
+    ndays = (params['ToSettlementDate'] - params['FromSettlementDate']).days + 1
+    if 'SettlementPeriod' not in params and ndays > DERSYSDATA.RANGE_DAYS:
+        api = fetch_range(DERSYSDATA, args, params['FromSettlementDate'], params['ToSettlementDate'])
+    elif get_check_data(api, params) is False:
         return None
 
     fmt = StdoutFormatter("15s", "^20d", "15.4f", "15.4f", "4s")
@@ -251,38 +345,41 @@ def elexon_sbp(args):
 
 
 def elexon_bm_data(args):
-    """ Derived System Prices from Elexon """
+    """ Derived System Prices from Elexon
+
+        Data is requested for --date, or each day from --fromdate to --todate, using
+        concurrent requests.
+    """
     if not check_api_key(args):
         return None
 
-    bd = BalancingData(args.apikey)
-    params = {
-        'SettlementDate': args.date or date.today() - timedelta(days=1),
-        'SettlementPeriod': args.period or 1
-    }
-    if args.all_periods:
-        params['SettlementPeriod'] = '*'
-
-    if not bd.get_data(**params):
+    fromdate = args.fromdate or args.date or date.today() - timedelta(days=1)
+    todate = args.todate or fromdate
+    period = '*' if args.all_periods else args.period or 1
+    plan = [dict(params, SettlementPeriod=period) for params in DERBMDATA.plan_requests(fromdate, todate)]
+    api = fetch_plan(DERBMDATA, args, plan)
+    if api is None:
         return None
 
-    fmt = StdoutFormatter('12s', '^7d', '16.4f', '16.4f', '18.4f', '18.4f', '12.4f', '12.4f')
-    print("\n" + fmt.titles('Unit Name', 'Period', 'Bid Volume', 'Offer Volume',
+    bd = BalancingData(args.apikey)
+    bd.add(api)
+    agg = bd.aggregator
+    unit_idx = agg.unit_indexes
+    day_idx = agg.day_indexes
+    periods = agg.periods
+    bid_rates, offer_rates = agg.rates()
+
+    fmt = StdoutFormatter('12s', '12s', '^7d', '16.4f', '16.4f', '18.4f', '18.4f', '12.4f', '12.4f')
+    print("\n" + fmt.titles('Unit Name', 'Date', 'Period', 'Bid Volume', 'Offer Volume',
                             'Bid Cashflow', 'Offer Cashflow', 'Bid Rate', 'Offer Rate'))
-    for unit_name in sorted(bd.units):
-        unit = bd.units[unit_name]
-        for period in sorted(unit.periods):
-            pd = unit.periods[period]
-            print(fmt.row(unit.unit,
-                          period,
-                          pd.bid_volume,
-                          pd.offer_volume,
-                          pd.bid_cashflow,
-                          pd.offer_cashflow,
-                          pd.bid_rate,
-                          pd.offer_rate))
-
-    return bd.api
+    # Rows are in unit, day and period order, with units in the order first seen.
+    for row in sorted(range(len(agg)), key=lambda row: (agg.units[unit_idx[row]], row)):
+        print(fmt.row(agg.units[unit_idx[row]],
+                      agg.days[day_idx[row]],
+                      int(periods[row]),
+                      *(agg.values[row].tolist() + [bid_rates[row], offer_rates[row]])))
+
+    return api
 
 
 def elexon_bm_unit(args):
@@ -322,3 +419,86 @@ def elexon_uou2t52w(args):
     if not get_check_data(api, params):
         return None
     return api
+
+
+def elexon_capacity_factors(args):
+    """ Capacity factors by unit, fuel type and fleet
+
+        The B1420 capacity of each unit is combined with the B1610 output for every
+        settlement period from --fromdate (or --date) to --todate.
+    """
+    if not check_api_key(args):
+        return None
+
+    fromdate = args.fromdate or args.date
+    if fromdate is None:
+        print("You MUST supply a date using --date or --fromdate for this report.")
+        return None
+    todate = args.todate or fromdate
+
+    engine = CapacityFactorEngine(args.apikey, workers=args.workers)
+    factors = engine.calculate(fromdate, todate)
+    if engine.failed:
+        print("{} requests for output data failed and have been skipped.".format(len(engine.failed)))
+    if factors.unmatched:
+        print("{} output records were for units without a capacity.".format(factors.unmatched))
+
+    fmt = StdoutFormatter("20s", "30s", "10.1f", "14.1f", "8.2f")
+    print("\n" + fmt.titles('Unit', 'Fuel', 'Capacity', 'Output (MWh)', 'Factor'))
+    for unit, info in sorted(factors.by_unit().items()):
+        print(fmt.row(unit, info['fuel'], info['capacity'], info['output'], info['factor'] * 100))
+
+    print("\n" + fmt.titles('Units', 'Fuel', 'Capacity', 'Output (MWh)', 'Factor'))
+    for fuel, info in sorted(factors.by_fuel().items()):
+        print(fmt.row(str(info['units']), fuel, info['capacity'], info['output'], info['factor'] * 100))
+    fleet = factors.fleet()
+    print(fmt.row(str(fleet['units']), 'Fleet', fleet['capacity'], fleet['output'], fleet['factor'] * 100))
+
+    return factors
+
+
+def elexon_balancing_costs(args):
+    """ Balancing Mechanism volumes and cashflows by unit, lead party and fuel type
+
+        DERBMDATA is fetched for every day from --fromdate (or --date) to --todate, or for
+        the whole of --year. Daily totals are saved, so only days not already fetched are
+        requested when the command is run again.
+    """
+    if not check_api_key(args):
+        return None
+
+    if args.year is not None and args.fromdate is None and args.date is None:
+        fromdate, todate = date(args.year, 1, 1), date(args.year, 12, 31)
+    else:
+        fromdate = args.fromdate or args.date
+        if fromdate is None:
+            print("You MUST supply a date using --date, --fromdate or --year for this report.")
+            return None
+        todate = args.todate or fromdate
+
+    rollup = BalancingCostRollup(args.apikey, workers=args.workers)
+
+    def progress(done, needed):
+        print("  fetched {} of {} days".format(done, needed))
+
+    try:
+        costs = rollup.calculate(fromdate, todate, progress=progress)
+    finally:
+        rollup.close()
+    if rollup.failed:
+        print("{} days could not be fetched and have been skipped. Run the command again to "
+              "retry them.".format(len(rollup.failed)))
+
+    fmt = StdoutFormatter('30s', '16.2f', '16.2f', '18.2f', '18.2f', '10.2f', '10.2f')
+    titles = ('Bid Volume', 'Offer Volume', 'Bid Cashflow', 'Offer Cashflow', 'Bid Rate', 'Offer Rate')
+    for title, groups in (('Unit', costs.by_unit()), ('Lead Party', costs.by_lead()),
+                          ('Fuel Type', costs.by_fuel())):
+        print("\n" + fmt.titles(title, *titles))
+        for name, info in sorted(groups.items()):
+            print(fmt.row(name[:30], info['bid_volume'], info['offer_volume'], info['bid_cashflow'],
+                          info['offer_cashflow'], info['bid_rate'], info['offer_rate']))
+    total = costs.total()
+    print(fmt.row('Total', total['bid_volume'], total['offer_volume'], total['bid_cashflow'],
+                  total['offer_cashflow'], total['bid_rate'], total['offer_rate']))
+
+    return costs
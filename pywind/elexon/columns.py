@@ -0,0 +1,466 @@
+""" Columnar storage for Elexon API records.
+
+Storing each record as a dict repeats every key for every row, which adds up quickly for
+reports such as FUELINST over a month or B1610 for every unit for a day.
+:class:`ColumnarItems` instead keeps one typed NumPy array per field and only creates
+dicts when rows are requested, so it can be used in place of the items list.
+
+.. code::
+
+   >>> api = FUELINST(apikey).use_columns()
+   >>> api.get_data(FromDateTime=start, ToDateTime=finish)
+   True
+   >>> api.items.column('wind')
+   array([5632., 5624., ...])
+   >>> api.items.time_axis()
+   array(['2016-03-27T00:00:00', '2016-03-27T00:05:00', ...], dtype='datetime64[s]')
+   >>> api.items[0]['wind']
+   5632.0
+
+Columns are typed from the values they contain,
+
+    ========  ==========================  ==========================
+    Values    Array dtype                 Row value
+    ========  ==========================  ==========================
+    float     float64 (None becomes NaN)  float (or None)
+    int       int64                       int
+    bool      bool                        bool
+    date      datetime64[D]               datetime.date
+    datetime  datetime64[us]              datetime.datetime
+    time      timedelta64[us]             datetime.time
+    other     object                      unchanged
+    ========  ==========================  ==========================
+
+Strings are kept in object arrays, with repeated values sharing a single string. Fields
+that are returned as strings but hold numbers can be given a type ('int' or 'float') so
+they are converted as they are stored. Rows then contain the converted values, so they
+differ from the same records held as a list of dicts, e.g. for FUELINST
+
+.. code::
+
+   >>> api = FUELINST(apikey)
+   >>> api.get_data(FromDateTime=start, ToDateTime=finish)
+   True
+   >>> api.items[0]['wind']
+   '5632'
+   >>> api.use_columns().items[0]['wind']
+   5632
+
+The types used by each report are given by its COLUMN_TYPES.
+
+If pandas is installed, :func:`make_frame` creates a DataFrame from the columns.
+"""
+import sys
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+
+from pywind.settlement import get_calendar
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+# Number of rows converted at a time when iterating.
+ROW_CHUNK = 1024
+
+# Fields that hold a small number of distinct values, stored as categories in DataFrames.
+CATEGORY_FIELDS = ('fueltype', 'powersystemresourcetype', 'psrtype', 'recordtype')
+# Fields holding dates or date/times, which may have been left as strings.
+DATETIME_FIELDS = ('settlementdate', 'date', 'starttimeofhalfhrperiod',
+                   'publishingperiodcommencingtime', 'implementationdate')
+
+_KINDS = [
+    (bool, 'bool'),
+    (int, 'int'),
+    (float, 'float'),
+    (datetime, 'datetime'),
+    (date, 'date'),
+    (time, 'time'),
+]
+
+_CONVERSIONS = {
+    'int': int,
+    'float': float,
+}
+
+_DTYPES = {
+    'bool': np.bool_,
+    'int': np.int64,
+    'float': np.float64,
+    'datetime': 'datetime64[us]',
+    'date': 'datetime64[D]',
+    'time': 'timedelta64[us]',
+}
+
+
+def _kind_of_type(val_type):
+    for typ, kind in _KINDS:
+        if issubclass(val_type, typ):
+            return kind
+    return 'object'
+
+
+def _time_to_delta(val):
+    return timedelta(hours=val.hour, minutes=val.minute, seconds=val.second,
+                     microseconds=val.microsecond)
+
+
+def _delta_to_time(val):
+    return (datetime.min + val).time()
+
+
+def _intern(val):
+    if isinstance(val, str):
+        return sys.intern(val)
+    return val
+
+
+def _column_kind(values):
+    """ Return the kind of column to use for a list of values. Only float columns may
+    contain None, any other mix of types results in an object column.
+    """
+    # Only the distinct types of the values need to be checked.
+    types = set(map(type, values))
+    has_none = type(None) in types
+    types.discard(type(None))
+    kinds = set(_kind_of_type(typ) for typ in types)
+    if len(kinds) != 1:
+        return 'object'
+    kind = kinds.pop()
+    if kind != 'float' and has_none:
+        return 'object'
+    return kind
+
+
+def _typed_column(field, values, types):
+    """ Return the array and kind for a list of values, converting strings for fields
+    given a type.
+    """
+    if field in types:
+        if len(values) > 0 and set(map(type, values)) == {str}:
+            # NumPy converts a whole array of strings at once.
+            return np.asarray(values).astype(_DTYPES[types[field]]), types[field]
+        convert = _CONVERSIONS[types[field]]
+        values = [convert(val) if isinstance(val, str) else val for val in values]
+    kind = _column_kind(values)
+    return _make_array(values, kind), kind
+
+
+def _array_kind(values):
+    """ Return the kind for an array that can be used as a column as it is, or None. """
+    if not isinstance(values, np.ndarray) or values.ndim != 1:
+        return None
+    for kind, dtype in _DTYPES.items():
+        if values.dtype == np.dtype(dtype):
+            return kind
+    return None
+
+
+def _make_array(values, kind):
+    if kind == 'float':
+        return np.array([np.nan if val is None else val for val in values], dtype=np.float64)
+    if kind == 'time':
+        return np.array([_time_to_delta(val) for val in values], dtype=_DTYPES[kind])
+    if kind == 'object':
+        arr = np.empty(len(values), dtype=object)
+        arr[:] = [_intern(val) for val in values]
+        return arr
+    return np.array(values, dtype=_DTYPES[kind])
+
+
+def _array_values(arr, kind):
+    """ Return the values of (part of) a column as a list of Python objects. """
+    if kind == 'float':
+        return [None if val != val else val for val in arr.tolist()]
+    if kind == 'time':
+        return [_delta_to_time(val) for val in arr.tolist()]
+    return arr.tolist()
+
+
+class ColumnarItems(object):
+    """ List like container of records, stored as one typed array per field.
+
+    Records are added as dicts using :func:`append` or :func:`extend` and are held in lists
+    until a column is needed, when they are converted to arrays. Iterating or indexing
+    returns dicts created as they are required.
+
+    :param items: Optional iterable of dicts to add.
+    :param types: Optional dict of field name to 'int' or 'float' for fields whose
+                  string values should be converted.
+    """
+    def __init__(self, items=None, types=None):
+        self.types = types or {}
+        self.fields = []
+        self.kinds = {}
+        self._arrays = {}
+        self._pending = {}
+        self._length = 0
+        self._pending_length = 0
+        if items is not None:
+            self.extend(items)
+
+    @classmethod
+    def from_columns(cls, columns, types=None):
+        """ Create from the values of each field, without creating a dict for each record.
+        Arrays with one of the dtypes used for columns are stored as they are.
+
+        :param columns: Dict of field name to a list or array of values. All must have
+                        the same length.
+        :param types: Optional dict of field types, as for the constructor.
+        :rtype: :class:`ColumnarItems`
+        """
+        items = cls(types=types)
+        lengths = set(len(values) for values in columns.values())
+        if len(lengths) > 1:
+            raise ValueError("Columns must all have the same length")
+        for field, values in columns.items():
+            items.fields.append(field)
+            kind = _array_kind(values)
+            if kind is None:
+                if not isinstance(values, np.ndarray):
+                    values = list(values)
+                items._arrays[field], items.kinds[field] = items._make_column(field, values)
+            else:
+                items._arrays[field], items.kinds[field] = values, kind
+        items._length = lengths.pop() if lengths else 0
+        return items
+
+    def __len__(self):
+        return self._length + self._pending_length
+
+    def __iter__(self):
+        self._freeze()
+        for start in range(0, self._length, ROW_CHUNK):
+            for row in self._rows(start, min(start + ROW_CHUNK, self._length)):
+                yield row
+
+    def __getitem__(self, idx):
+        self._freeze()
+        if isinstance(idx, slice):
+            return [self._row(pos) for pos in range(*idx.indices(self._length))]
+        if idx < 0:
+            idx += self._length
+        if idx < 0 or idx >= self._length:
+            raise IndexError("ColumnarItems index out of range")
+        return self._row(idx)
+
+    def __contains__(self, field):
+        return field in self.kinds or field in self._pending
+
+    def append(self, item):
+        """ Add a single record.
+
+        :param item: Dict of field values.
+        """
+        for key in item:
+            if key not in self._pending:
+                if key not in self.kinds:
+                    self.fields.append(key)
+                self._pending[key] = [None] * self._pending_length
+        for key, values in self._pending.items():
+            values.append(item.get(key))
+        self._pending_length += 1
+
+    def extend(self, items):
+        """ Add a number of records. Another :class:`ColumnarItems` is merged column by
+        column without creating the row dicts.
+
+        :param items: Iterable of dicts, or a :class:`ColumnarItems`.
+        """
+        if not isinstance(items, ColumnarItems):
+            for item in items:
+                self.append(item)
+            return
+        self.extend_columns([items])
+
+    def extend_columns(self, sources):
+        """ Add the records from a number of :class:`ColumnarItems`. Each column is built
+        with a single concatenation of the source arrays, so merging many results costs
+        no more than merging one large one. Columns whose kind differs between sources
+        are rebuilt from their values, as :func:`append` would.
+
+        :param sources: Iterable of :class:`ColumnarItems`.
+        """
+        sources = [src for src in sources if len(src) > 0]
+        if not sources:
+            return
+        self._freeze()
+        for src in sources:
+            src._freeze()
+            for field in src.fields:
+                if field not in self.kinds and field not in self.fields:
+                    self.fields.append(field)
+        parts = ([self] if self._length else []) + sources
+        for field in self.fields:
+            self._arrays[field], self.kinds[field] = self._concatenate(field, parts)
+        self._length = sum(part._length for part in parts)
+
+    def keys(self):
+        """ Return the field names, in the order they were first seen. """
+        return list(self.fields)
+
+    def column(self, field):
+        """ Return the array holding all values of a field.
+
+        :param field: The field name.
+        :rtype: :class:`numpy.ndarray`
+        """
+        self._freeze()
+        return self._arrays[field]
+
+    def columns(self):
+        """ Return a dict of field name to array for every field. """
+        self._freeze()
+        return dict(self._arrays)
+
+    def time_axis(self):
+        """ Return the start time of every record as a datetime64 array. Records with
+        date and time fields (e.g. FUELINST) use those, otherwise the UTC start of the
+        settlement period is found from the settlementdate and settlementperiod.
+
+        :rtype: :class:`numpy.ndarray`
+        """
+        self._freeze()
+        if 'date' in self.kinds and 'time' in self.kinds:
+            return (self._datetime64('date', 'D').astype('datetime64[s]') +
+                    self._arrays['time'].astype('timedelta64[s]'))
+        if 'settlementdate' in self.kinds and 'settlementperiod' in self.kinds:
+            return get_calendar().to_utc(self._datetime64('settlementdate', 'D'),
+                                         self._arrays['settlementperiod']).astype('datetime64[s]')
+        raise KeyError("Records have no date and time fields to create a time axis")
+
+    def _datetime64(self, field, unit):
+        arr = self._arrays[field]
+        if self.kinds[field] in ('date', 'datetime'):
+            return arr.astype('datetime64[{}]'.format(unit))
+        return np.array([str(val)[:10] for val in arr], dtype='datetime64[{}]'.format(unit))
+
+    def _freeze(self):
+        """ Convert any pending records into the column arrays. """
+        if self._pending_length == 0:
+            return
+        merged = {}
+        for field in self.fields:
+            merged[field] = self._field_values(field, 0, self._length) + \
+                self._pending.get(field, [None] * self._pending_length)
+        length = self._length + self._pending_length
+        self._pending = {}
+        self._pending_length = 0
+        self._set_arrays(merged, length)
+
+    def _set_arrays(self, values, length):
+        for field in self.fields:
+            self._arrays[field], self.kinds[field] = self._make_column(field, values[field])
+        self._length = length
+
+    def _make_column(self, field, values):
+        """ Return the array and kind for a list of values. """
+        return _typed_column(field, values, self.types)
+
+    def _concatenate(self, field, parts):
+        """ Return the array and kind for a field from a number of ColumnarItems. """
+        kinds = set(part.kinds[field] for part in parts if field in part.kinds)
+        complete = all(field in part.kinds for part in parts)
+        if len(kinds) == 1:
+            kind = kinds.pop()
+            # Missing values can only be stored in float columns and strings may still
+            # need to be converted.
+            if (complete or kind == 'float') and not (kind == 'object' and field in self.types):
+                return np.concatenate([part._arrays[field] if field in part.kinds
+                                       else np.full(part._length, np.nan) for part in parts]), kind
+        values = []
+        for part in parts:
+            values.extend(part._field_values(field, 0, part._length))
+        return self._make_column(field, values)
+
+    def _field_values(self, field, start, end):
+        if field not in self._arrays:
+            return [None] * (end - start)
+        return _array_values(self._arrays[field][start:end], self.kinds[field])
+
+    def _rows(self, start, end):
+        values = [self._field_values(field, start, end) for field in self.fields]
+        for row in zip(*values):
+            yield dict(zip(self.fields, row))
+
+    def _row(self, idx):
+        for row in self._rows(idx, idx + 1):
+            return row
+
+
+def require_pandas():
+    """ Return the pandas module, raising an ImportError if it is not installed. """
+    if pd is None:
+        raise ImportError("The pandas module is required to create DataFrames")
+    return pd
+
+
+def ratio(numerator, denominator):
+    """ Divide two arrays, giving 0 wherever the denominator is 0. Negative denominators
+    are valid, e.g. bid volumes, so rates calculated from bids are positive.
+
+    :param numerator: Array (or value) of numerators.
+    :param denominator: Array (or value) of denominators.
+    :rtype: :class:`numpy.ndarray`
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator != 0, np.true_divide(numerator, denominator), 0.0)
+
+
+def make_frame(items, types=None):
+    """ Create a :class:`pandas.DataFrame` from records, with a column for every field.
+
+    - settlementperiod is stored as int8
+    - float fields, and those given a type, are stored as float64 (NULL becomes NaN)
+    - fields listed in CATEGORY_FIELDS are stored as categories
+    - fields listed in DATETIME_FIELDS are stored as datetime64
+
+    A list of dicts is converted a column at a time, rather than being copied into a
+    :class:`ColumnarItems` first.
+
+    :param items: A :class:`ColumnarItems` or list of dicts.
+    :param types: Optional dict of field types, as for :class:`ColumnarItems`.
+    :rtype: :class:`pandas.DataFrame`
+    """
+    require_pandas()
+    data = {}
+    if isinstance(items, ColumnarItems):
+        types = types or items.types
+        fields = items.fields
+        for field in fields:
+            data[field] = _frame_column(field, items.column(field), items.kinds[field], types)
+    else:
+        types = types or {}
+        fields = list(dict.fromkeys(field for item in items for field in item))
+        for field in fields:
+            arr, kind = _typed_column(field, [item.get(field) for item in items], types)
+            data[field] = _frame_column(field, arr, kind, types)
+    return pd.DataFrame(data, columns=fields)
+
+
+def _frame_column(field, arr, kind, types):
+    if field == 'settlementperiod' and kind == 'int':
+        return arr.astype(np.int8)
+    if field in CATEGORY_FIELDS:
+        return pd.Categorical(arr)
+    if field in DATETIME_FIELDS:
+        return pd.to_datetime(arr, errors='coerce')
+    if kind == 'float' or (field in types and kind in ('int', 'object')):
+        return pd.to_numeric(arr, errors='coerce').astype(np.float64)
+    if kind == 'object' and _is_numeric(arr):
+        return pd.to_numeric(arr, errors='coerce').astype(np.float64)
+    return arr
+
+
+def _is_numeric(arr):
+    """ Return True if a column only holds floats, None and 'NULL'. """
+    found = False
+    for val in arr:
+        if isinstance(val, float):
+            found = True
+        elif val is not None and val != 'NULL':
+            return False
+    return found
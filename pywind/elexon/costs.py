@@ -0,0 +1,346 @@
+""" Balancing Mechanism costs over long periods.
+
+DERBMDATA can only be requested a day at a time, so producing figures for a year means
+hundreds of requests. :class:`BalancingCostRollup` fetches the days needed concurrently,
+totals each day as it arrives and keeps those totals in an SQLite database, so an
+interrupted run can be restarted without fetching the completed days again.
+
+.. code::
+
+   >>> from pywind.elexon.costs import BalancingCostRollup
+   >>> rollup = BalancingCostRollup(apikey, workers=8)
+   >>> costs = rollup.calculate(date(2016, 1, 1), date(2016, 12, 31))
+   >>> costs.by_fuel()['Wind Offshore']['bid_cashflow']
+   -1234567.89
+
+The fuel type of each unit is taken from the B1420 installed capacity report, using
+:class:`pywind.elexon.capacity.CapacityFactorEngine`.
+
+As for :class:`pywind.elexon.store.ElexonStore`, days that were fetched soon after their
+settlement date may since have been revised, so are fetched again once REFRESH_AFTER
+has passed.
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from pywind.cache import default_cache_directory
+from pywind.elexon.api import DERBMDATA
+from pywind.elexon.capacity import CapacityFactorEngine
+from pywind.elexon.columns import ratio
+from pywind.elexon.fetch import RangeFetcher
+from pywind.elexon.store import ElexonStore, needs_refresh
+from pywind.elexon.unit import BalancingAggregator
+from pywind.settlement import as_date, settlement_days
+
+
+MEASURES = BalancingAggregator.MEASURES
+
+
+class BalancingCostRollup(object):
+    """ Fetch DERBMDATA for a range of dates and total the volumes and cashflows.
+
+    :param apikey: The Elexon API key.
+    :param filename: The database used for the daily totals. Defaults to balancing.sqlite
+                     in the pywind cache directory.
+    :param workers: Number of requests to run at once.
+    :param batch_days: Number of days fetched before the totals are saved.
+    """
+    FILENAME = 'balancing.sqlite'
+    REVISION_WINDOW = ElexonStore.REVISION_WINDOW
+    REFRESH_AFTER = ElexonStore.REFRESH_AFTER
+
+    def __init__(self, apikey=None, filename=None, workers=4, batch_days=28):
+        self.apikey = apikey
+        self.workers = workers
+        self.batch_days = batch_days
+        self.failed = {}
+        self.capacity = CapacityFactorEngine(apikey)
+        if filename is None:
+            directory = default_cache_directory()
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            filename = os.path.join(directory, self.FILENAME)
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.filename, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS days (
+                              settlement_date TEXT PRIMARY KEY,
+                              fetched TEXT)""")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS unit_days (
+                              settlement_date TEXT,
+                              unit TEXT,
+                              lead TEXT,
+                              bmunit TEXT,
+                              bid_volume REAL,
+                              offer_volume REAL,
+                              bid_cashflow REAL,
+                              offer_cashflow REAL,
+                              PRIMARY KEY (settlement_date, unit))""")
+        self._db.commit()
+
+    def missing(self, fromdate, todate, now=None):
+        """ Return the settlement dates from fromdate to todate without saved totals, or
+        whose totals may since have been revised.
+
+        :param fromdate: First settlement date.
+        :param todate: Last settlement date.
+        :param now: The time to use as the current time. Defaults to datetime.now()
+        :rtype: list
+        """
+        now = now or datetime.now()
+        with self._lock:
+            rows = self._db.execute("SELECT settlement_date, fetched FROM days "
+                                    "WHERE settlement_date BETWEEN ? AND ?",
+                                    (fromdate.isoformat(), todate.isoformat())).fetchall()
+        current = set()
+        for day, fetched in rows:
+            day = as_date(day)
+            if not needs_refresh(day, fetched, now, self.REVISION_WINDOW, self.REFRESH_AFTER):
+                current.add(day)
+        return [day for day in settlement_days(fromdate, todate) if day not in current]
+
+    def fetch(self, fromdate, todate, progress=None):
+        """ Fetch and save the totals for any days from fromdate to todate that are missing.
+        Days that could not be fetched are recorded in the failed member and will be
+        requested again by the next call.
+
+        :param fromdate: First settlement date.
+        :param todate: Last settlement date.
+        :param progress: Optional function called with the number of days completed and
+                         the number needed after each batch.
+        :returns: Number of days fetched.
+        :rtype: int
+        """
+        if self.apikey is None:
+            raise Exception("An API key is required to use the Elexon API accessor functionality")
+        days = self.missing(fromdate, todate)
+        self.failed = {}
+        fetched = 0
+        for start in range(0, len(days), self.batch_days):
+            fetched += self._fetch_days(days[start:start + self.batch_days])
+            if progress is not None:
+                progress(min(start + self.batch_days, len(days)), len(days))
+        return fetched
+
+    def add(self, day, api):
+        """ Total the records from a DERBMDATA object for a single day and save them,
+        replacing any previous totals for the day.
+
+        :param day: The settlement date.
+        :param api: The :class:`pywind.elexon.api.DERBMDATA` object, or a list of them
+                    that together cover the day.
+        """
+        agg = BalancingAggregator()
+        for part in api if isinstance(api, list) else [api]:
+            agg.add(part)
+        units, totals = agg.by_unit()
+        rows = [(day.isoformat(), unit, agg.leads[idx], agg.bmunits[idx]) +
+                tuple(float(val) for val in totals[idx])
+                for idx, unit in enumerate(units)]
+        with self._lock:
+            self._db.execute("DELETE FROM unit_days WHERE settlement_date = ?", (day.isoformat(),))
+            self._db.executemany("INSERT INTO unit_days VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.execute("INSERT OR REPLACE INTO days VALUES (?, ?)",
+                             (day.isoformat(), datetime.now().isoformat()))
+            self._db.commit()
+
+    def load(self, fromdate, todate, fuels=None):
+        """ Return the saved totals for the settlement dates fromdate to todate.
+
+        :param fromdate: First settlement date.
+        :param todate: Last settlement date.
+        :param fuels: Optional dict of unit to fuel type.
+        :rtype: :class:`BalancingCosts`
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT settlement_date, unit, lead, bmunit, bid_volume, "
+                                    "offer_volume, bid_cashflow, offer_cashflow FROM unit_days "
+                                    "WHERE settlement_date BETWEEN ? AND ?",
+                                    (fromdate.isoformat(), todate.isoformat())).fetchall()
+            days = self._db.execute("SELECT COUNT(*) FROM days WHERE settlement_date BETWEEN ? AND ?",
+                                    (fromdate.isoformat(), todate.isoformat())).fetchone()[0]
+        return make_costs(fromdate, todate, rows, fuels or {}, days)
+
+    def unit_fuels(self, fromdate, todate):
+        """ Return a dict of unit to fuel type from the B1420 reports for each year from
+        fromdate to todate. Where a unit appears in more than one year the latest is used.
+        """
+        fuels = {}
+        for year in range(fromdate.year, todate.year + 1):
+            for unit, (_, fuel) in self.capacity.capacities(year).items():
+                fuels[unit] = fuel
+        return fuels
+
+    def calculate(self, fromdate, todate, fuels=True, progress=None):
+        """ Fetch any missing days and return the totals for fromdate to todate.
+
+        :param fromdate: First settlement date.
+        :param todate: Last settlement date.
+        :param fuels: If True the fuel type of each unit is found using B1420.
+        :param progress: Optional progress function, as for :func:`fetch`.
+        :rtype: :class:`BalancingCosts`
+        """
+        self.fetch(fromdate, todate, progress)
+        return self.load(fromdate, todate, self.unit_fuels(fromdate, todate) if fuels else None)
+
+    def close(self):
+        """ Close the underlying database. """
+        with self._lock:
+            self._db.close()
+
+    def _fetch_days(self, days):
+        fetcher = RangeFetcher(DERBMDATA, self.apikey, workers=self.workers, columnar=True)
+        requests = []
+        request_days = []
+        for day in days:
+            for params in DERBMDATA.plan_requests(day, day):
+                requests.append(params)
+                request_days.append(day)
+        fetcher.fetch_requests(requests)
+        for idx, err in fetcher.failed.items():
+            self.failed[request_days[idx]] = err
+        results = {}
+        for idx in sorted(fetcher.results):
+            results.setdefault(request_days[idx], []).append(fetcher.results[idx])
+        # Only days where every request succeeded are saved.
+        fetched = 0
+        for day in days:
+            if day in results and day not in self.failed:
+                self.add(day, results[day])
+                fetched += 1
+        return fetched
+
+
+def make_costs(fromdate, todate, rows, fuels, days=0):
+    """ Create a :class:`BalancingCosts` from daily totals.
+
+    :param fromdate: First settlement date.
+    :param todate: Last settlement date.
+    :param rows: Iterable of (settlement date, unit, lead party, bm unit id, bid volume,
+                 offer volume, bid cashflow, offer cashflow)
+    :param fuels: Dict of unit (or bm unit id) to fuel type.
+    :param days: Number of days included.
+    :rtype: :class:`BalancingCosts`
+    """
+    rows = list(rows)
+    if not rows:
+        return BalancingCosts(fromdate, todate, np.array([], dtype=object), np.array([], dtype=object),
+                              np.array([], dtype=object), [], np.zeros((0, 0, len(MEASURES))), days)
+    columns = list(zip(*rows))
+    months = np.array([day[:7] for day in columns[0]], dtype='datetime64[M]')
+    month_names, month_idx = np.unique(months, return_inverse=True)
+    unit_names, first, unit_idx = np.unique(np.array(columns[1], dtype=str), return_index=True,
+                                            return_inverse=True)
+    month_idx = month_idx.reshape(-1)
+    unit_idx = unit_idx.reshape(-1)
+    values = np.array(columns[4:], dtype=np.float64).T
+
+    groups = unit_idx * len(month_names) + month_idx
+    size = len(unit_names) * len(month_names)
+    monthly = np.zeros((size, len(MEASURES)))
+    for measure in range(len(MEASURES)):
+        monthly[:, measure] = np.bincount(groups, weights=values[:, measure], minlength=size)
+
+    leads = np.array(columns[2], dtype=object)[first]
+    bmunits = np.array(columns[3], dtype=object)[first]
+    unit_fuels = np.array([fuels.get(unit) or fuels.get(bmunit) or 'Unknown'
+                           for unit, bmunit in zip(unit_names.tolist(), bmunits.tolist())], dtype=object)
+    return BalancingCosts(fromdate, todate, unit_names.astype(object), leads, unit_fuels,
+                          month_names.astype('datetime64[D]').astype(object).tolist(),
+                          monthly.reshape(len(unit_names), len(month_names), len(MEASURES)), days)
+
+
+class BalancingCosts(object):
+    """ Balancing Mechanism volumes and cashflows for a range of settlement dates. All
+    arrays are in the same order as units.
+
+    :param fromdate: First settlement date.
+    :param todate: Last settlement date.
+    :param units: Array of unit names.
+    :param leads: Array of the lead party of each unit.
+    :param fuels: Array of the fuel type of each unit.
+    :param months: List of the first day of each month included.
+    :param monthly: Array of shape (units, months, MEASURES) of the totals.
+    :param days: Number of days included.
+    """
+    def __init__(self, fromdate, todate, units, leads, fuels, months, monthly, days=0):
+        self.fromdate = fromdate
+        self.todate = todate
+        self.units = units
+        self.leads = leads
+        self.fuels = fuels
+        self.months = months
+        self.monthly = monthly
+        self.days = days
+
+    def __len__(self):
+        return len(self.units)
+
+    @property
+    def totals(self):
+        """ Array of shape (units, MEASURES) of the totals for each unit. """
+        return self.monthly.sum(axis=1)
+
+    def by_unit(self):
+        """ Return a dict of unit to a dict of lead, fuel, volumes, cashflows and rates. """
+        info = _group_info(self.totals, np.ones(len(self.units), dtype=np.int64))
+        for idx in range(len(self.units)):
+            info[idx].update({'lead': self.leads[idx], 'fuel': self.fuels[idx]})
+        return dict(zip(self.units.tolist(), info))
+
+    def by_lead(self):
+        """ Return a dict of lead party to a dict of units, volumes, cashflows and rates. """
+        return self._group(self.leads)
+
+    def by_fuel(self):
+        """ Return a dict of fuel type to a dict of units, volumes, cashflows and rates. """
+        return self._group(self.fuels)
+
+    def by_month(self):
+        """ Return a dict of the first day of each month to a dict of units, volumes,
+        cashflows and rates for all units.
+        """
+        active = np.count_nonzero(np.any(self.monthly != 0, axis=2), axis=0)
+        return dict(zip(self.months, _group_info(self.monthly.sum(axis=0), active)))
+
+    def total(self):
+        """ Return a dict of units, volumes, cashflows and rates for all units. """
+        return _group_info(self.totals.sum(axis=0).reshape(1, -1), [len(self.units)])[0]
+
+    def rows(self):
+        """ Generator of rows for exporting, one per unit. """
+        for unit, info in sorted(self.by_unit().items()):
+            row = {'@unit': unit, '@lead': info['lead'], '@fuel': info['fuel']}
+            for name in MEASURES + ('bid_rate', 'offer_rate'):
+                row['@' + name] = float(info[name])
+            yield {'BalancingCost': row}
+
+    def _group(self, names):
+        if len(self.units) == 0:
+            return {}
+        distinct, inverse = np.unique(names.astype(str), return_inverse=True)
+        inverse = inverse.reshape(-1)
+        totals = np.zeros((len(distinct), len(MEASURES)))
+        unit_totals = self.totals
+        for measure in range(len(MEASURES)):
+            totals[:, measure] = np.bincount(inverse, weights=unit_totals[:, measure],
+                                             minlength=len(distinct))
+        return dict(zip(distinct.tolist(),
+                        _group_info(totals, np.bincount(inverse, minlength=len(distinct)))))
+
+
+def _group_info(totals, units):
+    """ Return a list of dicts, one per row of totals, with the measures and rates. """
+    bid_rate = ratio(totals[:, BalancingAggregator.BID_CASHFLOW], totals[:, BalancingAggregator.BID_VOLUME])
+    offer_rate = ratio(totals[:, BalancingAggregator.OFFER_CASHFLOW],
+                        totals[:, BalancingAggregator.OFFER_VOLUME])
+    info = []
+    for idx in range(len(totals)):
+        row = {name: totals[idx, measure] for measure, name in enumerate(MEASURES)}
+        row.update({'units': int(units[idx]), 'bid_rate': bid_rate[idx], 'offer_rate': offer_rate[idx]})
+        info.append(row)
+    return info
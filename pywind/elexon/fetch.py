@@ -0,0 +1,140 @@
+""" Fetching Elexon reports for long date ranges.
+
+Many reports can only be requested a day, or a single settlement period, at a time.
+:class:`RangeFetcher` uses the report's :func:`ElexonAPI.plan_requests` to split a range
+into requests the API will accept, runs them using a pool of worker threads and merges
+the results back together in chronological order. For reports with revisions only the
+latest revision of each record is kept.
+
+.. code::
+
+   >>> from pywind.elexon.api import DERSYSDATA
+   >>> from pywind.elexon.fetch import RangeFetcher
+   >>> fetcher = RangeFetcher(DERSYSDATA, apikey, workers=8)
+   >>> api = fetcher.fetch(date(2016, 1, 1), date(2016, 12, 31))
+   >>> fetcher.failed
+   {}
+
+Requests that fail, or return responses that cannot be processed, are recorded in the
+failed member with the exception raised (or False if no data was returned). They can be
+retried later using :func:`RangeFetcher.retry_failed` without fetching the successful
+ones again.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pywind.elexon.columns import ColumnarItems
+
+
+class RangeFetcher(object):
+    """ Fetch a report for a range of dates using concurrent requests.
+
+    :param api_class: The :class:`pywind.elexon.api.ElexonAPI` subclass to use.
+    :param apikey: The Elexon API key.
+    :param workers: Number of requests to run at once.
+    :param columnar: If True, records are stored using
+                     :class:`pywind.elexon.columns.ColumnarItems`.
+    """
+    def __init__(self, api_class, apikey, workers=4, columnar=False):
+        self.api_class = api_class
+        self.apikey = apikey
+        self.workers = workers
+        self.columnar = columnar
+        self.requests = []
+        self.results = {}
+        self.failed = {}
+
+    def __len__(self):
+        return len(self.requests)
+
+    def fetch(self, fromdate, todate):
+        """ Fetch all data for the dates fromdate to todate (inclusive).
+
+        :param fromdate: First settlement date.
+        :param todate: Last settlement date.
+        :returns: An api object containing all the records retrieved.
+        :rtype: :class:`pywind.elexon.api.ElexonAPI`
+        """
+        return self.fetch_requests(self.api_class.plan_requests(fromdate, todate))
+
+    def fetch_requests(self, requests):
+        """ Fetch data for a list of parameter dicts, which should be in chronological order.
+
+        :param requests: List of parameter dicts.
+        :returns: An api object containing all the records retrieved.
+        :rtype: :class:`pywind.elexon.api.ElexonAPI`
+        """
+        self.requests = list(requests)
+        self.results = {}
+        self.failed = {}
+        self._run(range(len(self.requests)))
+        return self.merged()
+
+    def retry_failed(self):
+        """ Retry only the requests that previously failed.
+
+        :returns: An api object containing all the records retrieved so far.
+        :rtype: :class:`pywind.elexon.api.ElexonAPI`
+        """
+        self._run(sorted(self.failed))
+        return self.merged()
+
+    def merged(self):
+        """ Merge the results of all successful requests, in the order planned.
+
+        :rtype: :class:`pywind.elexon.api.ElexonAPI`
+        """
+        api = self._make_api()
+        results = [self.results[idx] for idx in sorted(self.results)]
+        if api.REVISION_KEYS:
+            # A single pass over every record, keeping only the latest revision.
+            api.add_items(item for result in results for item in result.items)
+        else:
+            _extend(api.items, [result.items for result in results])
+        names = []
+        for result in results:
+            names.extend(name for name in result.multi if name not in names)
+        for name in names:
+            api.multi[name] = api._new_items()
+            _extend(api.multi[name], [result.multi[name] for result in results if name in result.multi])
+        return api
+
+    def _run(self, indexes):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._get_data, idx): idx for idx in indexes}
+            for future in as_completed(futures):
+                idx = futures[future]
+                try:
+                    api = future.result()
+                except Exception as err:
+                    # A failed request, or a response that could not be parsed or processed,
+                    # is recorded rather than abandoning the other requests.
+                    self.failed[idx] = err
+                    continue
+                if api is None:
+                    self.failed[idx] = False
+                    continue
+                self.failed.pop(idx, None)
+                self.results[idx] = api
+
+    def _make_api(self):
+        api = self.api_class(self.apikey)
+        if self.columnar:
+            api.use_columns()
+        return api
+
+    def _get_data(self, idx):
+        api = self._make_api()
+        if api.get_data(**dict(self.requests[idx])) is False:
+            return None
+        return api
+
+
+def _extend(items, sources):
+    """ Add the records from each source to items. Columns are concatenated once, rather
+    than once per source.
+    """
+    if isinstance(items, ColumnarItems):
+        items.extend_columns(sources)
+    else:
+        for source in sources:
+            items.extend(source)
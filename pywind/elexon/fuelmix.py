@@ -0,0 +1,192 @@
+""" Energy totals by fuel type from FUELINST readings.
+
+FUELINST gives the output of each fuel type, in MW, every 5 minutes. :class:`FuelMixResampler`
+converts the readings to energy (MWh) and totals them for each settlement period, with
+daily and monthly totals and the share of each fuel type calculated from those.
+
+.. code::
+
+   >>> from pywind.elexon.fuelmix import FuelMixResampler
+   >>> resampler = FuelMixResampler()
+   >>> resampler.add(api.items)
+   >>> daily = resampler.daily()
+   >>> daily.column('wind')
+   array([ 98123.25, 104512.5 , ...])
+   >>> daily.shares[:, daily.fuels.index('wind')]
+   array([0.1432, 0.1511, ...])
+
+Each reading is assigned to the settlement period containing its (UTC) time using
+:mod:`pywind.settlement`, so clock change days have the correct number of periods.
+Readings can be added as they arrive, e.g. from :class:`pywind.elexon.live.FuelInstPoller`,
+and only readings later than those already added are used.
+"""
+import numpy as np
+
+from pywind.elexon.api import FUELINST
+from pywind.elexon.columns import ColumnarItems
+from pywind.settlement import get_calendar
+
+
+#: Hours covered by each FUELINST reading.
+READING_HOURS = 5 / 60.0
+#: Number of readings in a complete settlement period.
+PERIOD_READINGS = 6
+# Settlement periods are stored as day * PERIOD_SLOTS + period.
+PERIOD_SLOTS = 64
+
+
+class FuelMixResampler(object):
+    """ Accumulate FUELINST readings as energy totals for each settlement period.
+
+    :param fuels: Optional list of the fuel fields to use. Defaults to FUELINST.FUELS
+    """
+    def __init__(self, fuels=None):
+        self.fuels = tuple(fuels or FUELINST.FUELS)
+        self.latest = None
+        self._keys = np.zeros(0, dtype=np.int64)
+        self._energy = np.zeros((0, len(self.fuels)))
+        self._readings = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        """ Number of settlement periods with readings. """
+        return len(self._keys)
+
+    def add(self, items):
+        """ Add FUELINST records.
+
+        :param items: A :class:`pywind.elexon.columns.ColumnarItems`, list of dicts or
+                      :class:`pywind.elexon.live.FuelMixHistory`.
+        :returns: Number of readings used.
+        :rtype: int
+        """
+        if hasattr(items, 'times'):
+            return self.add_readings(items.times(),
+                                     np.column_stack([items.column(fuel) for fuel in self.fuels]))
+        if not isinstance(items, ColumnarItems):
+            items = ColumnarItems(items, FUELINST.COLUMN_TYPES)
+        if len(items) == 0:
+            return 0
+        values = np.column_stack([items.column(fuel).astype(np.float64) if fuel in items
+                                  else np.zeros(len(items)) for fuel in self.fuels])
+        return self.add_readings(items.time_axis(), values)
+
+    def add_readings(self, times, values):
+        """ Add readings. Any that are not later than the latest reading already added
+        are ignored.
+
+        :param times: Array of the UTC time of each reading.
+        :param values: Array of shape (readings, fuels) of the output in MW.
+        :returns: Number of readings used.
+        :rtype: int
+        """
+        times = np.asarray(times, dtype='datetime64[s]')
+        values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+        if self.latest is not None:
+            keep = times > self.latest
+            times, values = times[keep], values[keep]
+        if len(times) == 0:
+            return 0
+
+        days, periods = get_calendar().from_utc(times)
+        keys = days.astype(np.int64) * PERIOD_SLOTS + periods
+        distinct, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        energy = np.zeros((len(distinct), len(self.fuels)))
+        for idx in range(len(self.fuels)):
+            energy[:, idx] = np.bincount(inverse, weights=values[:, idx], minlength=len(distinct))
+        energy *= READING_HOURS
+
+        merged = np.union1d(self._keys, distinct)
+        all_energy = np.zeros((len(merged), len(self.fuels)))
+        all_readings = np.zeros(len(merged), dtype=np.int64)
+        old = np.searchsorted(merged, self._keys)
+        new = np.searchsorted(merged, distinct)
+        all_energy[old] = self._energy
+        all_energy[new] += energy
+        all_readings[old] = self._readings
+        all_readings[new] += np.bincount(inverse, minlength=len(distinct))
+        self._keys, self._energy, self._readings = merged, all_energy, all_readings
+
+        latest = times.max()
+        self.latest = latest if self.latest is None else max(self.latest, latest)
+        return len(times)
+
+    def half_hourly(self):
+        """ Energy totals for each settlement period.
+
+        :rtype: :class:`FuelMixTotals`
+        """
+        return FuelMixTotals(self.fuels, self._days(), self._energy.copy(), self._readings.copy(),
+                             (self._keys % PERIOD_SLOTS).astype(np.int8))
+
+    def daily(self):
+        """ Energy totals for each settlement date.
+
+        :rtype: :class:`FuelMixTotals`
+        """
+        return self._group(self._days())
+
+    def monthly(self):
+        """ Energy totals for each month, labelled by the first day of the month.
+
+        :rtype: :class:`FuelMixTotals`
+        """
+        return self._group(self._days().astype('datetime64[M]').astype('datetime64[D]'))
+
+    def _days(self):
+        return (self._keys // PERIOD_SLOTS).astype('datetime64[D]')
+
+    def _group(self, labels):
+        distinct, inverse = np.unique(labels, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        energy = np.zeros((len(distinct), len(self.fuels)))
+        for idx in range(len(self.fuels)):
+            energy[:, idx] = np.bincount(inverse, weights=self._energy[:, idx], minlength=len(distinct))
+        readings = np.bincount(inverse, weights=self._readings, minlength=len(distinct)).astype(np.int64)
+        return FuelMixTotals(self.fuels, distinct, energy, readings)
+
+
+class FuelMixTotals(object):
+    """ Energy totals, in MWh, by fuel type.
+
+    :param fuels: The fuel names, in the order of the energy columns.
+    :param dates: datetime64[D] array of the settlement date (or first day of the month)
+                  of each row.
+    :param energy: Array of shape (rows, fuels) of energy totals.
+    :param readings: Array of the number of readings included in each row.
+    :param periods: Optional array of the settlement period of each row.
+    """
+    def __init__(self, fuels, dates, energy, readings, periods=None):
+        self.fuels = fuels
+        self.dates = dates
+        self.energy = energy
+        self.readings = readings
+        self.periods = periods
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def totals(self):
+        """ Array of the total energy for all fuels in each row. """
+        return self.energy.sum(axis=1)
+
+    @property
+    def shares(self):
+        """ Array of shape (rows, fuels) giving the share of the total for each fuel. """
+        totals = self.totals[:, np.newaxis]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(totals != 0, self.energy / totals, 0.0)
+
+    def column(self, fuel):
+        """ Array of the energy for a fuel in each row. """
+        return self.energy[:, self.fuels.index(fuel)]
+
+    def rows(self):
+        """ Generator of rows for exporting. """
+        for idx, day in enumerate(self.dates.astype(object).tolist()):
+            row = {'@date': day.strftime("%Y-%m-%d")}
+            if self.periods is not None:
+                row['@settlementperiod'] = int(self.periods[idx])
+            row.update({'@' + fuel: float(self.energy[idx, pos]) for pos, fuel in enumerate(self.fuels)})
+            yield {'FuelMix': row}
@@ -0,0 +1,248 @@
+""" Polling FUELINST for the latest generation by fuel type.
+
+FUELINST is published every 5 minutes. Rather than requesting a whole day each time,
+:class:`FuelInstPoller` only requests the readings after the last one it has seen, keeps
+the most recent readings in a fixed size :class:`FuelMixHistory` and passes each new
+reading to any number of sinks.
+
+.. code::
+
+   >>> from pywind.elexon.live import FuelInstPoller, FileSink
+   >>> poller = FuelInstPoller(apikey, sinks=[FileSink('fuelinst.jsonl')])
+   >>> poller.add_sink(lambda rows: print(len(rows), "new readings"))
+   >>> poller.run()
+
+A sink is any callable that accepts a list of new records. :class:`FileSink` and
+:class:`SocketSink` write each record as a line of JSON.
+
+The first poll fills the history with the readings for the previous HISTORY_SIZE
+intervals. FUELINST times are UTC.
+"""
+import json
+import logging
+import socket
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from pywind.elexon.api import FUELINST
+from pywind.retry import RequestError
+
+
+#: Interval between FUELINST readings.
+READING_INTERVAL = timedelta(minutes=5)
+
+
+class LiveFUELINST(FUELINST):
+    """ FUELINST for the latest readings. Responses are never cached. """
+    def cache_ttl(self, params):
+        return 0
+
+
+def reading_time(item):
+    """ Return the time of a FUELINST record as a datetime. """
+    return datetime.combine(item['date'], item['time'])
+
+
+class FuelMixHistory(object):
+    """ Ring buffer of the most recent FUELINST readings. Once full, each reading added
+    replaces the oldest.
+
+    :param size: The number of readings kept.
+    """
+    def __init__(self, size=288):
+        self.size = size
+        self.fuels = FUELINST.FUELS
+        self._times = np.zeros(size, dtype='datetime64[s]')
+        self._periods = np.zeros(size, dtype=np.int8)
+        self._values = np.zeros((size, len(self.fuels)), dtype=np.int64)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        """ Generator of the readings as dicts, oldest first. """
+        order = self._order()
+        for time, period, values in zip(self._times[order].tolist(), self._periods[order].tolist(),
+                                        self._values[order].tolist()):
+            row = dict(zip(self.fuels, values))
+            row.update({'time': time, 'settlementperiod': period})
+            yield row
+
+    @property
+    def latest(self):
+        """ The time of the latest reading, or None if there are none. """
+        if self._count == 0:
+            return None
+        return self._times[(self._next - 1) % self.size].astype(datetime)
+
+    def append(self, item):
+        """ Add a FUELINST record.
+
+        :param item: Dict with the date, time, settlementperiod and fuel fields.
+        """
+        self._times[self._next] = reading_time(item)
+        self._periods[self._next] = item['settlementperiod']
+        self._values[self._next] = [int(item[fuel] or 0) for fuel in self.fuels]
+        self._next = (self._next + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+
+    def extend(self, items):
+        """ Add a number of FUELINST records, which should be in time order. """
+        for item in items:
+            self.append(item)
+
+    def times(self):
+        """ Array of the reading times, oldest first. """
+        return self._times[self._order()]
+
+    def column(self, fuel):
+        """ Array of the output of a fuel type for each reading, oldest first. """
+        return self._values[self._order(), self.fuels.index(fuel)]
+
+    def totals(self):
+        """ Array of the total output of all fuel types for each reading, oldest first. """
+        return self._values[self._order()].sum(axis=1)
+
+    def _order(self):
+        start = (self._next - self._count) % self.size
+        return (start + np.arange(self._count)) % self.size
+
+
+class FuelInstPoller(object):
+    """ Regularly fetch the FUELINST readings that have not yet been seen.
+
+    :param apikey: The Elexon API key.
+    :param interval: Seconds between requests.
+    :param history: Number of readings kept in the history member.
+    :param sinks: Optional list of callables, each called with a list of new records.
+    """
+    INTERVAL = 300
+    HISTORY_SIZE = 288
+
+    def __init__(self, apikey, interval=None, history=None, sinks=None):
+        self.apikey = apikey
+        self.interval = interval or self.INTERVAL
+        self.history = FuelMixHistory(history or self.HISTORY_SIZE)
+        self.sinks = list(sinks or [])
+        self.polls = 0
+        self.logger = logging.getLogger(__name__)
+        self._stop = threading.Event()
+
+    def add_sink(self, sink):
+        """ Add a callable that will be passed each list of new records. """
+        self.sinks.append(sink)
+
+    def window(self, now):
+        """ Return the first and last reading times to request at the time now (UTC).
+
+        :rtype: tuple
+        """
+        finish = now.replace(second=0, microsecond=0)
+        finish -= timedelta(minutes=finish.minute % 5)
+        latest = self.history.latest
+        if latest is None:
+            return finish - READING_INTERVAL * (self.history.size - 1), finish
+        return latest + READING_INTERVAL, finish
+
+    def poll(self, now=None):
+        """ Request any readings since the last one seen, add them to the history and
+        pass them to the sinks.
+
+        :param now: The current time (UTC). Defaults to datetime.utcnow()
+        :returns: List of the new records.
+        :rtype: list
+        """
+        start, finish = self.window(now or datetime.utcnow())
+        if start > finish:
+            return []
+        api = LiveFUELINST(self.apikey)
+        self.polls += 1
+        if api.get_data(FromDateTime=start, ToDateTime=finish) is False:
+            return []
+
+        latest = self.history.latest
+        rows = sorted((item for item in api.items
+                       if reading_time(item) >= start and (latest is None or reading_time(item) > latest)),
+                      key=reading_time)
+        if not rows:
+            return []
+        self.history.extend(rows)
+        for sink in self.sinks:
+            sink(rows)
+        return rows
+
+    def run(self, cycles=None):
+        """ Poll every interval seconds until :func:`stop` is called or, if given, cycles
+        polls have been made. Failed requests are logged and retried on the next cycle.
+
+        :param cycles: Optional number of polls to make.
+        """
+        self._stop.clear()
+        count = 0
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except RequestError as err:
+                self.logger.warning("Unable to get FUELINST data: %s", err)
+            count += 1
+            if cycles is not None and count >= cycles:
+                break
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        """ Stop :func:`run`. May be called from another thread. """
+        self._stop.set()
+
+
+def json_row(item):
+    """ Return a FUELINST record as a line of JSON. """
+    return json.dumps(item, default=str, sort_keys=True) + '\n'
+
+
+class FileSink(object):
+    """ Sink that appends each record to a file as a line of JSON.
+
+    :param filename: The file to append to.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+
+    def __call__(self, rows):
+        with open(self.filename, 'a') as jfh:
+            jfh.writelines(json_row(row) for row in rows)
+
+
+class SocketSink(object):
+    """ Sink that sends each record as a line of JSON over a TCP connection. The
+    connection is opened when first needed and reopened if it fails, in which case the
+    rows being sent are lost.
+
+    :param host: The host to connect to.
+    :param port: The port to connect to.
+    :param timeout: Seconds to wait when connecting or sending.
+    """
+    def __init__(self, host, port, timeout=10):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__)
+        self._sock = None
+
+    def __call__(self, rows):
+        data = ''.join(json_row(row) for row in rows).encode('utf-8')
+        try:
+            if self._sock is None:
+                self._sock = socket.create_connection(self.address, self.timeout)
+            self._sock.sendall(data)
+        except (OSError, socket.error) as err:
+            self.logger.warning("Unable to send to %s:%s: %s", self.address[0], self.address[1], err)
+            self.close()
+
+    def close(self):
+        """ Close the connection. """
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
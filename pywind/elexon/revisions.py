@@ -0,0 +1,115 @@
+""" Keeping only the latest revision of Elexon records.
+
+The B-series transparency reports (B1320, B1420, B1610 and B1630) include a
+documentRevNum, and a response may contain more than one revision of the same record.
+:class:`RevisionIndex` keeps a hash index of the fields identifying each record in a
+list, so a later revision replaces the earlier one as it is added rather than the
+records having to be sorted and filtered afterwards.
+
+.. code::
+
+   >>> from pywind.elexon.revisions import RevisionIndex
+   >>> items = RevisionIndex(('timeseriesid', 'settlementdate', 'settlementperiod'))
+   >>> items.append({'timeseriesid': 'TS-1', 'settlementdate': '2016-01-01',
+   ...               'settlementperiod': 1, 'documentrevnum': '1', 'quantity': 100.0})
+   True
+   >>> items.append({'timeseriesid': 'TS-1', 'settlementdate': '2016-01-01',
+   ...               'settlementperiod': 1, 'documentrevnum': '2', 'quantity': 110.0})
+   True
+   >>> len(items), items[0]['quantity']
+   (1, 110.0)
+
+Reports that use an index have their key fields in REVISION_KEYS. Their items member
+is still a list, holding only the latest revision of each record, and the index used to
+maintain it is available as the revisions member,
+
+.. code::
+
+   >>> api = B1610(apikey)
+   >>> api.get_data(SettlementDate=date(2016, 1, 1), Period=1)
+   True
+   >>> api.revisions.replaced
+   2
+
+Records should be added using :func:`pywind.elexon.api.ElexonAPI.add_items` so that the
+index is kept up to date.
+"""
+
+
+class RevisionIndex(object):
+    """ List like container of records that keeps only the latest revision of each.
+    Records stay in the position at which the first revision was added.
+
+    :param keys: The fields that identify a record.
+    :param items: Optional iterable of records to add.
+    :param records: Optional list used to hold the records, available as the records
+                    member. Any records it already contains are indexed first.
+    """
+    def __init__(self, keys, items=None, records=None):
+        self.keys = tuple(keys)
+        self.replaced = 0
+        self.discarded = 0
+        self.records = [] if records is None else records
+        self._revisions = []
+        self._index = {}
+        existing = list(self.records)
+        del self.records[:]
+        self.extend(existing)
+        if items is not None:
+            self.extend(items)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, idx):
+        return self.records[idx]
+
+    def __contains__(self, item):
+        return self.key(item) in self._index
+
+    def key(self, item):
+        """ Return the tuple of key values for a record. """
+        return tuple(item.get(field) for field in self.keys)
+
+    def append(self, item):
+        """ Add a record. If a record with the same key has already been added it is
+        replaced, unless it has a later revision.
+
+        :param item: Dict of field values.
+        :returns: True if the record was stored.
+        :rtype: bool
+        """
+        key = self.key(item)
+        revision = record_revision(item)
+        pos = self._index.get(key)
+        if pos is None:
+            self._index[key] = len(self.records)
+            self.records.append(item)
+            self._revisions.append(revision)
+            return True
+        if revision < self._revisions[pos]:
+            self.discarded += 1
+            return False
+        self.records[pos] = item
+        self._revisions[pos] = revision
+        self.replaced += 1
+        return True
+
+    def extend(self, items):
+        """ Add a number of records.
+
+        :param items: Iterable of dicts.
+        """
+        for item in items:
+            self.append(item)
+
+
+def record_revision(item):
+    """ Return the documentRevNum of a record as an int, or 0 if it has none. """
+    try:
+        return int(item.get('documentrevnum') or 0)
+    except ValueError:
+        return 0
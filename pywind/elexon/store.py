@@ -0,0 +1,359 @@
+""" Local store of Elexon report data.
+
+Records retrieved from the Elexon API are kept in an SQLite database, together with a
+note of which settlement days (or periods) have been fetched. :func:`ElexonStore.sync`
+uses this to request only the data that is missing, so repeated runs over the same dates
+do not fetch everything again.
+
+.. code::
+
+   >>> from pywind.elexon.store import ElexonStore
+   >>> store = ElexonStore(apikey)
+   >>> store.sync('B1610', date(2016, 1, 1), date(2016, 1, 31))
+   96000
+   >>> api = store.load('B1610', date(2016, 1, 1), date(2016, 1, 31))
+
+Records that carry a documentRevNum are replaced when a later revision is received.
+As revisions are normally published soon after the data, days that were last fetched
+within REVISION_WINDOW of their settlement date are fetched again by :func:`ElexonStore.sync`.
+
+Each record is stored as JSON, with dates, datetimes and times given as objects such as
+``{"$date": "2016-01-01"}`` so they are returned with the same types.
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, time, timedelta
+
+from pywind.cache import default_cache_directory
+from pywind.elexon.api import FUELINST, DERSYSDATA, B1610, B1630, DERBMDATA
+from pywind.elexon.fetch import RangeFetcher
+from pywind.elexon.revisions import record_revision
+from pywind.settlement import as_date, settlement_days, settlement_period
+
+
+class ElexonStore(object):
+    """ SQLite store of records from the Elexon API.
+
+    :param apikey: The Elexon API key, required for :func:`sync`.
+    :param filename: The database file. Defaults to elexon.sqlite in the pywind cache
+                     directory.
+    :param workers: Number of requests to run at once when syncing.
+    """
+    FILENAME = 'elexon.sqlite'
+    #: Version of the database layout. Databases with an older version are emptied.
+    SCHEMA_VERSION = 1
+    #: Reports that can be stored.
+    REPORTS = {
+        'FUELINST': FUELINST,
+        'DERSYSDATA': DERSYSDATA,
+        'B1610': B1610,
+        'B1630': B1630,
+        'DERBMDATA': DERBMDATA,
+    }
+    #: Fields that identify a single record for each report.
+    RECORD_KEYS = {
+        'FUELINST': ('publishingperiodcommencingtime',),
+        'DERSYSDATA': ('settlementdate', 'settlementperiod'),
+        'B1610': B1610.REVISION_KEYS,
+        'B1630': B1630.REVISION_KEYS,
+        'DERBMDATA': ('bmunitid', 'settlementdate', 'settlementperiod'),
+    }
+    #: Days fetched within this time of their settlement date may still be revised.
+    REVISION_WINDOW = timedelta(days=7)
+    #: How long a fetch of a day that may still be revised is used before fetching again.
+    REFRESH_AFTER = timedelta(hours=12)
+
+    def __init__(self, apikey=None, filename=None, workers=4):
+        self.apikey = apikey
+        self.workers = workers
+        if filename is None:
+            directory = default_cache_directory()
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            filename = os.path.join(directory, self.FILENAME)
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.filename, check_same_thread=False)
+        if self._db.execute("PRAGMA user_version").fetchone()[0] < self.SCHEMA_VERSION:
+            # Earlier versions stored pickled records, which are never loaded. The data
+            # is fetched again by the next sync.
+            self._db.execute("DROP TABLE IF EXISTS records")
+            self._db.execute("DROP TABLE IF EXISTS fetched")
+            self._db.execute("PRAGMA user_version = {:d}".format(self.SCHEMA_VERSION))
+        self._db.execute("""CREATE TABLE IF NOT EXISTS records (
+                              report TEXT,
+                              result_set TEXT,
+                              key TEXT,
+                              settlement_date TEXT,
+                              settlement_period INTEGER,
+                              revision INTEGER,
+                              data TEXT,
+                              PRIMARY KEY (report, result_set, key))""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS records_date "
+                         "ON records (report, settlement_date, settlement_period)")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS fetched (
+                              report TEXT,
+                              settlement_date TEXT,
+                              settlement_period INTEGER,
+                              fetched TEXT,
+                              PRIMARY KEY (report, settlement_date, settlement_period))""")
+        self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def api_class(self, report):
+        """ Return the :class:`pywind.elexon.api.ElexonAPI` class for a report name. """
+        try:
+            return self.REPORTS[report.upper()]
+        except KeyError:
+            raise ValueError("The {} report cannot be stored. Available reports are {}".format(
+                report, ', '.join(sorted(self.REPORTS))))
+
+    def missing(self, report, fromdate, todate, now=None):
+        """ Return the requests needed to fetch the data for fromdate to todate that is not
+        already stored, or may since have been revised.
+
+        :param report: Name of the report.
+        :param fromdate: First settlement date.
+        :param todate: Last settlement date.
+        :param now: The time to use as the current time. Defaults to datetime.now()
+        :returns: List of parameter dicts, in chronological order.
+        :rtype: list
+        """
+        api_class = self.api_class(report)
+        current = self._current_units(report.upper(), fromdate, todate, now or datetime.now())
+
+        # Plan requests for each run of consecutive days with missing data, so reports
+        # that can request ranges of dates still do so.
+        plan = []
+        run = []
+        for day in settlement_days(fromdate, todate):
+            if self._day_complete(api_class, day, current):
+                if run:
+                    plan.extend(api_class.plan_requests(run[0], run[-1]))
+                run = []
+            else:
+                run.append(day)
+        if run:
+            plan.extend(api_class.plan_requests(run[0], run[-1]))
+        return [params for params in plan
+                if not all(unit in current for unit in self._request_units(params))]
+
+    def sync(self, report, fromdate, todate):
+        """ Fetch and store any data for the dates fromdate to todate that is missing.
+        Requests that fail are not recorded as fetched, so are retried on the next sync.
+
+        :param report: Name of the report.
+        :param fromdate: First settlement date.
+        :param todate: Last settlement date.
+        :returns: Number of records added or updated.
+        :rtype: int
+        """
+        if self.apikey is None:
+            raise Exception("An API key is required to use the Elexon API accessor functionality")
+        report = report.upper()
+        requests = self.missing(report, fromdate, todate)
+        if not requests:
+            return 0
+        fetcher = RangeFetcher(self.api_class(report), self.apikey, workers=self.workers)
+        fetcher.fetch_requests(requests)
+        stored = 0
+        fetched = datetime.now().isoformat()
+        for idx in sorted(fetcher.results):
+            stored += self.add(report, fetcher.results[idx])
+            with self._lock:
+                self._db.executemany("INSERT OR REPLACE INTO fetched VALUES (?, ?, ?, ?)",
+                                     [(report, day.isoformat(), period, fetched)
+                                      for day, period in self._request_units(fetcher.requests[idx])])
+                self._db.commit()
+        return stored
+
+    def add(self, report, api):
+        """ Store the records from an api object. A record that is already stored is only
+        replaced if the new record has the same or a later documentRevNum.
+
+        :param report: Name of the report.
+        :param api: The :class:`pywind.elexon.api.ElexonAPI` object holding the records.
+        :returns: Number of records added or updated.
+        :rtype: int
+        """
+        report = report.upper()
+        keys = self.RECORD_KEYS[report]
+        if api.MULTI_RESULTS:
+            result_sets = [(name, api.multi.get(name, [])) for name in api.MULTI_RESULTS]
+        else:
+            result_sets = [('', api.items)]
+
+        stored = 0
+        with self._lock:
+            for name, items in result_sets:
+                for item in items:
+                    key = '|'.join(str(item.get(field)) for field in keys)
+                    revision = record_revision(item)
+                    cur = self._db.execute(
+                        "INSERT OR REPLACE INTO records "
+                        "SELECT ?, ?, ?, ?, ?, ?, ? WHERE NOT EXISTS ("
+                        "  SELECT 1 FROM records WHERE report = ? AND result_set = ? AND key = ?"
+                        "  AND revision > ?)",
+                        (report, name, key, _settlement_date(item), item.get('settlementperiod') or 0,
+                         revision, encode_record(item),
+                         report, name, key, revision))
+                    stored += cur.rowcount
+            self._db.commit()
+        return stored
+
+    def load(self, report, fromdate, todate):
+        """ Return an api object containing the stored records for the settlement dates
+        fromdate to todate, in date and settlement period order.
+
+        :param report: Name of the report.
+        :param fromdate: First settlement date.
+        :param todate: Last settlement date.
+        :rtype: :class:`pywind.elexon.api.ElexonAPI`
+        """
+        report = report.upper()
+        api = self.api_class(report)(self.apikey)
+        for name in api.MULTI_RESULTS:
+            api.multi[name] = api._new_items()
+        with self._lock:
+            rows = self._db.execute("SELECT result_set, data FROM records WHERE report = ? "
+                                    "AND settlement_date BETWEEN ? AND ? "
+                                    "ORDER BY settlement_date, settlement_period, rowid",
+                                    (report, fromdate.isoformat(), todate.isoformat())).fetchall()
+        for name, data in rows:
+            item = decode_record(data)
+            if name:
+                api.multi.setdefault(name, api._new_items()).append(item)
+            else:
+                api.items.append(item)
+        return api
+
+    def close(self):
+        """ Close the underlying database. """
+        with self._lock:
+            self._db.close()
+
+    def _current_units(self, report, fromdate, todate, now):
+        """ Return the set of (date, period) that have been fetched and don't need to be
+        fetched again.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT settlement_date, settlement_period, fetched FROM fetched "
+                                    "WHERE report = ? AND settlement_date BETWEEN ? AND ?",
+                                    (report, fromdate.isoformat(), todate.isoformat())).fetchall()
+        current = set()
+        for day, period, fetched in rows:
+            day = as_date(day)
+            if not needs_refresh(day, fetched, now, self.REVISION_WINDOW, self.REFRESH_AFTER):
+                current.add((day, period))
+        return current
+
+    def _day_complete(self, api_class, day, current):
+        for params in api_class.plan_requests(day, day):
+            for unit in self._request_units(params):
+                if unit[0] == day and unit not in current:
+                    return False
+        return True
+
+    @staticmethod
+    def _request_units(params):
+        """ Return the (date, period) units covered by a request. Requests for whole days
+        use period 0.
+        """
+        if 'Period' in params:
+            return [(as_date(params['SettlementDate']), int(params['Period']))]
+        if 'SettlementDate' in params:
+            return [(as_date(params['SettlementDate']), 0)]
+        if 'FromSettlementDate' in params:
+            return [(day, 0) for day in settlement_days(as_date(params['FromSettlementDate']),
+                                                        as_date(params['ToSettlementDate']))]
+        if 'FromDateTime' in params:
+            # The times are UTC, so during BST a settlement day starts at 23:00 on the
+            # previous day.
+            return [(day, 0)
+                    for day in settlement_days(settlement_period(_param_datetime(params['FromDateTime']))[0],
+                                               settlement_period(_param_datetime(params['ToDateTime']))[0])]
+        raise ValueError("Unable to determine the dates requested by {}".format(params))
+
+
+_TEMPORAL = (('$datetime', datetime), ('$date', date), ('$time', time))
+_PARSERS = {
+    '$datetime': datetime.fromisoformat,
+    '$date': date.fromisoformat,
+    '$time': time.fromisoformat,
+}
+
+
+def _json_default(val):
+    for tag, typ in _TEMPORAL:
+        if isinstance(val, typ):
+            return {tag: val.isoformat()}
+    raise TypeError("Unable to store a {} value".format(type(val).__name__))
+
+
+def _json_object(obj):
+    if len(obj) == 1:
+        tag, val = next(iter(obj.items()))
+        if tag in _PARSERS:
+            return _PARSERS[tag](val)
+    return obj
+
+
+def encode_record(item):
+    """ Return a record as JSON, with date, datetime and time values tagged so that
+    :func:`decode_record` restores them.
+
+    :param item: Dict of field values.
+    :rtype: str
+    """
+    return json.dumps(item, default=_json_default, separators=(',', ':'))
+
+
+def decode_record(data):
+    """ Return the record stored by :func:`encode_record`.
+
+    :param data: The JSON string.
+    :rtype: dict
+    """
+    return json.loads(data, object_hook=_json_object)
+
+
+def needs_refresh(day, fetched, now, revision_window=ElexonStore.REVISION_WINDOW,
+                  refresh_after=ElexonStore.REFRESH_AFTER):
+    """ Return True if data for a settlement date should be fetched again. Data fetched
+    within revision_window of the start of the day may since have been revised, so is
+    fetched again once refresh_after has passed.
+
+    :param day: The settlement date.
+    :param fetched: When the data was fetched, as a datetime or ISO format string.
+    :param now: The current time.
+    :param revision_window: How long after the settlement date revisions are expected.
+    :param refresh_after: How long a fetch that may have been revised is used for.
+    :rtype: bool
+    """
+    if not isinstance(fetched, datetime):
+        fetched = datetime.strptime(fetched[:19], "%Y-%m-%dT%H:%M:%S")
+    revisable = fetched < datetime.combine(day, datetime.min.time()) + revision_window
+    return revisable and now - fetched > refresh_after
+
+
+def _param_datetime(val):
+    """ Return the datetime for a datetime or YYYY-MM-DD HH:MM:SS string parameter. """
+    if isinstance(val, datetime):
+        return val
+    return datetime.strptime(str(val)[:19], "%Y-%m-%d %H:%M:%S")
+
+
+def _settlement_date(item):
+    """ Return the settlement date of a record as YYYY-MM-DD. """
+    for field in ('settlementdate', 'starttimeofhalfhrperiod', 'date'):
+        val = item.get(field)
+        if isinstance(val, date):
+            return val.isoformat()
+        if val:
+            return str(val)[:10]
+    return None
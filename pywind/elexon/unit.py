@@ -1,4 +1,7 @@
+import numpy as np
+
 from pywind.elexon.api import DERBMDATA
+from pywind.elexon.columns import ColumnarItems, ratio, require_pandas
 
 
 class BalancingPeriodData(object):
@@ -46,11 +49,223 @@ class BalancingUnitData(object):
         period.add_data(element, item)
 
 
+class BalancingAggregator(object):
+    """ Array backed totals of the bid and offer volumes and cashflows from DERBMDATA for
+    each unit, settlement day and settlement period.
+
+    Each result set is added in a single pass over its columns, and the values are held
+    as arrays of (unit, day, period) with a column for each of the MEASURES, so rates
+    and totals per unit, day or month are calculated as array operations.
+
+    .. code::
+
+       >>> agg = BalancingAggregator()
+       >>> agg.add(api)
+       >>> names, totals = agg.by_unit()
+       >>> totals[:, agg.BID_CASHFLOW]
+    """
+    #: Result sets used and the measure each provides.
+    ELEMENTS = ('ipbav', 'ipoav', 'ipbc', 'ipoc')
+    MEASURES = ('bid_volume', 'offer_volume', 'bid_cashflow', 'offer_cashflow')
+    BID_VOLUME, OFFER_VOLUME, BID_CASHFLOW, OFFER_CASHFLOW = range(4)
+    # Settlement periods are stored from 1 to 50.
+    PERIODS = 51
+
+    def __init__(self):
+        self.units = []
+        self.leads = []
+        self.bmunits = []
+        self.days = []
+        self._unit_index = {}
+        self._day_index = {}
+        self._chunks = []
+        self._keys = np.zeros(0, dtype=np.int64)
+        self._values = np.zeros((0, len(self.MEASURES)))
+
+    def __len__(self):
+        """ Number of unit, day and period combinations with data. """
+        return len(self.keys)
+
+    def add(self, api):
+        """ Add the result sets from a :class:`pywind.elexon.api.DERBMDATA` object.
+
+        :param api: The DERBMDATA object.
+        """
+        for measure, element in enumerate(self.ELEMENTS):
+            self.add_items(measure, api.multi.get(element, []))
+
+    def add_items(self, measure, items):
+        """ Add the records for a single measure. Records with a total of zero are ignored
+        and a later value for the same unit, day and period replaces an earlier one.
+
+        :param measure: Index of the measure in MEASURES.
+        :param items: The records, as a list of dicts or :class:`ColumnarItems`.
+        """
+        if len(items) == 0:
+            return
+        totals = _column(items, 'total').astype(np.float64)
+        keep = totals != 0
+        if not keep.any():
+            return
+        names = _column(items, 'ngcbmunitname')[keep]
+        leads = _column(items, 'leadpartyname')[keep]
+        bmunits = _column(items, 'bmunitid')[keep]
+        dates = _column(items, 'settlementdate')[keep]
+        periods = _column(items, 'settlementperiod')[keep].astype(np.int64)
+
+        unit_idx = self._lookup(names, self._unit_index, self.units, self._add_unit,
+                                leads, bmunits)
+        day_idx = self._lookup(np.array([str(dtt)[:10] for dtt in dates], dtype=object),
+                               self._day_index, self.days, self._add_day)
+        keys = (unit_idx * 0x10000 + day_idx) * self.PERIODS + periods
+        values = np.zeros((len(keys), len(self.MEASURES)))
+        values[:, measure] = totals[keep]
+        self._chunks.append((measure, keys, values))
+
+    @property
+    def keys(self):
+        """ Array of the combined unit, day and period key for each row of values. """
+        self._freeze()
+        return self._keys
+
+    @property
+    def values(self):
+        """ Array with a row for each unit, day and period and a column for each measure. """
+        self._freeze()
+        return self._values
+
+    @property
+    def unit_indexes(self):
+        """ Index into units for each row of values. """
+        return self.keys // self.PERIODS // 0x10000
+
+    @property
+    def day_indexes(self):
+        """ Index into days for each row of values. """
+        return self.keys // self.PERIODS % 0x10000
+
+    @property
+    def periods(self):
+        """ Settlement period for each row of values. """
+        return self.keys % self.PERIODS
+
+    def rates(self, values=None):
+        """ Return the bid and offer rates (cashflow / volume, or 0 where there is no volume).
+
+        :param values: Array of measures, defaulting to values.
+        :returns: Tuple of bid rate and offer rate arrays.
+        """
+        if values is None:
+            values = self.values
+        return (ratio(values[..., self.BID_CASHFLOW], values[..., self.BID_VOLUME]),
+                ratio(values[..., self.OFFER_CASHFLOW], values[..., self.OFFER_VOLUME]))
+
+    def by_unit(self):
+        """ Total of each measure for every unit.
+
+        :returns: Tuple of the unit names and an array of shape (units, measures)
+        """
+        return list(self.units), self._sum(self.unit_indexes, len(self.units))
+
+    def by_day(self):
+        """ Total of each measure for every unit and day.
+
+        :returns: Tuple of the unit names, the days and an array of shape (units, days, measures)
+        """
+        totals = self._sum(self.unit_indexes * len(self.days) + self.day_indexes,
+                           len(self.units) * len(self.days))
+        return (list(self.units), [_as_date(day) for day in self.days],
+                totals.reshape(len(self.units), len(self.days), len(self.MEASURES)))
+
+    def by_month(self):
+        """ Total of each measure for every unit and month.
+
+        :returns: Tuple of the unit names, the first day of each month and an array of
+                  shape (units, months, measures)
+        """
+        day_months = np.array(self.days, dtype='datetime64[D]').astype('datetime64[M]')
+        months, month_idx = np.unique(day_months, return_inverse=True)
+        row_months = month_idx.reshape(-1)[self.day_indexes]
+        totals = self._sum(self.unit_indexes * len(months) + row_months,
+                           len(self.units) * len(months))
+        return (list(self.units), months.astype('datetime64[D]').astype(object).tolist(),
+                totals.reshape(len(self.units), len(months), len(self.MEASURES)))
+
+    def _sum(self, groups, size):
+        totals = np.zeros((size, len(self.MEASURES)))
+        for measure in range(len(self.MEASURES)):
+            totals[:, measure] = np.bincount(groups, weights=self.values[:, measure], minlength=size)
+        return totals
+
+    def _add_unit(self, name, lead, bmunit):
+        self.units.append(name)
+        self.leads.append(lead)
+        self.bmunits.append(bmunit)
+
+    def _add_day(self, day):
+        self.days.append(day)
+
+    @staticmethod
+    def _lookup(names, index, known, add, *extra):
+        """ Return the index of each name, adding any that are new. Only the distinct
+        names are looked up individually.
+        """
+        distinct, first, inverse = np.unique(names.astype(str), return_index=True, return_inverse=True)
+        positions = np.empty(len(distinct), dtype=np.int64)
+        for pos, name in enumerate(distinct.tolist()):
+            if name not in index:
+                index[name] = len(known)
+                add(name, *[values[first[pos]] for values in extra])
+            positions[pos] = index[name]
+        return positions[inverse.reshape(-1)]
+
+    def _freeze(self):
+        """ Merge any records added into the arrays. For each measure the last value added
+        for a unit, day and period is kept.
+        """
+        if not self._chunks:
+            return
+        keys = [self._keys]
+        values = [self._values]
+        for measure, chunk_keys, chunk_values in self._chunks:
+            keys.append(chunk_keys)
+            values.append(chunk_values)
+        self._chunks = []
+        keys = np.concatenate(keys)
+        values = np.concatenate(values)
+
+        distinct, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        merged = np.zeros((len(distinct), len(self.MEASURES)))
+        for measure in range(len(self.MEASURES)):
+            rows = np.nonzero(values[:, measure])[0]
+            # Later rows overwrite earlier ones when assigned in order.
+            merged[inverse[rows], measure] = values[rows, measure]
+        self._keys = distinct
+        self._values = merged
+
+
+def _column(items, field):
+    if isinstance(items, ColumnarItems):
+        return np.asarray(items.column(field))
+    return np.array([item.get(field) for item in items], dtype=object)
+
+
+def _as_date(day):
+    return np.datetime64(day, 'D').astype(object)
+
+
 class BalancingData(object):
-    """ Parent class to hold data from the :mod:DERBMDATA API. """
+    """ Parent class to hold data from the :mod:DERBMDATA API.
+
+        The data is held by a :class:`BalancingAggregator` in the aggregator member. The
+        units member, giving :class:`BalancingUnitData` for each unit, is created from it
+        when first used.
+    """
     def __init__(self, api_key):
         self.api = DERBMDATA(api_key)
-        self.units = {}
+        self.aggregator = BalancingAggregator()
+        self._units = None
 
     def get_data(self, **params):
         if 'Period' in params:
@@ -59,12 +274,59 @@ class BalancingData(object):
         if self.api.get_data(**params) is False:
             return False
 
-        for element in self.api.multi:
-            for item in self.api.multi[element]:
-                if item['total'] == 0:
-                    continue
-                unit = self.units.setdefault(item['ngcbmunitname'],
-                                             BalancingUnitData(item))
-                unit.add_data(element, item)
+        self.add(self.api)
         return True
 
+    def add(self, api):
+        """ Add the records from a :class:`pywind.elexon.api.DERBMDATA` object, such as
+            one returned by :class:`pywind.elexon.fetch.RangeFetcher`.
+        """
+        self.aggregator.add(api)
+        self._units = None
+
+    @property
+    def units(self):
+        """ Dict of unit name to :class:`BalancingUnitData`. """
+        if self._units is None:
+            self._units = self._make_units()
+        return self._units
+
+    def _make_units(self):
+        agg = self.aggregator
+        units = {}
+        unit_idx = agg.unit_indexes
+        periods = agg.periods
+        values = agg.values
+        # Rows are in unit, day, period order, so later days replace earlier ones.
+        for row in range(len(values)):
+            uidx = unit_idx[row]
+            name = agg.units[uidx]
+            unit = units.get(name)
+            if unit is None:
+                unit = units[name] = BalancingUnitData({'ngcbmunitname': name,
+                                                        'leadpartyname': agg.leads[uidx],
+                                                        'bmunitid': agg.bmunits[uidx]})
+            for measure, element in enumerate(agg.ELEMENTS):
+                if values[row, measure] != 0:
+                    unit.add_data(element, {'settlementperiod': int(periods[row]),
+                                            'total': float(values[row, measure])})
+        return units
+
+    def to_frame(self):
+        """ Return a :class:`pandas.DataFrame` with a row for each unit, settlement date and
+            settlement period, giving the volumes and cashflows.
+        """
+        pd = require_pandas()
+        agg = self.aggregator
+        unit_idx = agg.unit_indexes
+        values = agg.values
+        frame = pd.DataFrame({
+            'unit': np.array(agg.units, dtype=object)[unit_idx],
+            'lead': pd.Categorical(np.array(agg.leads, dtype=object)[unit_idx]),
+            'type': pd.Categorical([bmunit[0] for bmunit in np.array(agg.bmunits, dtype=object)[unit_idx]]),
+            'settlementdate': np.array(agg.days, dtype='datetime64[D]')[agg.day_indexes].astype('datetime64[ns]'),
+            'settlementperiod': agg.periods.astype(np.int8),
+        })
+        for measure, name in enumerate(agg.MEASURES):
+            frame[name] = values[:, measure]
+        return frame
@@ -37,7 +37,7 @@ def ofgem_certificate_search(args):
         print("You must supply at least a period or scheme.")
         sys.exit(0)
 
-    ocs = CertificateSearch()
+    ocs = CertificateSearch(keep_original=args.save)
     if ocs.start() is False:
         print("Unable to get the form from Ofgem website.")
         sys.exit(0)
@@ -63,7 +63,7 @@ def ofgem_certificate_search(args):
 def ofgem_station_search(args):
     """ Ofgem Station Search """
 
-    oss = StationSearch()
+    oss = StationSearch(keep_original=args.save)
     if oss.start() is False:
         print("Unable to get the form from the Ofgem website")
         sys.exit(0)
@@ -35,7 +35,6 @@ from __future__ import print_function
 
 import logging
 import os
-from lxml import etree
 
 try:
     from urllib import unquote
@@ -43,7 +42,8 @@ except ImportError:
     from urllib.parse import unquote
 
 from pywind.ofgem.form_data import FormData
-from pywind.utils import get_or_post_a_url
+from pywind.session import get_session_pool
+from pywind.utils import get_or_post_a_url, iterparse_response
 
 
 def _make_url(url, public=True):
@@ -63,25 +63,40 @@ def _make_url(url, public=True):
 
 
 class OfgemForm(object):
-    """ Class to represent an instance of an Ofgem form. """
+    """ Class to represent an instance of an Ofgem form.
 
-    def __init__(self, url):
+    :param url: The url of the form.
+    :param session: Optional :class:`requests.Session` to use.
+    :param keep_original: Keep the downloaded export so it can be saved by :func:`save_original`.
+    """
+
+    def __init__(self, url, session=None, keep_original=False):
         self.start_url = _make_url(url)
+        # Each form needs its own cookies, so doesn't use the shared session for the host.
+        self.session = session or get_session_pool().new_session()
         self.cookies = None
         self.action_url = None
         self.form_data = None
         self.export_url = None
+        self.keep_original = keep_original
+        self.export = None
         self.raw_data = None
         self.logger = logging.getLogger(__name__)
 
     def get(self):
         """ Attempt to get the initial version of the form from the website. """
         if self.cookies is None:
-            get_or_post_a_url(_make_url('Default.aspx', False))
-            response = get_or_post_a_url(_make_url('ReportManager.aspx?ReportVisibility=1&ReportCategory=0'))
-            self.cookies = {'ASP.NET_SessionId': response.cookies.get('ASP.NET_SessionId')}
-
-        response = get_or_post_a_url(self.start_url, cookies=self.cookies)
+            get_or_post_a_url(_make_url('Default.aspx', False), session=self.session)
+            response = get_or_post_a_url(_make_url('ReportManager.aspx?ReportVisibility=1&ReportCategory=0'),
+                                         session=self.session)
+            # The cookie is only set once for a session, so may already be in the jar.
+            session_id = response.cookies.get('ASP.NET_SessionId') or \
+                self.session.cookies.get('ASP.NET_SessionId')
+            self.cookies = {}
+            if session_id is not None:
+                self.cookies['ASP.NET_SessionId'] = session_id
+
+        response = get_or_post_a_url(self.start_url, cookies=self.cookies, session=self.session)
         if 'TS01924b6d' in response.cookies:
             self.cookies['TS01924b6d'] = response.cookies.get('TS01924b6d')
 
@@ -124,13 +139,33 @@ class OfgemForm(object):
             self.logger.warning("Unable to find the export url. Cannot continue.")
             return False
 
+        # The export can be several megabytes, so it is parsed by details() as it is downloaded.
         export_url = _make_url(self.form_data.export_url) + 'XML'
-        response = get_or_post_a_url(export_url, cookies=self.cookies)
-        self.raw_data = response.content
+        self.export = get_or_post_a_url(export_url, cookies=self.cookies, session=self.session,
+                                        stream=True)
+        self.raw_data = None
         return True
 
+    def details(self):
+        """ Generator of the Detail elements from the export requested by :func:`submit`.
+        The export is parsed as it is downloaded and each element is cleared when the next
+        is requested, so the information needed should be extracted straight away.
+
+        :raises: :exc:`lxml.etree.XMLSyntaxError` if the export is not valid XML.
+        """
+        if self.export is None:
+            return
+        response, self.export = self.export, None
+        chunks = [] if self.keep_original else None
+        try:
+            yield from iterparse_response(response, '{*}Detail', chunks, huge_tree=True)
+        finally:
+            if chunks is not None:
+                self.raw_data = b''.join(chunks)
+
     def save_original(self, filename):
-        """ Save the original, downloaded source into the filename provided.
+        """ Save the original, downloaded source into the filename provided. This is only
+        available if the form was created with keep_original set.
 
         :param filename: Filename to save the file to.
         :returns: True or False
@@ -173,6 +208,7 @@ class OfgemForm(object):
         response = get_or_post_a_url(action_url,
                                      post=True,
                                      cookies=self.cookies,
+                                     session=self.session,
                                      headers=form_hdrs,
                                      data=post_data)
         return response
@@ -27,7 +27,7 @@
 
 import datetime
 
-from pywind.utils import map_xml_to_dict
+from pywind.utils import xml_mapper_for
 
 
 class OfgemObjectBase(object):
@@ -40,7 +40,7 @@ class OfgemObjectBase(object):
         if self.XML_MAPPING is None:
             raise NotImplementedError("Child classes should define their XML_MAPPING")
 
-        self.attrs = map_xml_to_dict(node, self.XML_MAPPING)
+        self.attrs = xml_mapper_for(self.__class__)(node)
 
     def __getattr__(self, item):
         if item in self.attrs:
@@ -30,8 +30,6 @@
 import copy
 from lxml import etree
 
-from lxml.etree import XMLParser, XMLSyntaxError
-
 from pywind.ofgem.form import OfgemForm
 from pywind.ofgem.objects import Station, Certificates
 
@@ -65,7 +63,7 @@ class CertificateSearch(object):
 
     NSMAP = {'a': 'CertificatesExternalPublicDataWarehouse'}
 
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, keep_original=False):
         self.has_data = False
         self.form = None
         self.certificate_records = []
@@ -74,7 +72,7 @@ class CertificateSearch(object):
         if filename is not None:
             self.parse_filename(filename)
         else:
-            self.form = OfgemForm(self.START_URL)
+            self.form = OfgemForm(self.START_URL, keep_original=keep_original)
 
     def __len__(self):
         return len(self.certificate_records)
@@ -174,18 +172,18 @@ class CertificateSearch(object):
 
         if not self.form.submit(script="ScriptManager1|ReportViewer$ctl09$Reserved_AsyncLoadTarget"):
             return False
-        
+
         try:
-            xml = etree.fromstring(self.form.raw_data)
-        except XMLSyntaxError:
+            for node in self.form.details():
+                cert = Certificates(node)
+                self.certificate_records.append(cert)
+                self.station_records.setdefault(cert.name, []).append(cert)
+        except etree.XMLSyntaxError:
             print("Invalid XML returned from Ofgem server.")
+            self.certificate_records = []
+            self.station_records = {}
             return False
 
-        for node in xml.xpath('.//a:Detail', namespaces=self.NSMAP):
-            cert = Certificates(node)
-            self.certificate_records.append(cert)
-            self.station_records.setdefault(cert.name, []).append(cert)
-
         self.has_data = len(self.certificate_records) > 0
         return self.has_data
 
@@ -284,8 +282,8 @@ class StationSearch(object):
     START_URL = 'ReportViewer.aspx?ReportPath=/Renewables/Accreditation/' + \
                 'AccreditedStationsExternalPublic&ReportVisibility=1&ReportCategory=1'
 
-    def __init__(self):
-        self.form = OfgemForm(self.START_URL)
+    def __init__(self, keep_original=False):
+        self.form = OfgemForm(self.START_URL, keep_original=keep_original)
         self.stations = []
 
     def __len__(self):
@@ -311,20 +309,22 @@ class StationSearch(object):
         if not self.form.submit():
             return False
 
-        parser = XMLParser(huge_tree=True)
-        doc = etree.fromstring(self.form.raw_data, parser=parser)
         # There are a few stations with multiple generator id's, separated by '\n' so
         # capture them and add each as a separate entry.
-        for detail in doc.xpath("//*[local-name()='Detail']"):
-            stt = Station(detail)
-            if '\n' in stt.generator_id:
-                ids = [x.strip() for x in stt.generator_id.split('\n')]
-                stt.generator_id = ids[0]
-                for _id in ids[1:]:
-                    _st = copy.copy(stt)
-                    _st.generator_id = _id
-                    self.stations.append(_st)
-            self.stations.append(stt)
+        try:
+            for detail in self.form.details():
+                stt = Station(detail)
+                if '\n' in stt.generator_id:
+                    ids = [x.strip() for x in stt.generator_id.split('\n')]
+                    stt.generator_id = ids[0]
+                    for _id in ids[1:]:
+                        _st = copy.copy(stt)
+                        _st.generator_id = _id
+                        self.stations.append(_st)
+                self.stations.append(stt)
+        except etree.XMLSyntaxError:
+            self.stations = []
+            return False
         return len(self.stations) > 0
 
     def filter_technology(self, what):
@@ -0,0 +1,180 @@
+# coding=utf-8
+
+# This is free and unencumbered software released into the public domain.
+#
+# Anyone is free to copy, modify, publish, use, compile, sell, or
+# distribute this software, either in source code form or as a compiled
+# binary, for any purpose, commercial or non-commercial, and by any
+# means.
+
+# In jurisdictions that recognize copyright laws, the author or authors
+# of this software dedicate any and all copyright interest in the
+# software to the public domain. We make this dedication for the benefit
+# of the public at large and to the detriment of our heirs and
+# successors. We intend this dedication to be an overt act of
+# relinquishment in perpetuity of all present and future rights to this
+# software under copyright law.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# For more information, please refer to <http://unlicense.org/>
+
+"""
+Per host rate limiting for :func:`pywind.utils.get_or_post_a_url`.
+
+Each host with a configured limit has a :class:`TokenBucket` that is shared by every
+thread, so concurrent requests together stay under the limit rather than each caller
+sleeping by hand. The buckets can also be awaited from asyncio code.
+
+Limits can be supplied as a dict or read from a configuration file with a
+``[rate_limits]`` section giving the requests per second and optional burst for each host,
+
+.. code::
+
+   [rate_limits]
+   api.bmreports.com = 5, 10
+   renewablesandchp.ofgem.gov.uk = 1
+
+"""
+
+import asyncio
+import threading
+import time
+
+try:
+    from configparser import ConfigParser
+except ImportError:
+    from ConfigParser import ConfigParser
+
+from pywind.session import host_for_url
+
+
+#: Default limits as host: (requests per second, burst)
+DEFAULT_LIMITS = {
+    'api.bmreports.com': (5.0, 10),
+    'renewablesandchp.ofgem.gov.uk': (1.0, 2),
+    'www.bmreports.com': (2.0, 4),
+}
+
+
+class TokenBucket(object):
+    """ Thread safe token bucket.
+
+    Tokens are reserved as soon as they are requested, so callers are queued in the order
+    they arrive and the wait returned is the time until their token is available.
+
+    :param rate: Number of tokens added per second.
+    :param capacity: Maximum number of tokens that can accumulate (the burst size).
+    """
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("The rate for a TokenBucket must be greater than 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """ Reserve tokens and return how long the caller must wait before using them.
+
+        :param tokens: Number of tokens required.
+        :returns: Seconds to wait.
+        :rtype: float
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self, tokens=1):
+        """ Block until tokens are available. """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=1):
+        """ Wait, without blocking the event loop, until tokens are available. """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class RateLimiter(object):
+    """ Collection of :class:`TokenBucket` objects, one per host.
+
+    :param limits: Dict of host to requests per second or (requests per second, burst).
+                   Defaults to :data:`DEFAULT_LIMITS`. Hosts not listed are not limited.
+    """
+    def __init__(self, limits=None):
+        self.buckets = {}
+        for host, limit in (DEFAULT_LIMITS if limits is None else limits).items():
+            if not isinstance(limit, (list, tuple)):
+                limit = (limit,)
+            self.buckets[host.lower()] = TokenBucket(*limit)
+
+    @classmethod
+    def from_config(cls, filename, section='rate_limits'):
+        """ Create a RateLimiter using the limits given in a configuration file.
+
+        :param filename: Filename of the configuration file.
+        :param section: Section of the file containing the limits.
+        :rtype: :class:`RateLimiter`
+        """
+        cfg = ConfigParser()
+        cfg.read(filename)
+        limits = {}
+        if cfg.has_section(section):
+            for host, value in cfg.items(section):
+                limits[host] = tuple(float(part) for part in value.split(','))
+        return cls(limits)
+
+    def bucket_for(self, url):
+        """ Return the bucket for the host of the URL, or None if it is not limited.
+
+        :rtype: :class:`TokenBucket`
+        """
+        return self.buckets.get(host_for_url(url))
+
+    def acquire(self, url):
+        """ Block until a request can be made to the URL. """
+        bucket = self.bucket_for(url)
+        if bucket is not None:
+            bucket.acquire()
+
+    async def acquire_async(self, url):
+        """ Wait, without blocking the event loop, until a request can be made to the URL. """
+        bucket = self.bucket_for(url)
+        if bucket is not None:
+            await bucket.acquire_async()
+
+
+_RATE_LIMITER = RateLimiter()
+
+
+def get_rate_limiter():
+    """ Return the :class:`RateLimiter` in use.
+
+    :rtype: :class:`RateLimiter`
+    """
+    return _RATE_LIMITER
+
+
+def set_rate_limiter(limiter):
+    """ Set the :class:`RateLimiter` used for all requests. Passing a RateLimiter with an
+    empty dict of limits disables rate limiting.
+
+    :param limiter: The new :class:`RateLimiter`
+    """
+    global _RATE_LIMITER
+    _RATE_LIMITER = limiter
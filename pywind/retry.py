@@ -0,0 +1,241 @@
+# coding=utf-8
+
+# This is free and unencumbered software released into the public domain.
+#
+# Anyone is free to copy, modify, publish, use, compile, sell, or
+# distribute this software, either in source code form or as a compiled
+# binary, for any purpose, commercial or non-commercial, and by any
+# means.
+
+# In jurisdictions that recognize copyright laws, the author or authors
+# of this software dedicate any and all copyright interest in the
+# software to the public domain. We make this dedication for the benefit
+# of the public at large and to the detriment of our heirs and
+# successors. We intend this dedication to be an overt act of
+# relinquishment in perpetuity of all present and future rights to this
+# software under copyright law.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# For more information, please refer to <http://unlicense.org/>
+
+"""
+Retry and circuit breaker support for :func:`pywind.utils.get_or_post_a_url`.
+
+Connection errors and responses with a status code such as 429 or 503 are retried using
+exponential backoff with jitter. When the server supplies a ``Retry-After`` header it is
+honoured. Every host also has a circuit breaker, so once a host has failed repeatedly
+further requests fail immediately with :exc:`CircuitOpenError` until a cool off period has
+passed. This lets parallel workers stop hammering a failing endpoint and record the
+requests that failed for a later retry.
+
+.. code::
+
+   >>> from pywind.retry import RetryPolicy, set_retry_policy
+   >>> set_retry_policy(RetryPolicy(max_attempts=6, backoff_factor=1.0))
+
+"""
+
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+
+class RequestError(Exception):
+    """ Raised when a request cannot be completed successfully.
+
+    :param message: Description of the error.
+    :param url: The URL requested.
+    :param status_code: The HTTP status code, if a response was received.
+    """
+    def __init__(self, message, url=None, status_code=None):
+        super(RequestError, self).__init__(message)
+        self.url = url
+        self.status_code = status_code
+
+
+class CircuitOpenError(RequestError):
+    """ Raised without making a request when the circuit breaker for a host is open. """
+
+
+class RetryPolicy(object):
+    """ Describes how failed requests should be retried.
+
+    :param max_attempts: Total number of attempts made for a request, including the first.
+    :param backoff_factor: Base delay in seconds. The delay before attempt n + 1 is
+                           backoff_factor * 2 ** (n - 1).
+    :param max_backoff: Maximum delay in seconds between attempts.
+    :param jitter: Fraction of the delay that is randomised, 0 to 1.
+    :param statuses: HTTP status codes that should be retried.
+    :param retry_post: Should POST requests be retried? Default is False.
+    :param max_retry_after: Largest Retry-After value (in seconds) that will be honoured.
+    """
+    def __init__(self, max_attempts=4, backoff_factor=0.5, max_backoff=30.0, jitter=0.5,
+                 statuses=(429, 500, 502, 503, 504), retry_post=False, max_retry_after=300.0):
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = statuses
+        self.retry_post = retry_post
+        self.max_retry_after = max_retry_after
+        self.sleep = time.sleep
+
+    def attempts(self, post=False):
+        """ Return the number of attempts allowed for a request.
+
+        :rtype: int
+        """
+        if post and not self.retry_post:
+            return 1
+        return max(1, self.max_attempts)
+
+    def delay(self, attempt, response=None):
+        """ Return the number of seconds to wait after a failed attempt.
+
+        :param attempt: The number of the attempt that failed, starting at 1.
+        :param response: The :class:`requests.Response` received, if any.
+        :rtype: float
+        """
+        if response is not None and response.status_code in (429, 503):
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.max_retry_after)
+        delay = min(self.max_backoff, self.backoff_factor * (2 ** (attempt - 1)))
+        return delay * (1 - self.jitter) + delay * self.jitter * random.random()
+
+
+def parse_retry_after(value):
+    """ Parse the value of a Retry-After header, which can be a number of seconds or an
+    HTTP date.
+
+    :param value: The header value.
+    :returns: Number of seconds to wait, or None if the value cannot be parsed.
+    :rtype: float
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, (when - datetime.now(when.tzinfo)).total_seconds())
+
+
+class CircuitBreaker(object):
+    """ Per host circuit breaker. After failure_threshold consecutive failures the circuit for
+    a host is opened and requests are refused for reset_timeout seconds. After that a single
+    trial request is allowed through and the circuit closes again if it succeeds.
+
+    :param failure_threshold: Consecutive failures that will open the circuit.
+    :param reset_timeout: Seconds to wait before allowing a trial request.
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = {}
+        self.opened = {}
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+    def is_open(self, host):
+        """ Is the circuit for host currently open?
+
+        :rtype: bool
+        """
+        with self._lock:
+            opened = self.opened.get(host)
+            return opened is not None and time.time() - opened < self.reset_timeout
+
+    def before_request(self, host):
+        """ Check that a request can be made to host.
+
+        :raises: :exc:`CircuitOpenError` if the circuit is open.
+        """
+        with self._lock:
+            opened = self.opened.get(host)
+            if opened is None:
+                return
+            if time.time() - opened < self.reset_timeout:
+                raise CircuitOpenError("Too many failures for {}, requests suspended.".format(host))
+            # Allow a single trial request and restart the timer for everyone else.
+            self.opened[host] = time.time()
+
+    def record_success(self, host):
+        """ Record a successful request, closing the circuit. """
+        with self._lock:
+            self.failures.pop(host, None)
+            self.opened.pop(host, None)
+
+    def record_failure(self, host):
+        """ Record a failed request, opening the circuit if the threshold is reached. """
+        with self._lock:
+            count = self.failures.get(host, 0) + 1
+            self.failures[host] = count
+            if count >= self.failure_threshold:
+                if host not in self.opened:
+                    self.logger.warning("Circuit opened for %s after %d failures", host, count)
+                self.opened[host] = time.time()
+
+    def reset(self, host=None):
+        """ Reset the state for a single host or, if host is None, for all hosts. """
+        with self._lock:
+            if host is None:
+                self.failures = {}
+                self.opened = {}
+            else:
+                self.failures.pop(host, None)
+                self.opened.pop(host, None)
+
+
+_RETRY_POLICY = RetryPolicy()
+_CIRCUIT_BREAKER = CircuitBreaker()
+
+
+def get_retry_policy():
+    """ Return the :class:`RetryPolicy` in use.
+
+    :rtype: :class:`RetryPolicy`
+    """
+    return _RETRY_POLICY
+
+
+def set_retry_policy(policy):
+    """ Set the :class:`RetryPolicy` used for all requests.
+
+    :param policy: The new :class:`RetryPolicy`
+    """
+    global _RETRY_POLICY
+    _RETRY_POLICY = policy
+
+
+def get_circuit_breaker():
+    """ Return the :class:`CircuitBreaker` in use.
+
+    :rtype: :class:`CircuitBreaker`
+    """
+    return _CIRCUIT_BREAKER
+
+
+def set_circuit_breaker(breaker):
+    """ Set the :class:`CircuitBreaker` used for all requests.
+
+    :param breaker: The new :class:`CircuitBreaker`
+    """
+    global _CIRCUIT_BREAKER
+    _CIRCUIT_BREAKER = breaker
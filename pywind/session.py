@@ -0,0 +1,222 @@
+# coding=utf-8
+
+# This is free and unencumbered software released into the public domain.
+#
+# Anyone is free to copy, modify, publish, use, compile, sell, or
+# distribute this software, either in source code form or as a compiled
+# binary, for any purpose, commercial or non-commercial, and by any
+# means.
+
+# In jurisdictions that recognize copyright laws, the author or authors
+# of this software dedicate any and all copyright interest in the
+# software to the public domain. We make this dedication for the benefit
+# of the public at large and to the detriment of our heirs and
+# successors. We intend this dedication to be an overt act of
+# relinquishment in perpetuity of all present and future rights to this
+# software under copyright law.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# For more information, please refer to <http://unlicense.org/>
+
+"""
+Pooled HTTP sessions used by :func:`pywind.utils.get_or_post_a_url`.
+
+Each host gets a single :class:`requests.Session` with a connection pool, so repeated
+requests to the same server reuse the existing keep-alive connections rather than
+paying for a new TCP and TLS handshake every time.
+
+.. code::
+
+   >>> from pywind.session import SessionPool, set_session_pool
+   >>> set_session_pool(SessionPool(pool_maxsize=20))
+
+The asyncio functions use an :class:`AsyncSessionPool` of :class:`aiohttp.ClientSession`
+objects in the same way, if aiohttp is installed. As aiohttp sessions must be closed
+before their event loop finishes, the pool can be used as an async context manager.
+
+.. code::
+
+   >>> async with get_async_session_pool() as pool:
+   ...     await aget_a_url(url)
+
+"""
+
+import asyncio
+import threading
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class SessionPool(object):
+    """ Thread safe collection of :class:`requests.Session` objects, one per host.
+
+    :param pool_connections: Number of connection pools to cache per session.
+    :param pool_maxsize: Maximum number of connections kept open to a single host.
+    :param pool_block: If True, threads will wait for a free connection rather than
+                       opening additional, non-pooled connections.
+    :param headers: Optional dict of headers added to every session.
+    """
+    def __init__(self, pool_connections=4, pool_maxsize=10, pool_block=False, headers=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.headers = headers or {}
+        self.sessions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def session_for(self, url):
+        """ Return the session to be used for the host in the supplied URL, creating it
+        if required.
+
+        :param url: The URL (or host) that will be requested.
+        :rtype: :class:`requests.Session`
+        """
+        host = host_for_url(url)
+        with self._lock:
+            session = self.sessions.get(host)
+            if session is None:
+                session = self.new_session()
+                self.sessions[host] = session
+        return session
+
+    def close(self):
+        """ Close all sessions and release their connections. """
+        with self._lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
+
+    def new_session(self):
+        """ Return a new session, not shared with other callers, that uses the same
+        connection pool settings and headers as the pooled sessions. This should be used
+        where the cookies must not be shared, e.g. for forms that keep server side state.
+
+        :rtype: :class:`requests.Session`
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              pool_block=self.pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update(self.headers)
+        return session
+
+
+class AsyncSessionPool(object):
+    """ Collection of :class:`aiohttp.ClientSession` objects, one per host. As aiohttp
+    sessions belong to an event loop, a new session is created if the loop changes.
+
+    :param limit_per_host: Maximum number of connections kept open to a single host.
+    """
+    def __init__(self, limit_per_host=10):
+        self.limit_per_host = limit_per_host
+        self.sessions = {}
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def session_for(self, url):
+        """ Return the session for the host in the supplied URL, creating it if required.
+        Must be called from a coroutine.
+
+        :param url: The URL (or host) that will be requested.
+        :rtype: :class:`aiohttp.ClientSession`
+        """
+        if aiohttp is None:
+            raise ImportError("The aiohttp module is required for AsyncSessionPool")
+        loop = asyncio.get_running_loop()
+        host = host_for_url(url)
+        session_loop, session = self.sessions.get(host, (None, None))
+        if session is None or session.closed or session_loop is not loop:
+            connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host)
+            session = aiohttp.ClientSession(connector=connector)
+            self.sessions[host] = (loop, session)
+        return session
+
+    async def close(self):
+        """ Close all sessions belonging to the running event loop. """
+        loop = asyncio.get_running_loop()
+        for host, (session_loop, session) in list(self.sessions.items()):
+            if session_loop is loop:
+                await session.close()
+                del self.sessions[host]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+def host_for_url(url):
+    """ Return the lower cased host (including any port) for a URL.
+
+    :param url: URL to parse. A bare hostname is returned unchanged.
+    :rtype: str
+    """
+    parts = urlsplit(url)
+    return (parts.netloc or parts.path).lower()
+
+
+_SESSION_POOL = SessionPool()
+_ASYNC_SESSION_POOL = AsyncSessionPool()
+
+
+def get_session_pool():
+    """ Return the :class:`SessionPool` currently in use.
+
+    :rtype: :class:`SessionPool`
+    """
+    return _SESSION_POOL
+
+
+def set_session_pool(pool):
+    """ Replace the :class:`SessionPool` used for all requests. Any sessions in the
+    previous pool are closed.
+
+    :param pool: The new :class:`SessionPool` instance.
+    """
+    global _SESSION_POOL
+    old_pool = _SESSION_POOL
+    _SESSION_POOL = pool
+    if old_pool is not pool:
+        old_pool.close()
+
+
+def get_async_session_pool():
+    """ Return the :class:`AsyncSessionPool` currently in use.
+
+    :rtype: :class:`AsyncSessionPool`
+    """
+    return _ASYNC_SESSION_POOL
+
+
+def set_async_session_pool(pool):
+    """ Replace the :class:`AsyncSessionPool` used for asyncio requests.
+
+    :param pool: The new :class:`AsyncSessionPool` instance.
+    """
+    global _ASYNC_SESSION_POOL
+    _ASYNC_SESSION_POOL = pool
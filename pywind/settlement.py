@@ -0,0 +1,260 @@
+# coding=utf-8
+
+# This is free and unencumbered software released into the public domain.
+#
+# Anyone is free to copy, modify, publish, use, compile, sell, or
+# distribute this software, either in source code form or as a compiled
+# binary, for any purpose, commercial or non-commercial, and by any
+# means.
+
+# In jurisdictions that recognize copyright laws, the author or authors
+# of this software dedicate any and all copyright interest in the
+# software to the public domain. We make this dedication for the benefit
+# of the public at large and to the detriment of our heirs and
+# successors. We intend this dedication to be an overt act of
+# relinquishment in perpetuity of all present and future rights to this
+# software under copyright law.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# For more information, please refer to <http://unlicense.org/>
+
+
+"""
+Settlement day and period calendar for Great Britain.
+
+Settlement periods are the half hours of the local (UK) day, starting at midnight, so
+there are 48 on most days, 46 on the day the clocks go forward and 50 on the day they
+go back. The start of every settlement day is calculated in advance for a range of
+years, so conversions between settlement date and period and UTC or local time are
+simple array lookups and can be applied to whole arrays at once.
+
+.. code::
+
+   >>> from pywind.settlement import periods_in_day, period_start, settlement_period
+   >>> periods_in_day(date(2016, 3, 27))
+   46
+   >>> period_start(date(2016, 3, 27), 3)
+   datetime.datetime(2016, 3, 27, 1, 0)
+   >>> settlement_period(datetime(2016, 10, 30, 1, 30))
+   (datetime.date(2016, 10, 30), 6)
+
+All UTC times are naive datetimes (or datetime64 values). The clock change rules used
+(last Sunday of March and October at 01:00 UTC) have applied since 1996.
+"""
+
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+
+HALF_HOUR = np.timedelta64(30, 'm')
+ONE_HOUR = np.timedelta64(60, 'm')
+
+
+def _last_sunday(year, month):
+    """ Return the date of the last Sunday of March or October. """
+    last = date(year, month, 31)
+    return last - timedelta(days=(last.weekday() + 1) % 7)
+
+
+def _as_days(dates):
+    return np.asarray(dates, dtype='datetime64[D]')
+
+
+def _as_minutes(times):
+    return np.asarray(times, dtype='datetime64[m]')
+
+
+class SettlementCalendar(object):
+    """ Precomputed tables of the start time and number of settlement periods for every
+    settlement day from the start of first_year to the end of last_year.
+
+    :param first_year: First year in the tables.
+    :param last_year: Last year in the tables.
+    """
+    def __init__(self, first_year=1996, last_year=2050):
+        self.first_year = first_year
+        self.last_year = last_year
+        years = np.arange(first_year, last_year + 1)
+        # Clock changes for each year, as dates and as UTC times.
+        self.bst_start_days = _as_days([_last_sunday(year, 3) for year in years])
+        self.bst_end_days = _as_days([_last_sunday(year, 10) for year in years])
+        self.bst_start = self.bst_start_days.astype('datetime64[m]') + ONE_HOUR
+        self.bst_end = self.bst_end_days.astype('datetime64[m]') + ONE_HOUR
+
+        self.first_day = np.datetime64('{}-01-01'.format(first_year), 'D')
+        # One extra day so the length of the last day can be found.
+        days = np.arange(self.first_day, np.datetime64('{}-01-02'.format(last_year + 1), 'D'))
+        year_idx = np.minimum(days.astype('datetime64[Y]').astype(int) + 1970 - first_year,
+                              len(years) - 1)
+        in_bst = (days > self.bst_start_days[year_idx]) & (days <= self.bst_end_days[year_idx])
+        starts = days.astype('datetime64[m]') - np.where(in_bst, ONE_HOUR, np.timedelta64(0, 'm'))
+
+        #: The settlement days in the tables.
+        self.days = days[:-1]
+        #: UTC start time of each settlement day.
+        self.day_starts = starts[:-1]
+        #: Number of settlement periods in each settlement day.
+        self.periods = ((starts[1:] - starts[:-1]) // HALF_HOUR).astype(np.int8)
+
+    def _day_index(self, dates):
+        idx = (_as_days(dates) - self.first_day).astype(np.int64)
+        if np.any(idx < 0) or np.any(idx >= len(self.days)):
+            raise ValueError("Dates must be between {} and {}".format(self.first_year, self.last_year))
+        return idx
+
+    def periods_in_day(self, dates):
+        """ Return the number of settlement periods in each date.
+
+        :param dates: Date or array of dates.
+        :rtype: :class:`numpy.ndarray`
+        """
+        return self.periods[self._day_index(dates)]
+
+    def to_utc(self, dates, periods):
+        """ Return the UTC start time of settlement periods.
+
+        :param dates: Settlement date or array of settlement dates.
+        :param periods: Settlement period or array of periods.
+        :returns: datetime64[m] array of start times.
+        :rtype: :class:`numpy.ndarray`
+        """
+        idx = self._day_index(dates)
+        periods = np.asarray(periods, dtype=np.int64)
+        if np.any(periods < 1) or np.any(periods > self.periods[idx]):
+            raise ValueError("Settlement period is outside the range for the day")
+        return self.day_starts[idx] + (periods - 1) * HALF_HOUR
+
+    def to_local(self, dates, periods):
+        """ Return the local (UK) start time of settlement periods.
+
+        :param dates: Settlement date or array of settlement dates.
+        :param periods: Settlement period or array of periods.
+        :returns: datetime64[m] array of local start times.
+        :rtype: :class:`numpy.ndarray`
+        """
+        return self.utc_to_local(self.to_utc(dates, periods))
+
+    def from_utc(self, times):
+        """ Return the settlement date and period containing each UTC time.
+
+        :param times: UTC time or array of times.
+        :returns: Tuple of datetime64[D] array of dates and int8 array of periods.
+        :rtype: tuple
+        """
+        times = _as_minutes(times)
+        idx = np.searchsorted(self.day_starts, times, side='right') - 1
+        if np.any(idx < 0) or np.any(times >= self.day_starts[-1] + self.periods[-1] * HALF_HOUR):
+            raise ValueError("Times must be between {} and {}".format(self.first_year, self.last_year))
+        periods = (times - self.day_starts[idx]) // HALF_HOUR + 1
+        return self.days[idx], periods.astype(np.int8)
+
+    def utc_to_local(self, times):
+        """ Convert UTC times to local (UK) time.
+
+        :param times: UTC time or array of times.
+        :rtype: :class:`numpy.ndarray`
+        """
+        times = _as_minutes(times)
+        year_idx = np.clip(times.astype('datetime64[Y]').astype(int) + 1970 - self.first_year,
+                           0, len(self.bst_start) - 1)
+        in_bst = (times >= self.bst_start[year_idx]) & (times < self.bst_end[year_idx])
+        return times + np.where(in_bst, ONE_HOUR, np.timedelta64(0, 'm'))
+
+
+_CALENDAR = None
+
+
+def get_calendar():
+    """ Return the :class:`SettlementCalendar` in use, creating it on first use.
+
+    :rtype: :class:`SettlementCalendar`
+    """
+    global _CALENDAR
+    if _CALENDAR is None:
+        _CALENDAR = SettlementCalendar()
+    return _CALENDAR
+
+
+def set_calendar(calendar):
+    """ Replace the :class:`SettlementCalendar`, e.g. to cover a different range of years.
+
+    :param calendar: The new :class:`SettlementCalendar` instance.
+    """
+    global _CALENDAR
+    _CALENDAR = calendar
+
+
+def as_date(val):
+    """ Return the date for a date, datetime or YYYY-MM-DD string, or None if it cannot
+    be converted.
+
+    :param val: The value to convert.
+    :rtype: :class:`datetime.date`
+    """
+    if isinstance(val, datetime):
+        return val.date()
+    if isinstance(val, date):
+        return val
+    try:
+        return datetime.strptime(str(val)[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def settlement_days(fromdate, todate):
+    """ Generator for every settlement date from fromdate to todate inclusive.
+
+    :param fromdate: First settlement date.
+    :param todate: Last settlement date.
+    """
+    for offset in range((todate - fromdate).days + 1):
+        yield fromdate + timedelta(days=offset)
+
+
+def periods_in_day(day):
+    """ Return the number of settlement periods (46, 48 or 50) in a settlement day.
+
+    :param day: The settlement date.
+    :rtype: int
+    """
+    return int(get_calendar().periods_in_day(day))
+
+
+def settlement_periods(day):
+    """ Return the range of settlement periods for a settlement day.
+
+    :param day: The settlement date.
+    :rtype: range
+    """
+    return range(1, periods_in_day(day) + 1)
+
+
+def period_start(day, period, local=False):
+    """ Return the start time of a settlement period.
+
+    :param day: The settlement date.
+    :param period: The settlement period.
+    :param local: If True return the local (UK) time rather than UTC.
+    :rtype: :class:`datetime.datetime`
+    """
+    if local:
+        return get_calendar().to_local(day, period).astype(datetime)
+    return get_calendar().to_utc(day, period).astype(datetime)
+
+
+def settlement_period(dtt):
+    """ Return the settlement date and period containing a UTC time.
+
+    :param dtt: The UTC time.
+    :rtype: tuple of :class:`datetime.date` and int
+    """
+    day, period = get_calendar().from_utc(dtt)
+    return day.astype(date), int(period)
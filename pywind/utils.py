@@ -31,13 +31,31 @@ Utility functions used by more than one module within pywind.
 
 # pylint: disable=E1101
 
-import sys
 import argparse
+import asyncio
+import csv
+import functools
+import io
 from datetime import datetime, date
 from lxml import etree
 import requests
+from requests.structures import CaseInsensitiveDict
 
+from .cache import get_response_cache
+from .cassette import get_cassette, request_key
 from .export import EXPORT_CHOICES
+from .ratelimit import get_rate_limiter
+from .retry import RequestError, get_circuit_breaker, get_retry_policy
+from .session import get_session_pool, get_async_session_pool, host_for_url
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+#: Size of the chunks read from streamed responses.
+STREAM_CHUNK_SIZE = 64 * 1024
 
 
 def get_or_post_a_url(url, post=False, **kwargs):
@@ -46,13 +64,23 @@ def get_or_post_a_url(url, post=False, **kwargs):
     The return code is checked and exceptions raised if there has been
     a redirect or the status code is not 200.
 
+    Requests are made using the pooled, keep-alive session for the host (see
+    :mod:`pywind.session`) unless a session is supplied. If a response cache has been
+    configured (see :mod:`pywind.cache`) GET requests are answered from it where possible.
+    When a :class:`pywind.cassette.Cassette` is in use responses are either recorded or
+    replayed from it.
+
     :param url: The URL to be used.
     :param post: True if the request should be a POST. Default is False which results in a
                  GET request.
     :param kwargs: Optional keyword arguments that are passed directly to the requests call.
+                   A :class:`requests.Session` can be given using the session keyword and
+                   the cache time to live (in seconds) overridden using cache_ttl. A cache_ttl
+                   of 0 bypasses the cache. Passing stream=True defers reading the body so it
+                   can be parsed as it arrives (cached and recorded responses are read in full).
     :returns: The requests object is returned if all checks pass.
     :rtype: :class:`requests.Response`
-    :raises: Raises :exc:`Exception` for various errors.
+    :raises: Raises :exc:`pywind.retry.RequestError` for various errors.
 
     .. :note:: Normally the returned URL is compared with the URL requested. In cases \
     where this may change using the :param:ignore_url_check=True parameter will avoid this \
@@ -70,21 +98,97 @@ def get_or_post_a_url(url, post=False, **kwargs):
 
     """
     ignore_req_check = kwargs.pop('ignore_url_check', False)
+    session = kwargs.pop('session', None) or get_session_pool().session_for(url)
+    cache_ttl = kwargs.pop('cache_ttl', None)
+
+    cassette = get_cassette()
+    if cassette is not None:
+        key = request_key(url, post, kwargs.get('params'), kwargs.get('data'))
+        if not cassette.recording:
+            return cassette.play(key)
+
+    cache = get_response_cache()
+    if cache is not None and not post and 'cookies' not in kwargs:
+        if cache_ttl is None:
+            cache_ttl = cache.ttl_for(url)
+    else:
+        cache_ttl = 0
 
-    try:
-        if post:
-            req = requests.post(url, **kwargs)
+    if cache_ttl:
+        req = _cached_get(cache, cache_ttl, session, url, **kwargs)
+    else:
+        req = _make_request(session, url, post, **kwargs)
+
+    if cassette is not None:
+        cassette.record(key, req)
+    return req
+
+
+def _cached_get(cache, ttl, session, url, **kwargs):
+    """ Helper for :func:`get_or_post_a_url` that answers a GET request from the cache,
+    revalidating or refreshing the stored response as needed.
+    """
+    key = cache.make_key(url, kwargs.get('params'))
+    entry = cache.get(key)
+    if entry is not None:
+        if entry.is_fresh:
+            return entry.as_response()
+        validators = entry.validators()
+        if validators:
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, **validators)
+
+    req = _make_request(session, url, False, allowed=(200, 304), **kwargs)
+    if req.status_code == 304:
+        cache.refresh(key, ttl)
+        return entry.as_response()
+    cache.store(key, req, ttl)
+    return req
+
+
+def _make_request(session, url, post=False, allowed=(200,), **kwargs):
+    """ Helper for :func:`get_or_post_a_url` that makes the actual request and checks
+    the status code returned. Every attempt waits for the host's rate limiter, failed
+    requests are retried as described by the current :class:`pywind.retry.RetryPolicy` and
+    the per host circuit breaker is updated.
+    """
+    policy = get_retry_policy()
+    breaker = get_circuit_breaker()
+    limiter = get_rate_limiter()
+    host = host_for_url(url)
+    attempts = policy.attempts(post)
+
+    for attempt in range(1, attempts + 1):
+        breaker.before_request(host)
+        limiter.acquire(url)
+        try:
+            if post:
+                req = session.post(url, **kwargs)
+            else:
+                req = session.get(url, **kwargs)
+        except requests.exceptions.SSLError as err:
+            breaker.record_failure(host)
+            raise RequestError("SSL Error\n  Error: {}\n    URL: {}".format(err, url), url)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            breaker.record_failure(host)
+            if attempt == attempts:
+                raise RequestError("Unable to connect to the server.\nURL: {}".format(url), url)
+            policy.sleep(policy.delay(attempt))
+            continue
+
+        if req.status_code in allowed:
+            breaker.record_success(host)
+            break
+        if req.status_code not in policy.statuses:
+            breaker.record_success(host)
         else:
-            req = requests.get(url, **kwargs)
-    except requests.exceptions.SSLError as err:
-        raise Exception("SSL Error\n  Error: {}\n    URL: {}".
-                        format(err.message[0], url))
-    except requests.exceptions.ConnectionError:
-        raise Exception("Unable to connect to the server.\nURL: {}".
-                        format(url))
-    if req.status_code != 200:
-        raise Exception("Request was completed, but status code is not 200.\n"+
-                        "URL: {}\nStatus Code: {}".format(url, req.status_code))
+            breaker.record_failure(host)
+            if attempt < attempts:
+                req.close()
+                policy.sleep(policy.delay(attempt, req))
+                continue
+        raise RequestError("Request was completed, but status code is not 200.\n" +
+                           "URL: {}\nStatus Code: {}".format(url, req.status_code),
+                           url, req.status_code)
 
 #    if ignore_req_check is False and req.url != url:
 #        if 'params' not in kwargs or not req.url.startswith(url):
@@ -93,6 +197,113 @@ def get_or_post_a_url(url, post=False, **kwargs):
     return req
 
 
+async def aget_a_url(url, **kwargs):
+    """
+    asyncio counterpart of :func:`get_or_post_a_url` for GET requests. The same cache,
+    cassette, rate limiter, retry policy and circuit breaker are used, but the request is
+    made using aiohttp and waiting never blocks the event loop. If aiohttp is not installed
+    the request is made by :func:`get_or_post_a_url` in the default executor.
+
+    :param url: The URL to be used.
+    :param kwargs: The params, headers, cache_ttl and session (an aiohttp ClientSession)
+                   keywords are supported.
+    :returns: The response, with the content already read.
+    :rtype: :class:`requests.Response`
+    :raises: Raises :exc:`pywind.retry.RequestError` for various errors.
+    """
+    kwargs.pop('stream', None)
+    if aiohttp is None:
+        loop = asyncio.get_running_loop()
+        kwargs.pop('session', None)
+        return await loop.run_in_executor(None, functools.partial(get_or_post_a_url, url, **kwargs))
+
+    session = kwargs.pop('session', None) or get_async_session_pool().session_for(url)
+    cache_ttl = kwargs.pop('cache_ttl', None)
+    # aiohttp only accepts str, int or float parameter values.
+    if kwargs.get('params'):
+        kwargs['params'] = {key: val if isinstance(val, (int, float)) else str(val)
+                            for key, val in kwargs['params'].items()}
+
+    cassette = get_cassette()
+    if cassette is not None:
+        key = request_key(url, False, kwargs.get('params'))
+        if not cassette.recording:
+            return cassette.play(key)
+
+    cache = get_response_cache()
+    if cache is not None and cache_ttl is None:
+        cache_ttl = cache.ttl_for(url)
+    entry = None
+    if cache is not None and cache_ttl:
+        cache_key = cache.make_key(url, kwargs.get('params'))
+        entry = cache.get(cache_key)
+        if entry is not None:
+            if entry.is_fresh:
+                return entry.as_response()
+            validators = entry.validators()
+            if validators:
+                kwargs['headers'] = dict(kwargs.get('headers') or {}, **validators)
+
+    req = await _amake_request(session, url, allowed=(200, 304) if entry else (200,), **kwargs)
+    if cache is not None and cache_ttl:
+        if req.status_code == 304:
+            cache.refresh(cache_key, cache_ttl)
+            req = entry.as_response()
+        else:
+            cache.store(cache_key, req, cache_ttl)
+
+    if cassette is not None:
+        cassette.record(key, req)
+    return req
+
+
+async def _amake_request(session, url, allowed=(200,), **kwargs):
+    """ Helper for :func:`aget_a_url` that makes the request, following the same retry and
+    circuit breaker rules as :func:`_make_request`.
+    """
+    policy = get_retry_policy()
+    breaker = get_circuit_breaker()
+    limiter = get_rate_limiter()
+    host = host_for_url(url)
+    attempts = policy.attempts()
+
+    for attempt in range(1, attempts + 1):
+        breaker.before_request(host)
+        await limiter.acquire_async(url)
+        try:
+            async with session.get(url, **kwargs) as aresp:
+                req = requests.Response()
+                req.status_code = aresp.status
+                req.url = str(aresp.url)
+                req.headers = CaseInsensitiveDict(aresp.headers)
+                req.encoding = aresp.charset
+                req._content = await aresp.read()
+                req._content_consumed = True
+        except aiohttp.ClientSSLError as err:
+            breaker.record_failure(host)
+            raise RequestError("SSL Error\n  Error: {}\n    URL: {}".format(err, url), url)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            breaker.record_failure(host)
+            if attempt == attempts:
+                raise RequestError("Unable to connect to the server.\nURL: {}".format(url), url)
+            await asyncio.sleep(policy.delay(attempt))
+            continue
+
+        if req.status_code in allowed:
+            breaker.record_success(host)
+            return req
+        if req.status_code not in policy.statuses:
+            breaker.record_success(host)
+        else:
+            breaker.record_failure(host)
+            if attempt < attempts:
+                await asyncio.sleep(policy.delay(attempt, req))
+                continue
+        raise RequestError("Request was completed, but status code is not 200.\n" +
+                           "URL: {}\nStatus Code: {}".format(url, req.status_code),
+                           url, req.status_code)
+
+
 def valid_date(dtstr):
     """ Parse a string into a date using the YYYY-MM-DD format. Used by the
     :func:`commandline_parser` function.
@@ -151,7 +362,10 @@ def commandline_parser(help_text, epilog=None):
     parser.add_argument('--month', type=int, help='Month (used for Elexon)')
     parser.add_argument('--period', type=int, help='Period (format is YYYYMM)')
     parser.add_argument('--all-periods', action='store_true', help='Get data for all available periods')
-    parser.add_argument('--settlement-period', help='Settlement period (1-50)')
+    parser.add_argument('--settlement-period',
+                        help='Settlement period (1-48, or 1-46/1-50 on clock change days)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Number of concurrent requests for commands fetching many periods')
     parser.add_argument('--scheme', choices=['REGO', 'RO'], help='Ofgem Scheme')
     parser.add_argument('--export', choices=EXPORT_CHOICES, help='Data Export Format')
     parser.add_argument('--output', help='Export filename')
@@ -161,6 +375,13 @@ def commandline_parser(help_text, epilog=None):
     parser.add_argument('--original', help='Filename for original format file (use with --save)')
     parser.add_argument('--station', help='Station name to filter for (Ofgem only)')
     parser.add_argument('--apikey', default='elexon.api.key', help='API Key (Elexon only)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Do not use the local cache of downloaded data')
+    parser.add_argument('--clear-cache', action='store_true',
+                        help='Remove all entries from the local cache of downloaded data')
+    parser.add_argument('--rate-limits', help='Configuration file with per host rate limits')
+    parser.add_argument('--record', help='Record all requests and responses to this archive')
+    parser.add_argument('--replay', help='Replay responses from this archive, without network access')
     parser.add_argument('-v', '--version', action='store_true', help='Show version number')
     return parser
 
@@ -178,6 +399,7 @@ def args_get_datetime(args):
 
 def parse_response_as_xml(request):
     """Given a the response object from requests, attempt to parse it's contents as XML.
+    If the request was made with stream=True the body is parsed as it is downloaded.
 
     :param request: The requests object
     :returns: The root XML node or None if there is a parser error
@@ -188,9 +410,80 @@ def parse_response_as_xml(request):
     """
     try:
         parser = etree.XMLParser(recover=True)
-        return etree.XML(request.content, parser).getroottree()
+        if request._content_consumed:
+            root = etree.XML(request.content, parser)
+        else:
+            root = feed_response_to_parser(request, parser)
     except etree.XMLSyntaxError:
         return None
+    if root is None:
+        return None
+    return root.getroottree()
+
+
+def parse_response_as_csv(request):
+    """ Parse the contents of a response as CSV.
+
+    :param request: The requests object
+    :returns: List of rows, each a list of strings
+    :rtype: list
+    """
+    return list(csv.reader(io.StringIO(request.text)))
+
+
+def feed_response_to_parser(response, parser):
+    """ Feed the body of a response into an lxml feed parser as it is downloaded, so
+    parsing overlaps with the download and the complete body never needs to be held
+    as a single bytes object.
+
+    :param response: The :class:`requests.Response`, ideally requested with stream=True.
+    :param parser: An :class:`lxml.etree.XMLParser` (or HTMLParser) instance.
+    :returns: The root element returned by the parser.
+    :raises: :exc:`lxml.etree.XMLSyntaxError` if the data cannot be parsed.
+    """
+    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+        parser.feed(chunk)
+    return parser.close()
+
+
+def iterparse_response(response, tag, chunks=None, **kwargs):
+    """ Generator of the elements with the tag(s) supplied from the XML body of a response,
+    parsed as it is downloaded. Each element is complete when it is returned. When the next
+    element is requested it is cleared and removed from the tree, along with any siblings
+    before it, so memory use stays flat however large the response is.
+
+    .. code::
+
+      >>> for detail in iterparse_response(response, '{*}Detail', huge_tree=True):
+      ...     print(detail.get('textbox4'))
+
+    :param response: The :class:`requests.Response`, ideally requested with stream=True.
+    :param tag: Tag, or sequence of tags, of the elements to return. Use '{*}tag' to match
+                the tag in any namespace.
+    :param chunks: Optional list that each chunk of the body is appended to.
+    :param kwargs: Additional arguments for the :class:`lxml.etree.XMLPullParser`.
+    :returns: Generator of elements.
+    :raises: :exc:`lxml.etree.XMLSyntaxError` if the data cannot be parsed.
+    """
+    parser = etree.XMLPullParser(events=('end',), tag=tag, **kwargs)
+
+    def _elements():
+        for _, elm in parser.read_events():
+            yield elm
+            elm.clear(keep_tail=True)
+            while elm.getprevious() is not None:
+                del elm.getparent()[0]
+
+    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+        if chunks is not None:
+            chunks.append(chunk)
+        parser.feed(chunk)
+        yield from _elements()
+    root = parser.close()
+    yield from _elements()
+    if root is None:
+        # A parser created with recover=True doesn't raise an error if nothing was found.
+        raise etree.XMLSyntaxError("No XML found in the response", None, 1, 1)
 
 
 def multi_level_get(the_dict, key, default=None):
@@ -224,18 +517,19 @@ def xml_attr_or_element(xml_node, name):
     """
     attr_val = xml_node.get(name, None)
     if attr_val is not None:
-        return attr_val.encode('utf-8').strip()
-    for child in xml_node.getchildren():
-        if child.tag == name:
-            return child.text.encode('utf-8').strip()
+        return attr_val.strip()
+    for child in xml_node.iterchildren(name):
+        return (child.text or '').strip()
     return None
 
 
-def map_xml_to_dict(xml_node, mapping=None):
+class XmlMapper(object):
     """
-    Given an XML node, create a dict using the mapping of attributes/elements supplied.
+    Compiled form of a mapping used by :func:`map_xml_to_dict`. The mapping is parsed once,
+    with the conversion function for each field looked up in advance, and each node has
+    its children walked only once, so extraction is O(fields + children) per node.
 
-    The format of each mapping item is a tuple of up to 3 components,
+    The format of each mapping item is a tuple of up to 4 components,
         - xml attribute
         - key for dict (optional)
         - type of data expected (optional)
@@ -244,21 +538,13 @@ def map_xml_to_dict(xml_node, mapping=None):
     If the key name is not supplied, the lower cased xml attribute will be used.
     If the type is not given it will be assumed to be a string.
 
-    :param xml_node: The XML node to parse
-    :param mapping: Iterable of xml element
-    :returns: Dict of successfully extracted data
-    :rtype: dict
+    :param mapping: Iterable of mapping items, or None to map every child element.
     """
-    rv_dict = {}
-
-    if mapping is None:
-        for child in xml_node.iterchildren():
-            key = child.tag.lower()
-            val = _convert_type(child.text.strip().encode('utf-8'), 'str')
-            if len(val) == 0:
-                val = None
-            rv_dict[key] = val
-    else:
+    def __init__(self, mapping=None):
+        self.fields = None
+        if mapping is None:
+            return
+        self.fields = []
         for mapp in mapping:
             if isinstance(mapp, (list, set, tuple)):
                 xml_name = mapp[0]
@@ -270,20 +556,150 @@ def map_xml_to_dict(xml_node, mapping=None):
                 dict_key = None
                 data_typ = None
                 dflt = None
+            self.fields.append((xml_name, dict_key or xml_name.lower(),
+                                _CONVERTERS.get(data_typ or 'str', str), dflt))
+
+    def __call__(self, xml_node):
+        """ Extract the mapped values from xml_node.
+
+        :param xml_node: The XML node to parse
+        :returns: Dict of successfully extracted data
+        :rtype: dict
+        """
+        rv_dict = {}
+        if self.fields is None:
+            for child in xml_node.iterchildren(etree.Element):
+                val = (child.text or '').strip()
+                rv_dict[child.tag.lower()] = _to_str(val) if len(val) > 0 else None
+            return rv_dict
+
+        attrib = xml_node.attrib
+        children = None
+        for xml_name, dict_key, converter, dflt in self.fields:
+            val = attrib.get(xml_name)
+            if val is None:
+                if children is None:
+                    children = {}
+                    for child in xml_node.iterchildren(etree.Element):
+                        children.setdefault(child.tag, child.text or '')
+                val = children.get(xml_name)
+                if val is None:
+                    rv_dict[dict_key] = None
+                    continue
+            val = val.strip()
+            rv_dict[dict_key] = converter(val) if len(val) > 0 else dflt
+        return rv_dict
+
+    def map_values(self, values):
+        """ Extract the mapped values from a dict of strings keyed by the xml names used
+        in the mapping, e.g. the columns of a CSV row. The values are converted exactly
+        as they would be if they had been found in an XML node.
+
+        :param values: Dict of xml name to string value
+        :returns: Dict of successfully extracted data
+        :rtype: dict
+        """
+        rv_dict = {}
+        for xml_name, dict_key, converter, dflt in self.fields:
+            val = values.get(xml_name)
+            if val is None:
+                rv_dict[dict_key] = None
+                continue
+            val = val.strip()
+            rv_dict[dict_key] = converter(val) if len(val) > 0 else dflt
+        return rv_dict
+
+
+def xml_mapper_for(cls):
+    """ Return the :class:`XmlMapper` for the XML_MAPPING of a class, compiling it the first
+    time it is requested. Each class (including subclasses) gets its own mapper.
+
+    :param cls: A class with an XML_MAPPING attribute.
+    :rtype: :class:`XmlMapper`
+    """
+    mapper = cls.__dict__.get('_xml_mapper')
+    if mapper is None:
+        mapper = XmlMapper(cls.XML_MAPPING)
+        cls._xml_mapper = mapper
+    return mapper
 
-            val = xml_attr_or_element(xml_node, xml_name)
-            dict_key = dict_key or xml_name.lower()
-            if val is not None:
-                if len(val) == 0:
-                    val = dflt
-                else:
-                    val = _convert_type(val, data_typ or 'str')
-            rv_dict[dict_key] = val
-    return rv_dict
+
+def map_xml_to_dict(xml_node, mapping=None):
+    """
+    Given an XML node, create a dict using the mapping of attributes/elements supplied.
+    See :class:`XmlMapper` for the format of the mapping. When the same mapping is used
+    repeatedly, pass an :class:`XmlMapper` to avoid compiling it for every node.
+
+    :param xml_node: The XML node to parse
+    :param mapping: Iterable of xml element or an :class:`XmlMapper`
+    :returns: Dict of successfully extracted data
+    :rtype: dict
+    """
+    if not isinstance(mapping, XmlMapper):
+        mapping = XmlMapper(mapping)
+    return mapping(xml_node)
+
+
+def _to_int(val):
+    if isinstance(val, str):
+        val = val.replace(',', '')
+    return int(val)
+
+
+def _to_float(val):
+    if isinstance(val, str):
+        val = val.replace(',', '')
+    try:
+        return float(val)
+    except ValueError:
+        return 0.0
+
+
+def _to_date(val):
+    # Incredibly Ofgem has several places where there are newlines in dates!
+    if '\n' in val:
+        val = val.split("\n")[0]
+    for fmt in ['%d/%m/%Y', '%Y-%m-%d', '%Y-%m-%dT%H:%M:00']:
+        try:
+            return datetime.strptime(val, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError("Unable to parse date {}".format(val))
+
+
+def _to_bool(val):
+    return str(val).lower() in ['1', 'yes', 'y', 'true']
+
+
+def _to_address(val):
+    return val.replace('\r', ', ')
+
+
+def _to_period(val):
+    # Convert 201601 to 01-01-2016
+    yyr, mon = divmod(int(val), 100)
+    return date(yyr, mon, 1)
+
+
+def _to_str(val):
+    if val[:1] == "'" and val[-1:] == "'":
+        val = val[1:-1]
+    return str(val)
+
+
+_CONVERTERS = {
+    'int': _to_int,
+    'float': _to_float,
+    'date': _to_date,
+    'bool': _to_bool,
+    'address': _to_address,
+    'period': _to_period,
+    'str': _to_str,
+}
 
 
 def _convert_type(val, typ):
-    """ Helper function for :func:`map_xml_to_dict` to convert strings to correct type.
+    """ Helper function to convert strings to correct type.
     If the conversion cannot be made will raise a ValueError exception.
 
     :param val: The string value to convert
@@ -291,50 +707,9 @@ def _convert_type(val, typ):
     :return: Converted value
     :raises: ValueError
     """
-    if sys.version_info >= (3, 0) and isinstance(val, bytes):
+    if isinstance(val, bytes):
         val = val.decode()
-    if typ in ['int', 'float'] and isinstance(val, str):
-        val = val.replace(',', '')
-    if typ == 'int':
-        return int(val)
-    elif typ == 'float':
-        try:
-            return float(val)
-        except ValueError:
-            return 0.0
-    elif typ == 'date':
-        # Incredibly Ofgem has several places where there are newlines in dates!
-        if '\n' in val:
-            val = val.split("\n")[0]
-        for fmt in ['%d/%m/%Y', '%Y-%m-%d', '%Y-%m-%dT%H:%M:00']:
-            try:
-                if sys.version_info >= (3, 0):
-                    return datetime.strptime(val, fmt).date()
-                else:
-                    return datetime.strptime(val.decode(), fmt).date()
-            except ValueError:
-                pass
-        raise ValueError("Unable to parse date {}".format(val))
-    elif typ == 'bool':
-        if str(val).lower() in ['1', 'yes', 'y', 'true']:
-            return True
-        return False
-    elif typ == 'address':
-#        print(val)
-#        print(type(val))
-#        if sys.version_info < (3, 0):
-#            return val.replace('\r', ', ')
-        return val.replace('\r', ', ')
-    elif typ == 'period':
-        # Convert 201601 to 01-01-2016
-        yyr = val / 100
-        mon = val - yyr * 100
-        return date(yyr, mon, 1)
-
-    elif typ == 'str':
-        if val[0] == "'" and val[-1] == "'":
-            val = val[1:-1]
-    return str(val)
+    return _CONVERTERS.get(typ, str)(val)
 
 
 class StdoutFormatter(object):
@@ -30,8 +30,8 @@
  This script demonstrates how to use the bmreports.UnitData class to
  get information about Constraint Payments.
 
- It does not attempt to cater for long or short days and simply assumes
- that there will be 48 settlement periods.
+ Long and short days (when the clocks change) have 50 or 46 settlement
+ periods rather than 48.
 """
 
 import argparse
@@ -47,27 +47,29 @@ def mkdate(datestr):
 def main():
     parser = argparse.ArgumentParser(description='Get Constraint Payment information for yesterday')
     parser.add_argument('--date', action='store', type=mkdate, help='Date to get results for')
-    parser.add_argument('--period', action='store', help='Period to get data for')
+    parser.add_argument('--period', action='store', type=int, help='Period to get data for')
     args = parser.parse_args()
 
-    data = {}
-    ud = UnitData({'date': args.date or date.today() - timedelta(days=2)})
-    pr = [args.period] or range(1,49)
-    for period in pr:
-        ud.period = period
-        if ud.get_data():
-            data[period] = ud.data
-        else:
-            print ("Unable to get data for %s, period %d" % (ud.date.strftime("%d %b %Y"), period))
+    ud = UnitData(date=args.date or date.today() - timedelta(days=2))
+    if args.period:
+        ud.period = args.period
+        ud.get_data()
+        data = {(ud.date, ud.period): ud.data}
+    else:
+        # Every settlement period of the day is requested at once.
+        ud.get_periods()
+        data = ud.periods
+        for day, period in sorted(ud.failed):
+            print ("Unable to get data for %s, period %d" % (day.strftime("%d %b %Y"), period))
 
-    for period, units in sorted(data.iteritems()):
+    for (day, period), units in sorted(data.items()):
         print ("Period: ", period)
-        for unit in sorted(units, key=lambda x: x['ngc']):
-            print ("  ", unit['ngc'], unit['lead'])
-            if unit['bid'].has_key('volume'):
-                print ("      BID:   ", unit['bid']['volume']+'MWh  ', unit['bid']['cashflow'])
-            if unit['offer'].has_key('volume'):
-                print ("      OFFER: ", unit['offer']['volume']+'MWh  ', unit['offer']['cashflow'])
+        for unit in sorted(units, key=lambda x: x.name):
+            print ("  ", unit.name, unit.lead)
+            if unit.bid_volume != 0:
+                print ("      BID:   ", "%.4fMWh  " % unit.bid_volume, unit.bid_cashflow)
+            if unit.offer_volume != 0:
+                print ("      OFFER: ", "%.4fMWh  " % unit.offer_volume, unit.offer_cashflow)
 
 
 if __name__ == '__main__':
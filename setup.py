@@ -25,13 +25,21 @@ setup(
     url='https://github.com/zathras777/pywind',
     packages=find_packages(exclude=['tests', 'sample_scripts']),
     install_requires=requires,
+    extras_require={
+        'async': ['aiohttp'],
+        'pandas': ['pandas'],
+    },
     classifiers=[
         'Development Status :: 5 - Production/Stable',
         'Intended Audience :: Developers',
         'Topic :: Software Development :: Libraries :: Python Modules',
-        'Programming Language :: Python :: 2.7',
-        'Programming Language :: Python :: 3.4',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
     ],
+    python_requires='>=3.7',
     entry_points={
         'console_scripts': ['pywind=pywind.command_line:main']
     },
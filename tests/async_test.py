@@ -0,0 +1,102 @@
+""" Tests for the aiohttp requests made by pywind.utils.aget_a_url """
+import asyncio
+import shutil
+import tempfile
+import unittest
+
+from pywind.cache import ResponseCache, set_response_cache
+from pywind.ratelimit import RateLimiter, set_rate_limiter
+from pywind.retry import RetryPolicy, CircuitBreaker, CircuitOpenError, RequestError, \
+    set_retry_policy, set_circuit_breaker
+from pywind.session import AsyncSessionPool, set_async_session_pool
+from pywind.utils import aget_a_url
+from tests.elexon_test import AsyncFilePool, aiohttp
+
+
+class RecordingLimiter(RateLimiter):
+    """ Rate limiter that records the URLs it is asked to wait for. """
+    def __init__(self):
+        super(RecordingLimiter, self).__init__({})
+        self.urls = []
+
+    async def acquire_async(self, url):
+        self.urls.append(url)
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class AsyncRequestTest(unittest.TestCase):
+    """ Retries, circuit breaker, rate limiting and caching for aiohttp requests. """
+    URL = 'https://api.bmreports.com/BMRS/FUELINST/v1'
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        self.limiter = RecordingLimiter()
+        set_retry_policy(RetryPolicy(max_attempts=3, backoff_factor=0, jitter=0))
+        set_circuit_breaker(self.breaker)
+        set_rate_limiter(self.limiter)
+
+    def tearDown(self):
+        set_retry_policy(RetryPolicy())
+        set_circuit_breaker(CircuitBreaker())
+        set_rate_limiter(RateLimiter())
+        set_async_session_pool(AsyncSessionPool())
+
+    def get(self, pool, **kwargs):
+        set_async_session_pool(pool)
+
+        async def _get():
+            async with pool:
+                return await aget_a_url(self.URL, **kwargs)
+        return asyncio.run(_get())
+
+    def test_retry(self):
+        pool = AsyncFilePool('elexon_fuelinst.xml', statuses=[None, 503])
+        resp = self.get(pool, params={'FromDateTime': '2016-03-27 00:00:00', 'Period': 1})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.content.startswith(b'<?xml'))
+        self.assertEqual(len(pool.file_session.calls), 3)
+        self.assertEqual(pool.file_session.calls[0], {'FromDateTime': '2016-03-27 00:00:00', 'Period': 1})
+        self.assertEqual(self.limiter.urls, [self.URL] * 3)
+        self.assertTrue(pool.file_session.closed)
+
+        pool = AsyncFilePool('elexon_fuelinst.xml', statuses=[404])
+        with self.assertRaises(RequestError) as ctx:
+            self.get(pool)
+        self.assertEqual(ctx.exception.status_code, 404)
+        self.assertEqual(len(pool.file_session.calls), 1)
+
+    def test_circuit_breaker(self):
+        pool = AsyncFilePool('elexon_fuelinst.xml', statuses=[500, 500, 500])
+        with self.assertRaises(RequestError):
+            self.get(pool)
+        self.assertTrue(self.breaker.is_open('api.bmreports.com'))
+        with self.assertRaises(CircuitOpenError):
+            self.get(pool)
+        self.assertEqual(len(pool.file_session.calls), 3)
+
+    def test_cache(self):
+        directory = tempfile.mkdtemp()
+        cache = ResponseCache(directory)
+        set_response_cache(cache)
+        try:
+            pool = AsyncFilePool('elexon_fuelinst.xml')
+            first = self.get(pool, params={'APIKey': 'abc'})
+            second = self.get(pool, params={'APIKey': 'xyz'})
+            self.assertEqual(first.content, second.content)
+            self.assertEqual(len(pool.file_session.calls), 1)
+        finally:
+            set_response_cache(None)
+            cache.close()
+            shutil.rmtree(directory)
+
+    def test_session_pool(self):
+        pool = AsyncSessionPool(limit_per_host=2)
+
+        async def _sessions():
+            async with pool:
+                sess1 = pool.session_for(self.URL)
+                self.assertIs(sess1, pool.session_for('https://api.bmreports.com/BMRS/B1610/v1'))
+                self.assertEqual(len(pool), 1)
+            return sess1
+        self.assertTrue(asyncio.run(_sessions()).closed)
+        self.assertEqual(len(pool), 0)
@@ -0,0 +1,104 @@
+""" Tests for pywind.bmreports using saved responses. """
+import unittest
+from datetime import date
+
+from pywind.bmreports.unit import UnitData, UnitList, PowerPackUnits, _mkdates
+from pywind.ratelimit import RateLimiter, set_rate_limiter
+from pywind.session import SessionPool, set_session_pool
+from tests.elexon_test import FilePool
+
+
+class UnitDataTest(unittest.TestCase):
+    """ Balancing Mechanism unit data. """
+    def setUp(self):
+        self.pool = FilePool('bm_unitdata.xml')
+        set_session_pool(self.pool)
+        set_rate_limiter(RateLimiter({}))
+
+    def tearDown(self):
+        set_session_pool(SessionPool())
+        set_rate_limiter(RateLimiter())
+
+    def test_period(self):
+        udd = UnitData(date=date(2016, 8, 26))
+        self.assertTrue(udd.get_data())
+        self.assertEqual(len(udd.data), 12)
+        bmu = udd.data[1]
+        self.assertEqual(bmu.id, 'T_CNQPS-2')
+        self.assertEqual(bmu.bid_volume, -19.7958)
+        self.assertEqual(bmu.bid_cashflow, -517.3)
+        self.assertEqual(self.pool.file_session.calls[0]['param6'], 1)
+        self.assertEqual(len(list(udd.rows())), 12)
+
+    def test_values(self):
+        udd = UnitData(date=date(2016, 8, 26))
+        self.assertTrue(udd.get_data())
+        bmu = udd.data[6]
+        self.assertEqual(bmu.id, 'T_LAGA-1')
+        self.assertEqual(bmu.bid_volume, -57.2245)
+        self.assertEqual(bmu.bid_volume_tagged, -56.0896)
+        self.assertEqual(bmu.bid_volume_repriced, 0.0)
+        self.assertEqual(bmu.offer_volume_originalpriced, 83.4063)
+        self.assertEqual(bmu.breakdown['bid_volume'], (('M2', -56.0896), ('M1', -1.1349)))
+        self.assertNotIn('bid_volume_repriced', bmu.breakdown)
+        self.assertEqual(len(bmu.breakdown['offer_cashflow']), 4)
+        self.assertAlmostEqual(bmu.rate('offer'), 4952.56 / 111.3024)
+        self.assertEqual(udd.data[0].rate('bid'), 0.0)
+        with self.assertRaises(AttributeError):
+            bmu.volume = {}
+        with self.assertRaises(AttributeError):
+            bmu.bid_rate = 1.0
+        # The nested dicts are still available.
+        self.assertEqual(bmu.volume['bid_values']['original']['m2'], {'value': -56.0896})
+        self.assertEqual(bmu.volume['bid_values']['tagged']['total'], {'value': -56.0896})
+        self.assertEqual(bmu.volume['bid_values']['repriced'], {})
+        self.assertEqual(bmu.cashflow['offer_values']['total']['value'], 4952.56)
+        self.assertEqual(sorted(bmu.cashflow['offer_values']), ['m1', 'm2', 'p1', 'p2', 'total'])
+        row = list(udd.rows())[6]['BalancingDetail']
+        self.assertEqual(row['@ngc'], 'T_LAGA-1')
+        self.assertEqual(row['@offer_cashflow'], 4952.56)
+        self.assertEqual(row['@bid_volume_tagged'], -56.0896)
+
+    def test_periods(self):
+        udd = UnitData(date=date(2016, 3, 27))
+        self.assertTrue(udd.get_periods(workers=4))
+        self.assertEqual(len(self.pool.file_session.calls), 46)
+        self.assertEqual(sorted(call['param6'] for call in self.pool.file_session.calls), list(range(1, 47)))
+        self.assertEqual(udd.failed, {})
+        self.assertEqual(len(udd.periods), 46)
+        self.assertEqual(len(udd.units), 12)
+        self.assertEqual(sorted(udd.units['T_LAGA-1'])[-1], (date(2016, 3, 27), 46))
+        self.assertEqual(udd.units['T_LAGA-1'][(date(2016, 3, 27), 5)].offer_cashflow, 4952.56)
+        self.assertEqual(len(list(udd.rows())), 46 * 12)
+
+        self.assertTrue(udd.get_periods(date(2016, 1, 1), date(2016, 1, 2)))
+        self.assertEqual(len(udd.periods), 96)
+
+
+class UnitListTest(unittest.TestCase):
+    """ Unit lists from BM Reports spreadsheets. """
+    def tearDown(self):
+        set_session_pool(SessionPool())
+
+    def test_unit_list(self):
+        set_session_pool(FilePool('bm_unitlist.xlsx'))
+        units = UnitList()
+        self.assertEqual(len(units), 352)
+        self.assertEqual(units.units[0], {'ngc_id': 'ABTH7', 'sett_id': 'T_ABTH7', 'fuel_type': 'COAL',
+                                          'eff_from': date(2001, 3, 27), 'eff_to': None})
+        self.assertEqual(len(units.by_fuel_type('coal')), len([unit for unit in units.units
+                                                               if unit['fuel_type'] == 'COAL']))
+
+    def test_power_pack_units(self):
+        set_session_pool(FilePool('power_pack_units.xlsx'))
+        units = PowerPackUnits()
+        self.assertEqual(len(units), 113)
+        self.assertEqual(units.units[0]['ngc_id'], 'ACHYW-1')
+        self.assertIs(units.units[0]['bmunit'], True)
+        self.assertEqual(units.units[0]['cap'], 50.0)
+        self.assertIsNone(units.units[0]['date_added'])
+
+    def test_dates(self):
+        self.assertEqual(_mkdates([36977.208333333336, '', 42370.99999999, 'text'], 0),
+                         [date(2001, 3, 27), None, date(2016, 1, 2), None])
+        self.assertEqual(_mkdates([0.0], 1), [date(1904, 1, 1)])
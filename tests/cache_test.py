@@ -0,0 +1,86 @@
+""" Tests for pywind.cache """
+import shutil
+import tempfile
+import unittest
+
+import requests
+
+from pywind.cache import ResponseCache, set_response_cache, FOREVER
+from pywind.utils import get_or_post_a_url
+
+
+class FakeSession(object):
+    """ Minimal session that records requests and returns canned responses. """
+    def __init__(self, status=200, content=b'<response/>', headers=None):
+        self.status = status
+        self.content = content
+        self.headers = headers or {}
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        resp = requests.Response()
+        resp.status_code = self.status
+        resp.url = url
+        resp.headers.update(self.headers)
+        resp._content = self.content
+        return resp
+
+
+class ResponseCacheTest(unittest.TestCase):
+    """ Response cache tests. """
+    URL = 'https://api.bmreports.com/BMRS/DERSYSDATA/v1'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ResponseCache(self.directory)
+        set_response_cache(self.cache)
+
+    def tearDown(self):
+        set_response_cache(None)
+        self.cache.close()
+        shutil.rmtree(self.directory)
+
+    def test_key(self):
+        key1 = ResponseCache.make_key(self.URL, {'APIKey': 'abc', 'SettlementDate': '2016-01-01'})
+        key2 = ResponseCache.make_key(self.URL, {'SettlementDate': '2016-01-01', 'APIKey': 'xyz'})
+        key3 = ResponseCache.make_key(self.URL, {'SettlementDate': '2016-01-02'})
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, key3)
+
+    def test_cached_get(self):
+        sess = FakeSession()
+        params = {'APIKey': 'abc', 'SettlementDate': '2016-01-01'}
+        resp = get_or_post_a_url(self.URL, params=params, session=sess, cache_ttl=FOREVER)
+        self.assertEqual(resp.content, b'<response/>')
+        resp = get_or_post_a_url(self.URL, params=params, session=sess, cache_ttl=FOREVER)
+        self.assertTrue(resp.from_cache)
+        self.assertEqual(resp.content, b'<response/>')
+        self.assertEqual(len(sess.calls), 1)
+
+        get_or_post_a_url(self.URL, params=params, session=sess, cache_ttl=0)
+        self.assertEqual(len(sess.calls), 2)
+
+        # Hosts without a configured ttl are not cached.
+        get_or_post_a_url('https://renewablesandchp.ofgem.gov.uk/', session=sess)
+        get_or_post_a_url('https://renewablesandchp.ofgem.gov.uk/', session=sess)
+        self.assertEqual(len(sess.calls), 4)
+
+    def test_revalidation(self):
+        sess = FakeSession(headers={'ETag': '"1234"'})
+        get_or_post_a_url(self.URL, session=sess, cache_ttl=-1)
+        sess.status = 304
+        sess.content = b''
+        resp = get_or_post_a_url(self.URL, session=sess, cache_ttl=-1)
+        self.assertEqual(sess.calls[1][1]['headers'], {'If-None-Match': '"1234"'})
+        self.assertEqual(resp.content, b'<response/>')
+
+    def test_eviction(self):
+        self.cache.max_size = 25
+        sess = FakeSession(content=b'0123456789')
+        for n in range(4):
+            get_or_post_a_url(self.URL, params={'n': n}, session=sess, cache_ttl=FOREVER)
+        self.assertEqual(len(self.cache), 2)
+        self.assertLessEqual(self.cache.size, 25)
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
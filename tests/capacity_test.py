@@ -0,0 +1,41 @@
+""" Tests for pywind.elexon.capacity """
+import unittest
+from datetime import date
+
+from pywind.elexon.capacity import unit_capacities, calculate_capacity_factors
+
+
+class CapacityFactorTest(unittest.TestCase):
+    """ Capacity factor calculations. """
+    def test_capacities(self):
+        capacities = unit_capacities([
+            {'ngcbmunitid': 'DRAXX-1', 'nominal': 600.0, 'powersystemresourcetype': 'Fossil Hard coal',
+             'implementationdate': '2015-01-01'},
+            {'ngcbmunitid': 'DRAXX-1', 'nominal': 645.0, 'powersystemresourcetype': 'Biomass',
+             'implementationdate': '2016-01-01'},
+            {'ngcbmunitid': None, 'bmunitid': 'T_WBUPS-4', 'nominal': 0.0},
+        ])
+        self.assertEqual(capacities, {'DRAXX-1': (645.0, 'Biomass')})
+
+    def test_factors(self):
+        capacities = {2016: {'DRAXX-1': (100.0, 'Biomass'), 'WLNYW-1': (50.0, 'Wind Offshore'),
+                             'BURBO-1': (50.0, 'Wind Offshore')}}
+        items = [{'ngcbmunitid': 'DRAXX-1', 'bmunitid': 'T_DRAXX-1', 'settlementperiod': period,
+                  'quantity': 50.0} for period in range(1, 47)]
+        items += [{'ngcbmunitid': None, 'bmunitid': 'WLNYW-1', 'settlementperiod': period,
+                   'quantity': 12.5} for period in range(1, 47)]
+        items.append({'ngcbmunitid': 'UNKNOWN', 'bmunitid': None, 'settlementperiod': 1, 'quantity': 1.0})
+
+        # 27th March 2016 has 46 periods (23 hours).
+        factors = calculate_capacity_factors(date(2016, 3, 27), date(2016, 3, 27), items, capacities)
+        self.assertEqual(len(factors), 3)
+        self.assertEqual(factors.unmatched, 1)
+        units = factors.by_unit()
+        self.assertAlmostEqual(units['DRAXX-1']['factor'], 1.0)
+        self.assertAlmostEqual(units['WLNYW-1']['factor'], 0.5)
+        self.assertEqual(units['BURBO-1']['output'], 0.0)
+        fuels = factors.by_fuel()
+        self.assertEqual(fuels['Wind Offshore']['units'], 2)
+        self.assertAlmostEqual(fuels['Wind Offshore']['factor'], 0.25)
+        self.assertAlmostEqual(factors.fleet()['factor'], (2300 + 575) / (200 * 23.0))
+        self.assertEqual(len(list(factors.rows())), 3)
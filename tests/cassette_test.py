@@ -0,0 +1,94 @@
+""" Tests for pywind.cassette """
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+from pywind import command_line
+from pywind.cache import normalise_params
+from pywind.cassette import Cassette, get_cassette, set_cassette, request_key
+from pywind.retry import RequestError
+from pywind.utils import get_or_post_a_url
+
+
+class CountingSession(object):
+    """ Session that returns a different body for every request. """
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        return self._response(url)
+
+    def post(self, url, **kwargs):
+        return self._response(url)
+
+    def _response(self, url):
+        self.calls += 1
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = url
+        resp.headers['Content-Type'] = 'text/xml'
+        resp._content = "<call n='{}'/>".format(self.calls).encode()
+        return resp
+
+
+class CassetteTest(unittest.TestCase):
+    """ Record and replay tests. """
+    URL = 'https://renewablesandchp.ofgem.gov.uk/Public/ReportViewer.aspx'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'test.zip')
+
+    def tearDown(self):
+        set_cassette(None)
+        shutil.rmtree(self.directory)
+
+    def test_key(self):
+        self.assertEqual(request_key(self.URL, params={'b': 1, 'a': 2, 'APIKey': 'x'}),
+                         "GET {}?a=2&b=1".format(self.URL))
+        # The parameters are normalised in the same way as for the response cache.
+        self.assertEqual(normalise_params([('APIKEY', 'x'), ('b', 1), ('a', 2)]), 'a=2&b=1')
+        self.assertNotEqual(request_key(self.URL, True, data='a=1'),
+                            request_key(self.URL, True, data='a=2'))
+
+    def test_record_replay(self):
+        sess = CountingSession()
+        cassette = Cassette(self.filename, 'record')
+        set_cassette(cassette)
+        get_or_post_a_url(self.URL, session=sess)
+        get_or_post_a_url(self.URL, session=sess)
+        get_or_post_a_url(self.URL, post=True, data='a=1', session=sess)
+        cassette.close()
+        self.assertEqual(len(cassette), 3)
+
+        cassette = Cassette(self.filename)
+        set_cassette(cassette)
+        self.assertEqual(get_or_post_a_url(self.URL, session=sess).content, b"<call n='1'/>")
+        self.assertEqual(get_or_post_a_url(self.URL, session=sess).content, b"<call n='2'/>")
+        resp = get_or_post_a_url(self.URL, post=True, data='a=1', session=sess)
+        self.assertEqual(resp.content, b"<call n='3'/>")
+        self.assertEqual(resp.headers['content-type'], 'text/xml')
+        self.assertEqual(sess.calls, 3)
+        with self.assertRaises(RequestError):
+            get_or_post_a_url(self.URL, params={'missing': 1}, session=sess)
+
+    def test_command_exit(self):
+        def failing_command(args):
+            """ Failing command """
+            get_or_post_a_url(self.URL, session=CountingSession())
+            sys.exit(1)
+
+        argv = ['pywind', '--no-cache', '--record', self.filename, 'failing_command']
+        with mock.patch.object(command_line, 'COMMANDS', [failing_command]), \
+                mock.patch.object(command_line, 'COMMAND_NAMES', {}), \
+                mock.patch.object(sys, 'argv', argv), \
+                mock.patch('sys.stdout'):
+            with self.assertRaises(SystemExit):
+                command_line.main()
+        self.assertIsNone(get_cassette())
+        self.assertEqual(len(Cassette(self.filename)), 1)
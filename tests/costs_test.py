@@ -0,0 +1,84 @@
+""" Tests for pywind.elexon.costs """
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+
+from pywind.elexon.api import DERBMDATA
+from pywind.elexon.costs import BalancingCostRollup, make_costs
+from pywind.session import SessionPool, set_session_pool
+from tests.elexon_test import FilePool
+
+
+class BalancingCostTest(unittest.TestCase):
+    """ Balancing Mechanism cost rollups. """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.rollup = BalancingCostRollup('apikey', os.path.join(self.directory, 'balancing.sqlite'),
+                                          batch_days=1)
+
+    def tearDown(self):
+        self.rollup.close()
+        shutil.rmtree(self.directory)
+        set_session_pool(SessionPool())
+
+    def test_rollup(self):
+        pool = FilePool('elexon_derbmdata.xml')
+        set_session_pool(pool)
+        progress = []
+        costs = self.rollup.calculate(date(2016, 1, 1), date(2016, 1, 2), fuels=False,
+                                      progress=lambda done, needed: progress.append((done, needed)))
+        self.assertEqual(progress, [(1, 2), (2, 2)])
+        self.assertEqual(len(pool.file_session.calls), 2)
+        self.assertEqual(costs.days, 2)
+        self.assertEqual(sorted(costs.units), ['BRYBW-1', 'DRAXX-1', 'WBUPS-4'])
+
+        # The saved daily totals are used rather than fetching again.
+        one_day = self.rollup.calculate(date(2016, 1, 1), date(2016, 1, 1), fuels=False)
+        self.assertEqual(len(pool.file_session.calls), 2)
+        self.assertEqual(self.rollup.missing(date(2016, 1, 1), date(2016, 1, 3)), [date(2016, 1, 3)])
+        units = costs.by_unit()
+        self.assertAlmostEqual(units['DRAXX-1']['bid_cashflow'],
+                               one_day.by_unit()['DRAXX-1']['bid_cashflow'] * 2)
+        self.assertEqual(units['DRAXX-1']['fuel'], 'Unknown')
+        self.assertEqual(len(list(costs.rows())), 3)
+
+    def test_several_requests(self):
+        # Each day may need more than one request.
+        def plan_requests(fromdate, todate):
+            return [{'SettlementDate': fromdate, 'SettlementPeriod': period} for period in (1, 2)]
+
+        pool = FilePool('elexon_derbmdata.xml')
+        set_session_pool(pool)
+        self.rollup.batch_days = 2
+        with mock.patch.object(DERBMDATA, 'plan_requests', plan_requests):
+            self.assertEqual(self.rollup.fetch(date(2016, 1, 1), date(2016, 1, 2)), 2)
+        self.assertEqual(len(pool.file_session.calls), 4)
+        costs = self.rollup.load(date(2016, 1, 1), date(2016, 1, 2))
+        self.assertEqual(costs.days, 2)
+        self.assertEqual(sorted(costs.units), ['BRYBW-1', 'DRAXX-1', 'WBUPS-4'])
+
+    def test_groups(self):
+        rows = [
+            ('2016-01-01', 'DRAXX-1', 'Drax Power Ltd', 'T_DRAXX-1', -10.0, 0.0, -300.0, 0.0),
+            ('2016-02-01', 'DRAXX-1', 'Drax Power Ltd', 'T_DRAXX-1', -10.0, 5.0, -500.0, 250.0),
+            ('2016-01-01', 'WLNYW-1', 'Walney Ltd', 'T_WLNYW-1', -20.0, 0.0, 1000.0, 0.0),
+        ]
+        costs = make_costs(date(2016, 1, 1), date(2016, 2, 29), rows, {'T_WLNYW-1': 'Wind Offshore'})
+        self.assertEqual(len(costs), 2)
+        units = costs.by_unit()
+        self.assertEqual(units['DRAXX-1']['bid_cashflow'], -800.0)
+        self.assertEqual(units['DRAXX-1']['bid_rate'], 40.0)
+        self.assertEqual(units['WLNYW-1']['fuel'], 'Wind Offshore')
+        self.assertEqual(costs.by_lead()['Walney Ltd']['bid_rate'], -50.0)
+        self.assertEqual(costs.by_fuel()['Unknown']['offer_rate'], 50.0)
+        months = costs.by_month()
+        self.assertEqual(sorted(months), [date(2016, 1, 1), date(2016, 2, 1)])
+        self.assertEqual(months[date(2016, 1, 1)]['units'], 2)
+        self.assertEqual(months[date(2016, 2, 1)]['bid_volume'], -10.0)
+        total = costs.total()
+        self.assertEqual(total['units'], 2)
+        self.assertEqual(total['bid_cashflow'], 200.0)
+        self.assertEqual(make_costs(date(2016, 1, 1), date(2016, 1, 1), [], {}).by_fuel(), {})
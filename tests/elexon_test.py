@@ -0,0 +1,397 @@
+""" Tests for pywind.elexon using saved responses. """
+import asyncio
+import io
+import os
+import unittest
+from datetime import date, datetime
+
+import numpy as np
+import requests
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from pywind.elexon.api import FUELINST, DERBMDATA, DERSYSDATA, B1330, B1610, B1630, agather_data
+from pywind.elexon.columns import ColumnarItems, pd, ratio
+from pywind.elexon.fetch import RangeFetcher
+from pywind.elexon.revisions import RevisionIndex
+from pywind.elexon.unit import BalancingData
+from pywind.session import SessionPool, AsyncSessionPool, set_session_pool, set_async_session_pool
+
+HERE = os.path.dirname(__file__)
+
+
+class FileSession(object):
+    """ Session that answers every request with the contents of a file from tests/files. """
+    def __init__(self, filename):
+        with open(os.path.join(HERE, 'files', filename), 'rb') as xfh:
+            self.content = xfh.read()
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append(kwargs.get('params'))
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = url
+        resp.raw = io.BytesIO(self.content)
+        return resp
+
+
+class FilePool(SessionPool):
+    """ Session pool that always returns the same :class:`FileSession`. """
+    def __init__(self, filename):
+        super(FilePool, self).__init__()
+        self.file_session = FileSession(filename)
+
+    def session_for(self, url):
+        return self.file_session
+
+
+class AsyncFileResponse(object):
+    """ Response returned by :class:`AsyncFileSession`, as used by aiohttp. """
+    def __init__(self, url, status, content):
+        self.url = url
+        self.status = status
+        self.headers = {'Content-Type': 'text/xml'}
+        self.charset = 'utf-8'
+        self.content = content
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def read(self):
+        return self.content
+
+
+class AsyncFileSession(object):
+    """ aiohttp style session that answers every request with the contents of a file from
+    tests/files. Any status codes supplied are returned first, with None raising a
+    connection error.
+    """
+    def __init__(self, filename, statuses=()):
+        with open(os.path.join(HERE, 'files', filename), 'rb') as xfh:
+            self.content = xfh.read()
+        self.statuses = list(statuses)
+        self.calls = []
+        self.closed = False
+
+    def get(self, url, **kwargs):
+        self.calls.append(kwargs.get('params'))
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status is None:
+            raise aiohttp.ClientConnectionError()
+        return AsyncFileResponse(url, status, self.content)
+
+    async def close(self):
+        self.closed = True
+
+
+class AsyncFilePool(AsyncSessionPool):
+    """ Async session pool that always returns the same :class:`AsyncFileSession`. """
+    def __init__(self, filename, statuses=()):
+        super(AsyncFilePool, self).__init__()
+        self.file_session = AsyncFileSession(filename, statuses)
+
+    def session_for(self, url):
+        self.sessions[url] = (asyncio.get_running_loop(), self.file_session)
+        return self.file_session
+
+
+class ElexonTest(unittest.TestCase):
+    """ Parsing of Elexon API responses. """
+    def tearDown(self):
+        set_session_pool(SessionPool())
+
+    def test_fuelinst(self):
+        set_session_pool(FilePool('elexon_fuelinst.xml'))
+        api = FUELINST('apikey')
+        self.assertTrue(api.get_data(FromDateTime='2016-03-27 00:00:00',
+                                     ToDateTime='2016-03-27 00:55:00'))
+        self.assertEqual(len(api), 12)
+        item = api.items[0]
+        self.assertEqual(item['settlementperiod'], 1)
+        self.assertEqual(item['date'], date(2016, 3, 27))
+        self.assertEqual(api.items[7]['time'].strftime("%H:%M"), "00:35")
+        self.assertEqual(api.items[7]['settlementperiod'], 2)
+
+    def test_csv(self):
+        set_session_pool(FilePool('elexon_fuelinst.xml'))
+        api = FUELINST('apikey')
+        api.get_data(FromDateTime='2016-03-27 00:00:00')
+        pool = FilePool('elexon_fuelinst.csv')
+        set_session_pool(pool)
+        capi = FUELINST('apikey')
+        self.assertTrue(capi.get_data(FromDateTime='2016-03-27 00:00:00'))
+        self.assertEqual(pool.file_session.calls[0]['ServiceType'], 'csv')
+        self.assertEqual(capi.items, api.items)
+
+        # Stored in columns the records are added without creating dicts.
+        colapi = FUELINST('apikey').use_columns()
+        self.assertTrue(colapi.get_data(FromDateTime='2016-03-27 00:00:00'))
+        self.assertEqual(list(colapi.items), list(api.use_columns().items))
+        self.assertEqual(colapi.items.kinds, api.items.kinds)
+
+        b1630 = B1630('apikey')
+        b1630.process_csv([['HDR', 'ACTUAL OR ESTIMATED WIND AND SOLAR POWER GENERATION'],
+                           ['*Document Type', 'Quantity', 'Settlement Date', 'Settlement Period', 'Active Flag'],
+                           ['Wind generation', '1234.5', '20160101', '3', 'Y'],
+                           ['FTR', '1']])
+        self.assertEqual(b1630.items[0]['settlementdate'], '2016-01-01')
+        self.assertEqual(b1630.items[0]['settlementperiod'], 3)
+        self.assertEqual(b1630.items[0]['quantity'], '1234.5')
+        self.assertIsNone(b1630.items[0]['curvetype'])
+        # Rows with missing columns are allowed.
+        b1630.process_csv([['Wind generation', 'A33', 'A16', 'TS-1', '99.5', 'A01', 'PT30M', '20160101', '4'],
+                           ['Solar generation', 'A33', 'A16', 'TS-2', '', 'A01', 'PT30M', '20160101', '5',
+                            'Solar', 'Solar', '', '', 'Y']])
+        self.assertEqual(len(b1630.items), 3)
+        self.assertEqual(b1630.items[1]['quantity'], '99.5')
+        self.assertFalse(b1630.items[1]['activeflag'])
+        self.assertIsNone(b1630.items[2]['quantity'])
+        self.assertTrue(b1630.items[2]['activeflag'])
+        self.assertEqual(b1630.items[2]['settlementdate'], '2016-01-01')
+        b1610 = B1610('apikey')
+        with self.assertRaisesRegex(ValueError, 'B1610 report has no XML_MAPPING'):
+            b1610.use_csv()
+        b1610.service_type = 'csv'
+        with self.assertRaisesRegex(ValueError, 'can only be requested as XML'):
+            b1610.get_data(SettlementDate='2016-01-01', Period=1)
+        with self.assertRaisesRegex(ValueError, 'several result sets'):
+            DERBMDATA('apikey').use_csv()
+        self.assertEqual(B1630('apikey').use_csv().service_type, 'csv')
+
+    def test_columnar(self):
+        set_session_pool(FilePool('elexon_fuelinst.xml'))
+        api = FUELINST('apikey')
+        api.get_data(FromDateTime='2016-03-27 00:00:00')
+        capi = FUELINST('apikey').use_columns()
+        capi.get_data(FromDateTime='2016-03-27 00:00:00')
+        self.assertIsInstance(capi.items, ColumnarItems)
+        self.assertEqual(len(capi), 12)
+        self.assertEqual(capi.items[-1]['date'], api.items[-1]['date'])
+        self.assertEqual([item['time'] for item in capi.items], [item['time'] for item in api.items])
+        # Fields in COLUMN_TYPES are converted from strings when stored in columns.
+        self.assertEqual(api.items[3]['wind'], '8133')
+        self.assertEqual(capi.items[3]['wind'], 8133)
+        self.assertEqual(api.use_columns().items[3], capi.items[3])
+        self.assertEqual(capi.items.column('wind').dtype, np.int64)
+        self.assertEqual(capi.items.column('settlementperiod').dtype, np.int64)
+        self.assertEqual(capi.items.column('date').dtype, np.dtype('datetime64[D]'))
+        times = capi.items.time_axis()
+        self.assertEqual(times[7], np.datetime64('2016-03-27T00:35:00'))
+
+        items = ColumnarItems([{'a': 1.5, 'b': 'x'}, {'a': None, 'c': 2}])
+        items.extend(ColumnarItems([{'a': 3.0, 'b': 'x'}]))
+        self.assertEqual(len(items), 3)
+        self.assertEqual(items[1], {'a': None, 'b': None, 'c': 2})
+        self.assertEqual(items.kinds, {'a': 'float', 'b': 'object', 'c': 'object'})
+        self.assertTrue(np.isnan(items.column('a')[1]))
+
+        # Merging many at once gives the same columns as adding the rows one at a time.
+        rows = [{'a': idx, 'b': 'x'} for idx in range(3)] + [{'a': 1.5, 'd': date(2016, 1, 1)}]
+        items = ColumnarItems()
+        items.extend_columns([ColumnarItems([row]) for row in rows])
+        self.assertEqual(list(items), list(ColumnarItems(rows)))
+        self.assertEqual(items.kinds, {'a': 'object', 'b': 'object', 'd': 'object'})
+
+    @unittest.skipIf(pd is None, "pandas is not installed")
+    def test_to_frame(self):
+        set_session_pool(FilePool('elexon_fuelinst.xml'))
+        api = FUELINST('apikey')
+        api.get_data(FromDateTime='2016-03-27 00:00:00')
+        frame = api.to_frame()
+        self.assertEqual(len(frame), 12)
+        self.assertEqual(frame['wind'].dtype, np.float64)
+        self.assertEqual(frame['settlementperiod'].dtype, np.int8)
+        self.assertEqual(frame['recordtype'].dtype, 'category')
+        self.assertEqual(frame['publishingperiodcommencingtime'][7], pd.Timestamp('2016-03-27 00:35'))
+        self.assertEqual(frame['wind'][0], float(api.items[0]['wind']))
+        pd.testing.assert_frame_equal(api.use_columns().to_frame(), frame)
+
+        set_session_pool(FilePool('elexon_derbmdata.xml'))
+        bdd = BalancingData('apikey')
+        bdd.get_data(SettlementDate='2016-01-01', SettlementPeriod='*')
+        frame = bdd.api.to_frame('ipbc')
+        self.assertEqual(len(frame), 6)
+        self.assertEqual(frame['total'].dtype, np.float64)
+        self.assertEqual(frame['settlementdate'].dtype.kind, 'M')
+        frame = bdd.api.to_frame()
+        self.assertEqual(len(frame), sum(len(items) for items in bdd.api.multi.values()))
+        self.assertEqual(frame['settlementperiod'].dtype, np.int8)
+        pd.testing.assert_frame_equal(bdd.api.use_columns().to_frame(), frame)
+        frame = bdd.to_frame()
+        row = frame[(frame['unit'] == 'DRAXX-1') & (frame['settlementperiod'] == 2)].iloc[0]
+        self.assertEqual(row['bid_cashflow'], -420.25)
+        self.assertEqual(frame['type'].dtype, 'category')
+
+    def test_derbmdata(self):
+        set_session_pool(FilePool('elexon_derbmdata.xml'))
+        bdd = BalancingData('apikey')
+        self.assertTrue(bdd.get_data(SettlementDate='2016-01-01', SettlementPeriod='*'))
+        self.assertEqual(sorted(bdd.api.multi), ['bav', 'ipbav', 'ipbc', 'ipoav', 'ipoc', 'oav'])
+        self.assertEqual(len(bdd.api.multi['ipbc']), 6)
+        self.assertEqual(sorted(bdd.units), ['BRYBW-1', 'DRAXX-1', 'WBUPS-4'])
+        period = bdd.units['DRAXX-1'].periods[2]
+        self.assertEqual(period.bid_volume, -12.5)
+        self.assertEqual(period.bid_cashflow, -420.25)
+        self.assertAlmostEqual(period.bid_rate, 33.62)
+        self.assertEqual(period.offer_volume, 0.0)
+
+    def test_balancing_aggregator(self):
+        set_session_pool(FilePool('elexon_derbmdata.xml'))
+        bdd = BalancingData('apikey')
+        bdd.api.use_columns()
+        bdd.get_data(SettlementDate='2016-01-01', SettlementPeriod='*')
+        agg = bdd.aggregator
+        self.assertEqual(sorted(agg.units), ['BRYBW-1', 'DRAXX-1', 'WBUPS-4'])
+        self.assertEqual(agg.days, ['2016-01-01'])
+        self.assertEqual(bdd.units['DRAXX-1'].periods[2].bid_cashflow, -420.25)
+
+        names, totals = agg.by_unit()
+        draxx = names.index('DRAXX-1')
+        self.assertEqual(totals.shape, (3, 4))
+        row = np.nonzero((agg.unit_indexes == draxx) & (agg.periods == 2))[0][0]
+        bid_rate, offer_rate = agg.rates()
+        self.assertAlmostEqual(bid_rate[row], 33.62)
+        self.assertEqual(offer_rate[row], 0.0)
+        np.testing.assert_array_equal(ratio(np.array([1.0, -4.0, 3.0]), np.array([0.0, -2.0, 3.0])),
+                                      [0.0, 2.0, 1.0])
+
+        names, days, day_totals = agg.by_day()
+        self.assertEqual(days, [date(2016, 1, 1)])
+        np.testing.assert_allclose(day_totals[:, 0, :], totals)
+        names, months, month_totals = agg.by_month()
+        self.assertEqual(months, [date(2016, 1, 1)])
+        np.testing.assert_allclose(month_totals[:, 0, :], totals)
+
+        # Adding the same data again replaces, rather than adds to, the values.
+        agg.add(bdd.api)
+        np.testing.assert_allclose(agg.by_unit()[1], totals)
+
+    def test_async(self):
+        # Requests use aiohttp if it's installed, otherwise the requests session pool.
+        pool = FilePool('elexon_fuelinst.xml')
+        set_session_pool(pool)
+        async_pool = AsyncFilePool('elexon_fuelinst.xml')
+        set_async_session_pool(async_pool)
+        try:
+            apis = [FUELINST('apikey') for _ in range(3)]
+            results = asyncio.run(agather_data([(api, {'FromDateTime': '2016-03-27 00:00:00'})
+                                                for api in apis], concurrency=2))
+        finally:
+            set_async_session_pool(AsyncSessionPool())
+        self.assertEqual(results, [True, True, True])
+        self.assertEqual([len(api) for api in apis], [12, 12, 12])
+        calls = async_pool.file_session.calls if aiohttp else pool.file_session.calls
+        self.assertEqual(len(calls), 3)
+        # The pooled sessions are closed once all the requests have finished.
+        self.assertEqual(len(async_pool), 0)
+        self.assertEqual(async_pool.file_session.closed, aiohttp is not None)
+
+
+class RangeFetcherTest(unittest.TestCase):
+    """ Planning and fetching date ranges. """
+    def tearDown(self):
+        set_session_pool(SessionPool())
+
+    def test_revisions(self):
+        set_session_pool(FilePool('elexon_b1630.xml'))
+        api = B1630('apikey')
+        self.assertTrue(api.get_data(SettlementDate='2016-01-01', Period='*'))
+        self.assertEqual(len(api.items), 3)
+        self.assertEqual(api.items[0]['documentrevnum'], '2')
+        self.assertEqual(api.items[0]['quantity'], '110.25')
+        self.assertIsInstance(api.items, list)
+        self.assertEqual(api.revisions.replaced, 1)
+        self.assertIs(api.revisions.records, api.items)
+
+        # The same records from a number of requests are merged to a single copy.
+        plan = B1630.plan_requests(date(2016, 1, 1), date(2016, 1, 1))[:2]
+        api = RangeFetcher(B1630, 'apikey', workers=2).fetch_requests(plan)
+        self.assertEqual(len(api.items), 3)
+        capi = RangeFetcher(B1630, 'apikey', workers=2, columnar=True).fetch_requests(plan)
+        self.assertEqual(len(capi.items), 3)
+        self.assertEqual(capi.items.column('quantity').tolist(), [110.25, 50.0, 90.0])
+
+        items = RevisionIndex(B1630.REVISION_KEYS, api.items)
+        older = dict(api.items[0], documentrevnum='1', quantity='1.0')
+        self.assertFalse(items.append(older))
+        self.assertEqual(items.discarded, 1)
+        self.assertIn(older, items)
+        self.assertEqual(items[0]['quantity'], '110.25')
+
+        # Records added later are checked against those already in items, even if items
+        # has been replaced.
+        api.add_items([older])
+        self.assertEqual(api.items[0]['quantity'], '110.25')
+        api.items = list(api.items)
+        api.add_items([dict(older, documentrevnum='3')])
+        self.assertEqual(len(api.items), 3)
+        self.assertEqual(api.items[0]['quantity'], '1.0')
+
+    def test_merge_many(self):
+        set_session_pool(FilePool('elexon_fuelinst.xml'))
+        api = FUELINST('apikey').use_columns()
+        api.get_data(FromDateTime='2016-03-27 00:00:00')
+        fetcher = RangeFetcher(FUELINST, 'apikey', columnar=True)
+        fetcher.results = {idx: api for idx in range(500)}
+        merged = fetcher.merged()
+        self.assertEqual(len(merged.items), 500 * 12)
+        np.testing.assert_array_equal(merged.items.column('wind'), np.tile(api.items.column('wind'), 500))
+        self.assertEqual(merged.items.kinds, api.items.kinds)
+
+    def test_plan(self):
+        plan = DERSYSDATA.plan_requests(date(2016, 1, 1), date(2016, 1, 10))
+        self.assertEqual(plan, [
+            {'FromSettlementDate': date(2016, 1, 1), 'ToSettlementDate': date(2016, 1, 7)},
+            {'FromSettlementDate': date(2016, 1, 8), 'ToSettlementDate': date(2016, 1, 10)}])
+        plan = B1610.plan_requests(date(2016, 1, 1), date(2016, 1, 2))
+        self.assertEqual(len(plan), 96)
+        self.assertEqual(plan[48], {'SettlementDate': date(2016, 1, 2), 'Period': 1})
+        with self.assertRaises(NotImplementedError):
+            B1330.plan_requests(date(2016, 1, 1), date(2016, 1, 2))
+
+        plan = FUELINST.plan_datetimes(datetime(2016, 1, 1, 12), datetime(2016, 1, 3, 6))
+        self.assertEqual(plan, [
+            {'FromDateTime': datetime(2016, 1, 1, 12), 'ToDateTime': datetime(2016, 1, 2, 12)},
+            {'FromDateTime': datetime(2016, 1, 2, 12, 0, 1), 'ToDateTime': datetime(2016, 1, 3, 6)}])
+        self.assertEqual(len(FUELINST.plan_datetimes(datetime(2016, 1, 1), datetime(2016, 1, 2))), 1)
+
+    def test_fetch(self):
+        pool = FilePool('elexon_derbmdata.xml')
+        set_session_pool(pool)
+        fetcher = RangeFetcher(DERBMDATA, 'apikey', workers=3)
+        api = fetcher.fetch(date(2016, 1, 1), date(2016, 1, 3))
+        self.assertEqual(len(fetcher), 3)
+        self.assertEqual(fetcher.failed, {})
+        self.assertEqual(len(api.multi['bav']), 18)
+        self.assertEqual(sorted(call['SettlementDate'] for call in pool.file_session.calls),
+                         [date(2016, 1, 1), date(2016, 1, 2), date(2016, 1, 3)])
+
+        fetcher = RangeFetcher(DERBMDATA, 'apikey', workers=3, columnar=True)
+        capi = fetcher.fetch(date(2016, 1, 1), date(2016, 1, 3))
+        self.assertIsInstance(capi.multi['bav'], ColumnarItems)
+        self.assertEqual(list(capi.multi['bav']), api.multi['bav'])
+
+    def test_failures(self):
+        # Responses that cannot be parsed, or processed, are recorded for each request.
+        set_session_pool(FilePool('delta.txt'))
+        fetcher = RangeFetcher(DERBMDATA, 'apikey', workers=2)
+        api = fetcher.fetch(date(2016, 1, 1), date(2016, 1, 2))
+        self.assertEqual(fetcher.failed, {0: False, 1: False})
+        self.assertEqual(api.multi, {})
+
+        set_session_pool(FilePool('bm_unitdata.xml'))
+        fetcher.fetch(date(2016, 1, 1), date(2016, 1, 2))
+        self.assertEqual(sorted(fetcher.failed), [0, 1])
+        self.assertIsInstance(fetcher.failed[0], ValueError)
+
+        set_session_pool(FilePool('elexon_derbmdata.xml'))
+        api = fetcher.retry_failed()
+        self.assertEqual(fetcher.failed, {})
+        self.assertEqual(len(api.multi['bav']), 12)
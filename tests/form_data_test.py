@@ -1,9 +1,12 @@
 """ Tests for pywind.ofgem.form_data """
+import io
 import os
 from pprint import pprint
 from unittest import TestCase
 
-from pywind.ofgem.form import _make_url
+import requests
+
+from pywind.ofgem.form import _make_url, OfgemForm
 from pywind.ofgem.form_data import FormData
 
 
@@ -21,6 +24,32 @@ class UrlTest(TestCase):
             self.assertEqual(_make_url(case[0], case[1]), case[2])
 
 
+class OfgemFormTest(TestCase):
+    """ Tests for the OfgemForm class. """
+    HERE = os.path.dirname(__file__)
+
+    def export(self, form):
+        with open(os.path.join(self.HERE, 'files', 'cert_test.xml'), 'rb') as xfh:
+            data = xfh.read()
+        form.export = requests.Response()
+        form.export.raw = io.BytesIO(data)
+        return data
+
+    def test_details(self):
+        """ The export is only kept when keep_original is set. """
+        form = OfgemForm('ReportViewer.aspx', session=requests.Session())
+        self.export(form)
+        self.assertEqual([node.get('textbox4') for node in form.details()], ['G00852MWEN', 'G00852MWEN', 'R00055NQNI', 'R00055NQNI', 'G00091NWNI'])
+        self.assertIsNone(form.raw_data)
+        self.assertFalse(form.save_original('unused.xml'))
+        self.assertEqual(list(form.details()), [])
+
+        form = OfgemForm('ReportViewer.aspx', session=requests.Session(), keep_original=True)
+        data = self.export(form)
+        self.assertEqual(len(list(form.details())), 5)
+        self.assertEqual(form.raw_data, data)
+
+
 class FormDataTest(TestCase):
     """ Tests for the FormData class. """
     HERE = os.path.dirname(__file__)
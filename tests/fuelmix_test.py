@@ -0,0 +1,57 @@
+""" Tests for pywind.elexon.fuelmix """
+import unittest
+from datetime import date, datetime
+
+import numpy as np
+
+from pywind.elexon.api import FUELINST
+from pywind.elexon.fuelmix import FuelMixResampler
+from pywind.elexon.live import FuelMixHistory
+from pywind.session import SessionPool, set_session_pool
+from tests.elexon_test import FilePool
+
+
+class FuelMixTest(unittest.TestCase):
+    """ Resampling FUELINST readings. """
+    def setUp(self):
+        set_session_pool(FilePool('elexon_fuelinst.xml'))
+        self.api = FUELINST('apikey')
+        self.api.get_data(FromDateTime='2016-03-27 00:00:00')
+
+    def tearDown(self):
+        set_session_pool(SessionPool())
+
+    def test_half_hourly(self):
+        resampler = FuelMixResampler()
+        self.assertEqual(resampler.add(self.api.items), 12)
+        periods = resampler.half_hourly()
+        self.assertEqual(periods.periods.tolist(), [1, 2])
+        self.assertEqual(periods.readings.tolist(), [6, 6])
+        wind = [int(item['wind']) for item in self.api.items]
+        self.assertAlmostEqual(periods.column('wind')[0], sum(wind[:6]) / 12.0)
+        np.testing.assert_allclose(periods.shares.sum(axis=1), [1.0, 1.0])
+
+        daily = resampler.daily()
+        self.assertEqual(daily.dates.tolist(), [date(2016, 3, 27)])
+        np.testing.assert_allclose(daily.energy[0], periods.energy.sum(axis=0))
+        self.assertEqual(daily.readings.tolist(), [12])
+        self.assertEqual(resampler.monthly().dates.tolist(), [date(2016, 3, 1)])
+        rows = list(periods.rows())
+        self.assertEqual(rows[1]['FuelMix']['@settlementperiod'], 2)
+
+    def test_incremental(self):
+        items = list(self.api.items)
+        whole = FuelMixResampler()
+        whole.add(items)
+
+        resampler = FuelMixResampler(fuels=('wind', 'ccgt'))
+        self.assertEqual(resampler.add(items[:4]), 4)
+        self.assertEqual(resampler.half_hourly().readings.tolist(), [4])
+        # Readings that have already been added are ignored.
+        self.assertEqual(resampler.add(items[:8]), 4)
+        history = FuelMixHistory(12)
+        history.extend(items)
+        self.assertEqual(resampler.add(history), 4)
+        self.assertEqual(resampler.latest, np.datetime64(datetime(2016, 3, 27, 0, 55)))
+        np.testing.assert_allclose(resampler.half_hourly().column('wind'), whole.half_hourly().column('wind'))
+        np.testing.assert_allclose(resampler.daily().column('ccgt'), whole.daily().column('ccgt'))
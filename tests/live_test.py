@@ -0,0 +1,77 @@
+""" Tests for pywind.elexon.live """
+import json
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+from datetime import datetime
+
+from pywind.elexon.live import FuelInstPoller, FuelMixHistory, FileSink, SocketSink
+from pywind.session import SessionPool, set_session_pool
+from tests.elexon_test import FilePool
+
+
+class FuelInstPollerTest(unittest.TestCase):
+    """ Polling FUELINST for new readings. """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pool = FilePool('elexon_fuelinst.xml')
+        set_session_pool(self.pool)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        set_session_pool(SessionPool())
+
+    def test_poll(self):
+        received = []
+        filename = os.path.join(self.directory, 'fuelinst.jsonl')
+        poller = FuelInstPoller('apikey', history=6, sinks=[received.extend, FileSink(filename)])
+        self.assertEqual(poller.window(datetime(2016, 3, 27, 0, 57, 30)),
+                         (datetime(2016, 3, 27, 0, 30), datetime(2016, 3, 27, 0, 55)))
+
+        rows = poller.poll(datetime(2016, 3, 27, 0, 57))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(received, rows)
+        self.assertEqual(poller.history.latest, datetime(2016, 3, 27, 0, 55))
+        self.assertEqual(self.pool.file_session.calls[0]['FromDateTime'], datetime(2016, 3, 27, 0, 30))
+
+        # Nothing new is published until the next 5 minute reading.
+        self.assertEqual(poller.poll(datetime(2016, 3, 27, 0, 59)), [])
+        self.assertEqual(poller.polls, 1)
+        self.assertEqual(poller.poll(datetime(2016, 3, 27, 1, 1)), [])
+        self.assertEqual(self.pool.file_session.calls[1]['FromDateTime'], datetime(2016, 3, 27, 1, 0))
+        self.assertEqual(len(received), 6)
+
+        with open(filename) as jfh:
+            lines = [json.loads(line) for line in jfh]
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(lines[0]['publishingperiodcommencingtime'], '2016-03-27 00:30:00')
+
+    def test_history(self):
+        poller = FuelInstPoller('apikey', history=6)
+        rows = poller.poll(datetime(2016, 3, 27, 0, 55))
+        history = FuelMixHistory(4)
+        history.extend(rows)
+        self.assertEqual(len(history), 4)
+        self.assertEqual(history.times()[0], datetime(2016, 3, 27, 0, 40))
+        self.assertEqual(history.column('wind').tolist(), [int(row['wind']) for row in rows[2:]])
+        readings = list(history)
+        self.assertEqual(readings[-1]['time'], datetime(2016, 3, 27, 0, 55))
+        self.assertEqual(readings[-1]['ccgt'], 3122)
+        self.assertEqual(history.totals()[-1], sum(readings[-1][fuel] for fuel in history.fuels))
+
+    def test_socket(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        sink = SocketSink('127.0.0.1', server.getsockname()[1])
+        sink([{'wind': 1}, {'wind': 2}])
+        conn, _ = server.accept()
+        data = b''
+        while data.count(b'\n') < 2:
+            data += conn.recv(1024)
+        self.assertEqual([json.loads(line) for line in data.decode().splitlines()], [{'wind': 1}, {'wind': 2}])
+        sink.close()
+        conn.close()
+        server.close()
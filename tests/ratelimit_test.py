@@ -0,0 +1,43 @@
+""" Tests for pywind.ratelimit """
+import asyncio
+import os
+import tempfile
+import unittest
+
+from pywind.ratelimit import TokenBucket, RateLimiter
+
+
+class TokenBucketTest(unittest.TestCase):
+    """ Token bucket and rate limiter tests. """
+    def test_reserve(self):
+        bucket = TokenBucket(10, 2)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, places=2)
+        self.assertAlmostEqual(bucket.reserve(), 0.2, places=2)
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+    def test_async(self):
+        bucket = TokenBucket(100, 1)
+
+        async def _acquire_all():
+            await asyncio.gather(*[bucket.acquire_async() for _ in range(5)])
+
+        asyncio.run(_acquire_all())
+        self.assertLess(bucket.tokens, 1)
+
+    def test_limiter(self):
+        limiter = RateLimiter({'api.bmreports.com': 5})
+        self.assertIsNotNone(limiter.bucket_for('https://api.bmreports.com/BMRS/B1610/v1'))
+        self.assertIsNone(limiter.bucket_for('http://www.bmreports.com/bsp/'))
+        self.assertIsNotNone(RateLimiter().bucket_for('http://www.bmreports.com/bsp/'))
+
+        with tempfile.NamedTemporaryFile('w', suffix='.cfg', delete=False) as cfh:
+            cfh.write("[rate_limits]\napi.bmreports.com = 2, 4\n")
+        try:
+            limiter = RateLimiter.from_config(cfh.name)
+        finally:
+            os.unlink(cfh.name)
+        bucket = limiter.bucket_for('https://api.bmreports.com/BMRS/B1610/v1')
+        self.assertEqual((bucket.rate, bucket.capacity), (2.0, 4.0))
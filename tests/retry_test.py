@@ -0,0 +1,77 @@
+""" Tests for pywind.retry """
+import unittest
+
+import requests
+
+from pywind.retry import RetryPolicy, CircuitBreaker, CircuitOpenError, RequestError, \
+    parse_retry_after, set_retry_policy, set_circuit_breaker
+from pywind.utils import get_or_post_a_url
+
+
+class SequenceSession(object):
+    """ Session that returns the status codes supplied, in order. """
+    def __init__(self, *statuses, **kwargs):
+        self.statuses = list(statuses)
+        self.headers = kwargs.get('headers', {})
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        status = self.statuses.pop(0)
+        if status is None:
+            raise requests.exceptions.ConnectionError()
+        resp = requests.Response()
+        resp.status_code = status
+        resp.headers.update(self.headers)
+        resp._content = b''
+        resp._content_consumed = True
+        return resp
+
+
+class RetryTest(unittest.TestCase):
+    """ Retry and circuit breaker tests. """
+    URL = 'https://api.bmreports.com/BMRS/FUELINST/v1'
+
+    def setUp(self):
+        self.delays = []
+        self.policy = RetryPolicy(max_attempts=3, jitter=0)
+        self.policy.sleep = self.delays.append
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        set_retry_policy(self.policy)
+        set_circuit_breaker(self.breaker)
+
+    def tearDown(self):
+        set_retry_policy(RetryPolicy())
+        set_circuit_breaker(CircuitBreaker())
+
+    def test_backoff(self):
+        sess = SequenceSession(None, 503, 200)
+        resp = get_or_post_a_url(self.URL, session=sess)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(sess.calls, 3)
+        self.assertEqual(self.delays, [0.5, 1.0])
+
+    def test_retry_after(self):
+        sess = SequenceSession(429, 200, headers={'Retry-After': '7'})
+        get_or_post_a_url(self.URL, session=sess)
+        self.assertEqual(self.delays, [7.0])
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+        self.assertIsNone(parse_retry_after('soon'))
+
+    def test_not_retried(self):
+        sess = SequenceSession(404, 200)
+        with self.assertRaises(RequestError) as ctx:
+            get_or_post_a_url(self.URL, session=sess)
+        self.assertEqual(ctx.exception.status_code, 404)
+        self.assertEqual(sess.calls, 1)
+
+    def test_circuit_breaker(self):
+        sess = SequenceSession(500, 500, 500, 200)
+        with self.assertRaises(RequestError):
+            get_or_post_a_url(self.URL, session=sess)
+        self.assertTrue(self.breaker.is_open('api.bmreports.com'))
+        with self.assertRaises(CircuitOpenError):
+            get_or_post_a_url(self.URL, session=sess)
+        self.assertEqual(sess.calls, 3)
+        self.breaker.reset()
+        self.assertEqual(get_or_post_a_url(self.URL, session=sess).status_code, 200)
@@ -0,0 +1,93 @@
+""" Tests for pywind.session """
+import unittest
+
+import requests
+
+from pywind.ofgem.form import OfgemForm
+from pywind.ratelimit import RateLimiter, set_rate_limiter
+from pywind.session import SessionPool, host_for_url, set_session_pool
+
+
+FORM = b'<html><body><form id="form1" action="./ReportViewer.aspx" method="post"></form></body></html>'
+
+
+class CookieSession(requests.Session):
+    """ Session that sets the ASP.NET_SessionId cookie once, as the Ofgem site does. """
+    def __init__(self):
+        super(CookieSession, self).__init__()
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append(kwargs.get('cookies'))
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = url
+        resp._content = FORM
+        if 'ASP.NET_SessionId' not in self.cookies:
+            self.cookies.set('ASP.NET_SessionId', 'abc123')
+            resp.cookies.set('ASP.NET_SessionId', 'abc123')
+        return resp
+
+
+class CookiePool(SessionPool):
+    """ Pool that returns a new :class:`CookieSession` for each form. """
+    def new_session(self):
+        return CookieSession()
+
+
+class SessionPoolTest(unittest.TestCase):
+    """ Session pool tests. """
+    def test_host_for_url(self):
+        for case in [
+            ('https://api.bmreports.com/BMRS/B1420/v1', 'api.bmreports.com'),
+            ('http://www.bmreports.com:8080/bsp/', 'www.bmreports.com:8080'),
+            ('HTTPS://RenewablesAndCHP.ofgem.gov.uk/Default.aspx', 'renewablesandchp.ofgem.gov.uk'),
+            ('api.bmreports.com', 'api.bmreports.com')
+        ]:
+            self.assertEqual(host_for_url(case[0]), case[1])
+
+    def test_session_per_host(self):
+        pool = SessionPool(pool_maxsize=2)
+        sess1 = pool.session_for('https://api.bmreports.com/BMRS/FUELINST/v1')
+        sess2 = pool.session_for('https://api.bmreports.com/BMRS/B1610/v1')
+        sess3 = pool.session_for('http://www.bmreports.com/bsp/staticdata/BMUFuelType.xls')
+        self.assertIs(sess1, sess2)
+        self.assertIsNot(sess1, sess3)
+        self.assertEqual(len(pool), 2)
+        self.assertEqual(sess1.get_adapter('https://api.bmreports.com')._pool_maxsize, 2)
+        pool.close()
+        self.assertEqual(len(pool), 0)
+
+    def test_new_session(self):
+        pool = SessionPool(pool_maxsize=3, headers={'User-Agent': 'pywind'})
+        sess1 = pool.new_session()
+        self.assertIsNot(sess1, pool.new_session())
+        self.assertIsNot(sess1, pool.session_for('https://www.renewablesandchp.ofgem.gov.uk/'))
+        self.assertEqual(len(pool), 1)
+        self.assertEqual(sess1.get_adapter('https://www.renewablesandchp.ofgem.gov.uk')._pool_maxsize, 3)
+        self.assertEqual(sess1.headers['User-Agent'], 'pywind')
+
+
+class OfgemFormSessionTest(unittest.TestCase):
+    """ Each Ofgem form keeps its own cookies. """
+    def setUp(self):
+        set_session_pool(CookiePool())
+        set_rate_limiter(RateLimiter({}))
+
+    def tearDown(self):
+        set_session_pool(SessionPool())
+        set_rate_limiter(RateLimiter())
+
+    def test_form_cookies(self):
+        form1 = OfgemForm('ReportViewer.aspx?ReportPath=/Renewables/Accreditation/AccreditedStationsExternalPublic')
+        form2 = OfgemForm('ReportViewer.aspx?ReportPath=/Renewables/Accreditation/AccreditedStationsExternalPublic')
+        self.assertIsNot(form1.session, form2.session)
+        self.assertTrue(form1.get())
+        self.assertEqual(form1.cookies, {'ASP.NET_SessionId': 'abc123'})
+        self.assertEqual(form1.session.calls[-1], {'ASP.NET_SessionId': 'abc123'})
+        self.assertEqual(len(form2.session.cookies), 0)
+
+        # The cookie is not set again once the session has it.
+        form1.cookies = None
+        self.assertTrue(form1.get())
+        self.assertEqual(form1.cookies, {'ASP.NET_SessionId': 'abc123'})
@@ -0,0 +1,55 @@
+""" Tests for pywind.settlement """
+import unittest
+from datetime import date, datetime
+
+import numpy as np
+
+from pywind.elexon.api import B1610, FUELINST
+from pywind.settlement import get_calendar, periods_in_day, period_start, settlement_period, \
+    settlement_periods, settlement_days, as_date
+
+
+class SettlementTest(unittest.TestCase):
+    """ Settlement calendar tests. """
+    def test_periods(self):
+        self.assertEqual(periods_in_day(date(2016, 1, 1)), 48)
+        self.assertEqual(periods_in_day(date(2016, 3, 27)), 46)
+        self.assertEqual(periods_in_day(date(2016, 10, 30)), 50)
+        self.assertEqual(list(settlement_periods(date(2017, 3, 26)))[-1], 46)
+        self.assertEqual(len(B1610.plan_requests(date(2016, 10, 29), date(2016, 10, 30))), 98)
+
+    def test_days(self):
+        self.assertEqual(list(settlement_days(date(2016, 2, 28), date(2016, 3, 1))),
+                         [date(2016, 2, 28), date(2016, 2, 29), date(2016, 3, 1)])
+        self.assertEqual(list(settlement_days(date(2016, 1, 2), date(2016, 1, 1))), [])
+        self.assertEqual(as_date('2016-01-01'), date(2016, 1, 1))
+        self.assertEqual(as_date(datetime(2016, 1, 1, 12)), date(2016, 1, 1))
+        self.assertIsNone(as_date('*'))
+
+    def test_times(self):
+        self.assertEqual(period_start(date(2016, 1, 1), 1), datetime(2016, 1, 1))
+        self.assertEqual(period_start(date(2016, 6, 1), 1), datetime(2016, 5, 31, 23))
+        self.assertEqual(period_start(date(2016, 6, 1), 1, local=True), datetime(2016, 6, 1))
+        self.assertEqual(period_start(date(2016, 3, 27), 3, local=True), datetime(2016, 3, 27, 2))
+        self.assertEqual(period_start(date(2016, 10, 30), 6, local=True), datetime(2016, 10, 30, 1, 30))
+        self.assertEqual(settlement_period(datetime(2016, 10, 30, 1, 30)), (date(2016, 10, 30), 6))
+        self.assertEqual(settlement_period(datetime(2016, 5, 31, 23, 15)), (date(2016, 6, 1), 1))
+        with self.assertRaises(ValueError):
+            period_start(date(2016, 3, 27), 47)
+
+        plan = FUELINST.plan_requests(date(2016, 6, 1), date(2016, 6, 1))
+        self.assertEqual(plan, [{'FromDateTime': datetime(2016, 5, 31, 23),
+                                 'ToDateTime': datetime(2016, 6, 1, 22, 55)}])
+
+    def test_vectorized(self):
+        cal = get_calendar()
+        dates = np.array(['2016-10-30'] * 50, dtype='datetime64[D]')
+        periods = np.arange(1, 51)
+        times = cal.to_utc(dates, periods)
+        self.assertEqual(len(np.unique(times)), 50)
+        back_dates, back_periods = cal.from_utc(times)
+        self.assertTrue(np.all(back_dates == dates))
+        self.assertTrue(np.all(back_periods == periods))
+        local = cal.to_local(dates, periods)
+        self.assertEqual(local[4], np.datetime64('2016-10-30T01:00'))
+        self.assertEqual(local[2], np.datetime64('2016-10-30T01:00'))
@@ -0,0 +1,117 @@
+""" Tests for pywind.elexon.store """
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import date, datetime, time, timedelta
+
+from pywind.elexon.api import B1610
+from pywind.elexon.store import ElexonStore, encode_record, decode_record, needs_refresh
+from pywind.session import SessionPool, set_session_pool
+from tests.elexon_test import FilePool
+
+
+class ElexonStoreTest(unittest.TestCase):
+    """ Local store of Elexon data. """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = ElexonStore('apikey', os.path.join(self.directory, 'elexon.sqlite'))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+        set_session_pool(SessionPool())
+
+    def test_sync(self):
+        pool = FilePool('elexon_derbmdata.xml')
+        set_session_pool(pool)
+        self.assertGreater(self.store.sync('DERBMDATA', date(2016, 1, 1), date(2016, 1, 2)), 0)
+        self.assertEqual(len(pool.file_session.calls), 2)
+        self.assertEqual(self.store.sync('derbmdata', date(2016, 1, 1), date(2016, 1, 2)), 0)
+        self.assertEqual(len(pool.file_session.calls), 2)
+
+        missing = self.store.missing('DERBMDATA', date(2015, 12, 31), date(2016, 1, 3))
+        self.assertEqual([params['SettlementDate'] for params in missing],
+                         [date(2015, 12, 31), date(2016, 1, 3)])
+
+        api = self.store.load('DERBMDATA', date(2016, 1, 1), date(2016, 1, 1))
+        self.assertEqual(len(api.multi['ipbc']), 6)
+        self.assertEqual(api.multi['ipbc'][0]['ngcbmunitname'], 'DRAXX-1')
+
+        # Recently settled days are fetched again in case they are revised.
+        self.assertEqual(len(self.store.missing('DERBMDATA', date(2016, 1, 1), date(2016, 1, 2),
+                                                now=datetime(2017, 1, 1))), 0)
+        with self.store._lock:
+            self.store._db.execute("UPDATE fetched SET fetched = '2016-01-02T00:00:00'")
+        self.assertEqual(len(self.store.missing('DERBMDATA', date(2016, 1, 1), date(2016, 1, 2),
+                                                now=datetime(2016, 1, 3))), 2)
+
+    def test_periods(self):
+        api = B1610('apikey')
+        api.items = [{'timeseriesid': 'TS-1', 'bmunitid': 'T_DRAXX-1', 'settlementdate': '2016-01-01',
+                      'settlementperiod': 3, 'documentrevnum': '2', 'quantity': 600.0}]
+        self.assertEqual(self.store.add('B1610', api), 1)
+        api.items[0].update({'documentrevnum': '1', 'quantity': 500.0})
+        self.assertEqual(self.store.add('B1610', api), 0)
+        self.assertEqual(self.store.load('B1610', date(2016, 1, 1), date(2016, 1, 1)).items[0]['quantity'],
+                         600.0)
+        api.items[0].update({'documentrevnum': '3', 'quantity': 550.0})
+        self.assertEqual(self.store.add('B1610', api), 1)
+        self.assertEqual(len(self.store), 1)
+
+        with self.store._lock:
+            self.store._db.executemany("INSERT INTO fetched VALUES ('B1610', '2016-01-01', ?, "
+                                       "'2017-01-01T00:00:00')", [(period,) for period in range(1, 48)])
+        self.assertEqual(self.store.missing('B1610', date(2016, 1, 1), date(2016, 1, 1)),
+                         [{'SettlementDate': date(2016, 1, 1), 'Period': 48}])
+        with self.assertRaises(ValueError):
+            self.store.missing('B1420', date(2016, 1, 1), date(2016, 1, 1))
+
+    def test_needs_refresh(self):
+        # Days fetched soon after their settlement date are fetched again after 12 hours.
+        fetched = datetime(2016, 1, 2, 9)
+        self.assertFalse(needs_refresh(date(2016, 1, 1), fetched, fetched + timedelta(hours=1)))
+        self.assertTrue(needs_refresh(date(2016, 1, 1), fetched.isoformat(), fetched + timedelta(days=1)))
+        self.assertFalse(needs_refresh(date(2016, 1, 1), '2016-02-01T00:00:00', datetime(2017, 1, 1)))
+        self.assertFalse(needs_refresh(date(2016, 1, 1), fetched, fetched + timedelta(days=1),
+                                       refresh_after=timedelta(days=2)))
+
+    def test_records(self):
+        item = {'settlementdate': date(2016, 1, 1), 'time': time(0, 35),
+                'publishingperiodcommencingtime': datetime(2016, 1, 1, 0, 30),
+                'settlementperiod': 2, 'quantity': 1.5, 'activeflag': True, 'unit': None,
+                'name': 'DRAXX-1', 'nested': {'$other': 'x'}}
+        data = encode_record(item)
+        self.assertIsInstance(data, str)
+        self.assertEqual(decode_record(data), item)
+        with self.assertRaises(TypeError):
+            encode_record({'value': object()})
+
+    def test_old_database(self):
+        filename = os.path.join(self.directory, 'old.sqlite')
+        dbb = sqlite3.connect(filename)
+        dbb.execute("CREATE TABLE records (report TEXT, result_set TEXT, key TEXT, settlement_date TEXT, "
+                    "settlement_period INTEGER, revision INTEGER, data BLOB)")
+        dbb.execute("INSERT INTO records VALUES ('FUELINST', '', 'x', '2016-01-01', 1, 0, x'80')")
+        dbb.commit()
+        dbb.close()
+        store = ElexonStore('apikey', filename)
+        self.assertEqual(len(store), 0)
+        self.assertEqual(len(store.load('FUELINST', date(2016, 1, 1), date(2016, 1, 1))), 0)
+        store.close()
+
+    def test_fuelinst_bst(self):
+        # FUELINST requests use UTC times, so 2016-06-02 starts at 23:00 on 2016-06-01.
+        pool = FilePool('elexon_fuelinst.xml')
+        set_session_pool(pool)
+        plan = self.store.missing('FUELINST', date(2016, 6, 2), date(2016, 6, 2))
+        self.assertEqual(plan[0]['FromDateTime'], datetime(2016, 6, 1, 23, 0))
+        self.assertEqual(self.store._request_units(plan[0]), [(date(2016, 6, 2), 0)])
+        self.assertGreater(self.store.sync('FUELINST', date(2016, 6, 2), date(2016, 6, 2)), 0)
+        self.assertEqual(self.store.missing('FUELINST', date(2016, 6, 2), date(2016, 6, 2)), [])
+        missing = self.store.missing('FUELINST', date(2016, 6, 1), date(2016, 6, 1))
+        self.assertEqual([params['FromDateTime'] for params in missing], [datetime(2016, 5, 31, 23, 0)])
+        self.assertEqual(self.store._request_units({'FromDateTime': '2016-05-31 23:00:00',
+                                                    'ToDateTime': '2016-06-02 22:55:00'}),
+                         [(date(2016, 6, 1), 0), (date(2016, 6, 2), 0)])
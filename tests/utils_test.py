@@ -1,11 +1,15 @@
+import io
 import os
 import unittest
 from lxml import etree
 
 import datetime
 
+import requests
+
 from pywind.ofgem.objects import Certificates
-from pywind.utils import map_xml_to_dict, StdoutFormatter
+from pywind.utils import map_xml_to_dict, StdoutFormatter, parse_response_as_xml, XmlMapper, \
+    xml_mapper_for, iterparse_response
 
 
 class UtilTest(unittest.TestCase):
@@ -32,6 +36,56 @@ class UtilTest(unittest.TestCase):
             self.assertGreater(rv_dict['capacity'], 0)
             self.assertGreater(len(rv_dict['scheme']), 0)
 
+    def test_xml_mapper(self):
+        """ Test the compiled mapper gives the same results as map_xml_to_dict. """
+        mapper = xml_mapper_for(Certificates)
+        self.assertIsInstance(mapper, XmlMapper)
+        self.assertIs(xml_mapper_for(Certificates), mapper)
+
+        node = etree.XML('<item a=" 1,234 "><b>2.5</b><c></c><d>201603</d><b>9</b></item>')
+        mapper = XmlMapper([('a', 'aa', 'int'), ('b', '', 'float'), ('c', 'c', 'int', 0),
+                            ('d', 'period', 'period'), 'e'])
+        self.assertEqual(mapper(node), {'aa': 1234, 'b': 2.5, 'c': 0,
+                                        'period': datetime.date(2016, 3, 1), 'e': None})
+        self.assertEqual(map_xml_to_dict(node), {'b': '9', 'c': None, 'd': '201603'})
+
+    def test_parse_streamed_response(self):
+        """ Test parsing a streamed response as it is read. """
+        with open(os.path.join(self.HERE, 'files', 'bm_system_prices.xml'), 'rb') as xfh:
+            data = xfh.read()
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.raw = io.BytesIO(data)
+        xml = parse_response_as_xml(resp)
+        self.assertEqual(len(xml.xpath('.//ELEMENT')), len(etree.XML(data).xpath('.//ELEMENT')))
+        self.assertGreater(len(xml.xpath('.//ELEMENT')), 0)
+
+    def test_iterparse_response(self):
+        """ Test elements are returned, and then discarded, as a streamed response is parsed. """
+        with open(os.path.join(self.HERE, 'files', 'certificate_test.xml'), 'rb') as xfh:
+            data = xfh.read()
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.raw = io.BytesIO(data)
+        chunks = []
+        names = []
+        parent = None
+        for detail in iterparse_response(resp, '{*}Detail', chunks):
+            names.append(Certificates(detail).name)
+            parent = detail.getparent()
+            # Only the previous element, now cleared, is left before this one.
+            self.assertLessEqual(parent.index(detail), 1)
+            self.assertEqual(len(parent[0].attrib), 0 if parent.index(detail) else 17)
+        self.assertEqual(len(names), 5)
+        self.assertEqual(len(parent), 1)
+        self.assertEqual(len(parent[0].attrib), 0)
+        self.assertEqual(b''.join(chunks), data)
+
+        resp = requests.Response()
+        resp.raw = io.BytesIO(b'Not XML')
+        with self.assertRaises(etree.XMLSyntaxError):
+            list(iterparse_response(resp, 'item', recover=True))
+
     def test_stdout_formatter(self):
         """ Test StdoutFormatter class
         """